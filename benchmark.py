@@ -0,0 +1,364 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import pandas as pd
+
+import data_files
+import ebay_price_logger_daily as scraper
+import price_data
+from listing_store import ListingStore
+from term_matcher import TermMatcher
+
+DEFAULT_OUTPUT = "benchmark_results.json"
+SCALES = [1, 10, 100]  # Synthetic catalog sizes, as multiples of the products in the bundled CSVs
+COMPARE_COUNTS = [1, 5, 20]  # Products compared with the opened one in the product page benchmark
+LISTINGS_PER_PAGE = 60
+LISTING_COUNT = 10000  # Listings run through is_valid_title and process_price
+SEED = 1234
+# Run in a fresh interpreter to time the dashboard's cold start, up to its first two responses
+COLD_START_SCRIPT = ("import dashboardapp; client = dashboardapp.app.server.test_client(); "
+                     "assert client.get('/').status_code == 200; "
+                     "assert client.get('/_dash-layout').status_code == 200")
+
+
+def measure(func, repeat, warmup=1):
+    """
+    Time repeated calls of a function.
+    :param func: The function to call with no arguments.
+    :type func: callable
+    :param repeat: Number of timed calls.
+    :type repeat: int
+    :param warmup: Number of untimed calls made first.
+    :type warmup: int
+    :return: A dictionary of the call count, mean and p50/p90/p99 latencies in milliseconds, and calls per second.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    percentile = lambda p: timings[min(int(p / 100 * len(timings)), len(timings) - 1)] * 1000
+    return {
+        "calls": repeat,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "per_second": len(timings) / sum(timings) if sum(timings) else float("inf"),
+    }
+
+
+def synthetic_listings(count, rng):
+    """
+    Build (title, price, date) listings shaped like the ones on eBay's sold results.
+    :param count: Number of listings.
+    :type count: int
+    :param rng: Random source, seeded so every run sees the same listings.
+    :type rng: random.Random
+    :return: A list of (title, raw price, raw date) tuples.
+    """
+    models = ["geforce rtx 4090", "geforce rtx 4070 ti", "core i9-14900k", "ryzen 7 5800x", "radeon rx 7900 xtx"]
+    extras = ["founders edition", "used", "tested working", "oem", "with box", "24gb gddr6x", "desktop processor"]
+    listings = []
+    for _ in range(count):
+        title = " ".join([rng.choice(["nvidia", "amd", "intel", "new"]), rng.choice(models)]
+                         + rng.sample(extras, 2))
+        low = rng.uniform(5, 1200)
+        price = f"${low:,.2f}" if rng.random() < 0.9 else f"${low:,.2f} to ${low * 1.2:,.2f}"
+        day = datetime(2024, rng.randint(1, 12), rng.randint(1, 28)).strftime("%b %d, %Y").replace(" 0", " ")
+        listings.append((title, price, day))
+    return listings
+
+
+def synthetic_page(rng, listing_count=LISTINGS_PER_PAGE, first_link=0):
+    """
+    Render a result page with the same structure as eBay's sold listings page.
+    :param rng: Random source.
+    :type rng: random.Random
+    :param listing_count: Number of listings on the page.
+    :type listing_count: int
+    :param first_link: Number in the first listing's link, so different pages can have different listings.
+    :type first_link: int
+    :return: The page body.
+    """
+    items = []
+    for number, (title, price, day) in enumerate(synthetic_listings(listing_count, rng), first_link):
+        items.append(
+            f'<li class="s-item s-item__pl-on-bottom"><div class="s-item__info">'
+            f'<div class="s-item__title"><span role="heading">{title.title()}</span></div>'
+            f'<div class="s-item__subtitle"><span class="SECONDARY_INFO">Pre-Owned</span></div>'
+            f'<span class="s-item__price">{price}</span>'
+            f'<div class="s-item__caption"><span class="POSITIVE">Sold  {day}</span></div>'
+            f'<a class="s-item__link" href="https://www.ebay.com/itm/{number}?hash=item{number}">view</a>'
+            f'</div></li>'
+        )
+    return (
+        '<html><head><meta charset="utf-8"></head><body>'
+        '<h1 class="srp-controls__count-heading"><span class="BOLD">780</span> results</h1>'
+        f'<ul class="srp-results srp-list clearfix">{"".join(items)}</ul>'
+        '<ol>' + "".join(f'<li><a class="pagination__item">{n}</a></li>' for n in range(1, 14)) + '</ol>'
+        '</body></html>'
+    )
+
+
+def load_fixtures(directory):
+    """
+    Read saved result pages: .html files, and .z bodies copied from the page cache.
+    :param directory: Directory holding the pages.
+    :type directory: str
+    :return: A list of page bodies.
+    """
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    for path in sorted(glob.glob(os.path.join(directory, "*.z"))):
+        with open(path, "rb") as f:
+            pages.append(zlib.decompress(f.read()).decode("utf-8"))
+    return pages
+
+
+def scaled_wide_csvs(directory, scale, seed=SEED):
+    """
+    Write copies of the bundled wide CSVs with every product repeated `scale` times under a new name
+    and its prices jittered, keeping the real date columns.
+    :param directory: Directory to write the CSVs to.
+    :type directory: str
+    :param scale: How many copies of each product to write.
+    :type scale: int
+    :param seed: Seed for the price jitter.
+    :type seed: int
+    :return: Category to CSV path mapping in the form of price_data.CATEGORY_FILES.
+    """
+    rng = random.Random(seed)
+    files = {}
+    for category, path in price_data.CATEGORY_FILES.items():
+        wide_df = pd.read_csv(path)
+        copies = []
+        for copy in range(scale):
+            scaled = wide_df.copy()
+            if copy:
+                scaled["CPU Name"] = scaled["CPU Name"] + f" #{copy}"
+                scaled.iloc[:, 1:] = scaled.iloc[:, 1:] * (0.8 + 0.4 * rng.random())
+            copies.append(scaled)
+        files[category] = os.path.join(directory, os.path.basename(path))
+        pd.concat(copies, ignore_index=True).to_csv(files[category], index=False)
+    return files
+
+
+def bench_parsing(pages, repeat):
+    """
+    Time parse_listing over every listing on a page and whole-page parsing with each backend.
+    """
+    from bs4 import BeautifulSoup
+
+    results = {}
+    sections = [BeautifulSoup(page, "html.parser").find(class_="srp-results srp-list clearfix") for page in pages]
+    items = [item for section in sections if section
+             for item in section.find_all("li", class_="s-item s-item__pl-on-bottom")]
+    results["parse_listing"] = measure(lambda: [scraper.parse_listing(item) for item in items], repeat)
+    results["parse_listing"]["listings_per_call"] = len(items)
+
+    for backend in ["html.parser", "lxml"]:
+        try:
+            results[f"parse_result_page[{backend}]"] = measure(
+                lambda: [scraper.parse_result_page(page, backend) for page in pages], repeat)
+        except ImportError:
+            print(f"Skipping the {backend} backend, it isn't installed")
+            continue
+        results[f"parse_result_page[{backend}]"]["pages_per_call"] = len(pages)
+    return results
+
+
+def bench_filtering(listings, repeat):
+    """
+    Time is_valid_title, process_price and matching titles to the most specific term across many listings,
+    filter_listings doing the checks with and without the matcher, and recomputing the daily stats of the
+    listings it accepts from the listing store.
+    """
+    search_keywords = "geforce rtx 4090".split()
+    rows = [(title, price, day, str(number), "pre-owned") for number, (title, price, day) in enumerate(listings)]
+    # Matched against every term of the bundled search term files, as in a run over all of them
+    matcher = TermMatcher(term for path in sorted(glob.glob("search_terms_*.csv"))
+                          for term in scraper.read_search_terms(path))
+    results = {
+        "is_valid_title": measure(lambda: [scraper.is_valid_title(title, search_keywords)
+                                           for title, _, _ in listings], repeat),
+        "process_price": measure(lambda: [scraper.process_price(price) for _, price, _ in listings], repeat),
+        "filter_listings": measure(lambda: scraper.filter_listings(rows, search_keywords), repeat),
+        "term_matcher.match": measure(lambda: [matcher.match(title) for title, _, _ in listings], repeat),
+        "filter_listings[matcher]": measure(lambda: scraper.filter_listings(rows, search_keywords, matcher), repeat),
+    }
+    for result in results.values():
+        result["listings_per_call"] = len(listings)
+
+    with tempfile.TemporaryDirectory() as directory, ListingStore(os.path.join(directory, "listings.db")) as store:
+        accepted = scraper.filter_listings(rows, search_keywords)
+        store.add_listings(" ".join(search_keywords), accepted)
+        results["listing_store.daily_stats"] = measure(store.daily_stats, repeat)
+        results["listing_store.daily_stats"]["listings_per_call"] = len(accepted)
+    return results
+
+
+def cold_start(directory):
+    """
+    Start the dashboard in a new Python process with `directory` as its working directory and wait until
+    it has answered its first requests.
+    """
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", COLD_START_SCRIPT], cwd=directory, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def bench_dashboard(scales, repeat):
+    """
+    Time building the dataset, its rollups and the snapshot, loading the snapshot, starting the dashboard
+    from cold, and building product pages at each catalog scale.
+    """
+    import dashboardapp
+
+    results = {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            # Laid out like the repo's assets folder, so the cold start benchmark finds the files where the app looks
+            assets = os.path.join(directory, "assets")
+            os.makedirs(assets)
+            files = scaled_wide_csvs(assets, scale)
+            dataset = os.path.join(assets, os.path.basename(price_data.DATASET_FILE))
+            results[f"convert_csvs[x{scale}]"] = measure(
+                lambda: price_data.convert_csvs(files, dataset), max(repeat // 10, 1), warmup=0)
+            rollup_files = {name: os.path.join(assets, os.path.basename(rollup_path))
+                            for name, rollup_path in price_data.ROLLUP_FILES.items()}
+            results[f"build_rollups[x{scale}]"] = measure(
+                lambda: price_data.write_rollups(price_data.build_rollups(price_data.load_price_data(dataset)),
+                                                 rollup_files), max(repeat // 10, 1), warmup=0)
+            snapshot = os.path.join(assets, os.path.basename(data_files.SNAPSHOT_FILE))
+            results[f"build_snapshot[x{scale}]"] = measure(
+                lambda: price_data.build_snapshot(dataset, rollup_files, snapshot), max(repeat // 10, 1), warmup=0)
+            results[f"load_snapshot[x{scale}]"] = measure(
+                lambda: dashboardapp.PriceIndex(data_files.load_snapshot(snapshot)), max(repeat // 10, 1), warmup=0)
+            results[f"cold_start[x{scale}]"] = measure(lambda: cold_start(directory), max(repeat // 10, 1))
+
+            index = dashboardapp.PriceIndex(data_files.load_snapshot(snapshot))
+            results[f"load_snapshot[x{scale}]"]["products"] = len(index.products)
+            product = "GeForce RTX 4090"
+            others = [p for p in index.products if p != product]
+            for count in COMPARE_COUNTS:
+                compare = others[::max(len(others) // count, 1)][:count]
+
+                def cold_page():
+                    dashboardapp.cache.clear()
+                    dashboardapp.create_product_page(index, product, compare)
+
+                results[f"create_product_page[x{scale},compare={count}]"] = measure(cold_page, repeat)
+                results[f"create_product_page[x{scale},compare={count},cached]"] = measure(
+                    lambda: dashboardapp.create_product_page(index, product, compare), repeat)
+            dashboardapp.cache.clear()
+    return results
+
+
+def git_commit():
+    """
+    The commit the benchmarks ran against, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline_file, results):
+    """
+    Print how each benchmark's median latency changed against an earlier results file.
+    :param baseline_file: Path of a JSON file written by an earlier run.
+    :type baseline_file: str
+    :param results: This run's results keyed by benchmark name.
+    :type results: dict
+    :return: None
+    """
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"Compared with {baseline_file} ({baseline.get('commit') or 'unknown commit'}):")
+    for name, result in results.items():
+        if name in baseline["results"]:
+            ratio = result["p50_ms"] / baseline["results"][name]["p50_ms"]
+            print(f"  {name:55} {result['p50_ms']:10.3f} ms  x{ratio:.2f}")
+
+
+def main(output=DEFAULT_OUTPUT, repeat=50, scales=None, fixtures=None, only=None, baseline=None):
+    """
+    Run the benchmarks and write their results as JSON.
+    :param output: Path of the JSON file to write.
+    :type output: str
+    :param repeat: Number of timed calls per benchmark.
+    :type repeat: int
+    :param scales: Catalog scales for the dashboard benchmarks; defaults to SCALES.
+    :type scales: list
+    :param fixtures: Optional directory of saved result pages to parse instead of the synthetic page.
+    :type fixtures: str
+    :param only: Optional groups to run, out of "parsing", "filtering" and "dashboard".
+    :type only: list
+    :param baseline: Optional results file from an earlier run to compare against.
+    :type baseline: str
+    :return: The results keyed by benchmark name.
+    """
+    rng = random.Random(SEED)
+    groups = only or ["parsing", "filtering", "dashboard"]
+    results = {}
+    if "parsing" in groups:
+        pages = load_fixtures(fixtures) if fixtures else [synthetic_page(rng)]
+        if not pages:
+            print(f"No saved pages found in {fixtures}")
+        else:
+            results.update(bench_parsing(pages, repeat))
+    if "filtering" in groups:
+        results.update(bench_filtering(synthetic_listings(LISTING_COUNT, rng), repeat))
+    if "dashboard" in groups:
+        results.update(bench_dashboard(scales or SCALES, repeat))
+
+    for name, result in results.items():
+        print(f"{name:55} p50 {result['p50_ms']:10.3f} ms  p99 {result['p99_ms']:10.3f} ms  "
+              f"{result['per_second']:10.1f}/s")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": results,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
+
+    if baseline:
+        compare_results(baseline, results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scraper's parsing and filtering and the dashboard.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON file to write (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=50, help="timed calls per benchmark (default: %(default)s)")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES,
+                        help="catalog sizes for the dashboard benchmarks, as multiples of today's (default: 1 10 100)")
+    parser.add_argument("--fixtures", help="directory of saved result pages (.html, or .z bodies from the page cache)")
+    parser.add_argument("--only", nargs="+", choices=["parsing", "filtering", "dashboard"],
+                        help="run only these benchmark groups")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    args = parser.parse_args()
+    main(args.output, args.repeat, args.scales, args.fixtures, args.only, args.compare)
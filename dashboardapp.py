@@ -1,502 +1,827 @@
-from dash import Dash, html, dcc, Input, Output, State, ALL, callback_context
-#Dash,html and dcc are needed to building the web app
-#Input,Output are used to handle any callback errors
-from dash.exceptions import PreventUpdate
-#prevent update has been used by me to skip any updates to the layout during any callback
-from dash import no_update
-import plotly.graph_objects as go
-#the above module is used for creating line charts and candle charts
-import pandas as pd
-from datetime import datetime, timedelta
-import numpy as np
-
-app = Dash(__name__, suppress_callback_exceptions=True)
-#this initializes the dash app and also suppress_callback exceptions has been used in order to allow callbacks
-#to work even if associated layout elements are not present
-
-
-
-def load_and_merge_data():
-    files = [
-        "assets/Average_Price_By_Day_AMD_CPU.csv",
-        "assets/Average_Prices_By_Day_AMD_GPU.csv",
-        "assets/Average_Prices_By_Day_Intel_CPU.csv",
-        "assets/Average_Prices_By_Day_NVIDIA_GPU.csv",
-    ]
-    dataframes = [pd.read_csv(file) for file in files]
-    merged_df = pd.concat(dataframes, ignore_index=True)
-    return merged_df
-
-#The first step is to load the data
-data = load_and_merge_data()
-
-def calculate_30_day_stats(df, product_name):
-    """""the function filters the dataset for any specific product and also
-        converts date columns and calculates the statistics of the product over the last 30 days.
-    """
-    product_data = df[df["CPU Name"] == product_name].iloc[0, 1:]
-    #filters the data frame for the selected product name
-
-    dates = pd.to_datetime(product_data.index, errors='coerce')
-    # converting column indexes to datetime objects
-    prices = product_data.astype(float)
-    price_df = pd.DataFrame({
-        'date': dates,
-        'price': prices
-    }).dropna()
-    # in the above block of code we are creating a new dataframe with date and price columns
-    #and dropping rows with missing values
-
-    price_df = price_df.sort_values('date', ascending=False)
-    last_30_days = price_df.head(30)
-
-    stats = {
-        'low': last_30_days['price'].min(),
-        'high': last_30_days['price'].max(),
-        'average': last_30_days['price'].mean(),
-        'current': last_30_days.iloc[0]['price'],
-        'previous': last_30_days.iloc[1]['price'] if len(last_30_days) > 1 else None
-    }
-    #after computing the statistics we return the calculated statistics as a dictionary
-
-    return stats
-
-def create_line_chart(df, product_names):
-    """the function will create the line chart
-    and will filter the dataset for the product selected
-    We have used dark mode and dynamic coloring
-    """
-    fig = go.Figure()
-    # initializing an empty Plotly figure
-
-    if isinstance(product_names, str):
-        product_names = [product_names]
-    elif product_names is None:
-        product_names = []
-    # converting product in string to list
-
-    colors = ['#4457ec', '#10B981', '#EF4444', '#F59E0B', '#6366F1']
-    all_dates = set()
-    product_data_dict = {} #hold price of each product
-
-    for idx, product_name in enumerate(product_names):
-        try:
-            product_rows = df[df["CPU Name"].str.contains(product_name, case=False, na=False)]
-            # the above line filters the DataFrame for rows where the product name matches
-            if len(product_rows) == 0:
-                print(f"Could not find data for product: {product_name}")
-                continue
-
-            product_data = product_rows.iloc[0, 1:]
-            #the above code selects the price data for the first matching row.
-            dates = pd.to_datetime(product_data.index, errors='coerce')
-            prices = product_data.astype(float)
-
-            price_df = pd.DataFrame({
-                'date': dates,
-                'price': prices
-            }).dropna().sort_values('date')
-
-            all_dates.update(price_df['date'])
-            product_data_dict[product_name] = price_df
-
-        except Exception as e:
-            print(f"Error processing {product_name}: {str(e)}")
-            continue
-
-    start_date = pd.Timestamp('2024-09-01')
-    end_date = pd.Timestamp.now()
-    date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-
-    for idx, (product_name, price_df) in enumerate(product_data_dict.items()):
-        full_df = price_df.set_index('date').reindex(date_range)
-        full_df = full_df.ffill().bfill()
-        # reindexing is done to the dataframe in order to fill any gaps in the date range with ffill and bfill
-
-        fig.add_trace(go.Scatter(
-            x=full_df.index,
-            y=full_df['price'],
-            mode='lines',
-            name=product_name,
-            line=dict(color=colors[idx % len(colors)], width=2),
-            hovertemplate='$%{y:.2f}<extra>%{x|%b %d, %Y}</extra>'
-        ))
-
-    fig.update_layout(
-        plot_bgcolor='#1e293b',
-        paper_bgcolor='#1e293b',
-        font=dict(color='white', size=10),
-        xaxis=dict(
-            showgrid=True,
-            gridcolor='rgba(255, 255, 255, 0.1)',
-            tickformat='%b %d\n%Y',
-            tickangle=45,
-            tickmode='auto',
-            nticks=15,
-            title_text=None,
-            tickfont=dict(size=10),
-            rangeslider=dict(visible=False),
-            type='date',
-            dtick='M1',
-            ticklabelmode='period'
-        ),
-        yaxis=dict(
-            showgrid=True,
-            gridcolor='rgba(255, 255, 255, 0.1)',
-            tickprefix='$',
-            title_text=None,
-            tickfont=dict(size=10),
-            zeroline=False
-        ),
-        margin=dict(l=50, r=20, t=10, b=50),
-        height=600,
-        width=1200,
-        hovermode='x unified',
-        showlegend=True,
-        legend=dict(
-            bgcolor='rgba(0,0,0,0)',
-            bordercolor='rgba(255,255,255,0.1)',
-            borderwidth=1,
-            font=dict(size=10),
-            yanchor="top",
-            y=0.99,
-            xanchor="right",
-            x=0.99
-        )
-    )
-
-    return fig
-
-def create_candlestick_chart(df, product_name):
-    """creates a candlestick chart and it will handle exceptions too by returning an empty figure
-    in case any error occurs
-    """
-    try:
-        product_rows = df[df["CPU Name"].str.contains(product_name, case=False, na=False)]
-        if len(product_rows) == 0:
-            raise ValueError(f"Product not found: {product_name}")
-
-        product_data = product_rows.iloc[0, 1:]
-        dates = pd.to_datetime(product_data.index, errors='coerce')
-        prices = product_data.astype(float)
-
-        price_df = pd.DataFrame({
-            'date': dates,
-            'price': prices
-        }).dropna().sort_values('date')
-
-        weekly = price_df.set_index('date').resample('W').agg({
-            'price': ['first', 'max', 'min', 'last']
-        }).dropna()
-
-        weekly.columns = ['open', 'high', 'low', 'close']
-
-        fig = go.Figure(data=[go.Candlestick(
-            x=weekly.index,
-            open=weekly['open'],
-            high=weekly['high'],
-            low=weekly['low'],
-            close=weekly['close'],
-            increasing_line_color='#10B981',
-            decreasing_line_color='#EF4444',
-            name=product_name
-        )])
-
-        fig.update_layout(
-            plot_bgcolor='#1e293b',
-            paper_bgcolor='#1e293b',
-            font=dict(color='white', size=10),
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(255, 255, 255, 0.1)',
-                tickformat='%b %d\n%Y',
-                tickangle=45,
-                nticks=20,
-                tickmode='auto',
-                title_text=None,
-                tickfont=dict(size=10),
-                rangeslider=dict(visible=False),
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(255, 255, 255, 0.1)',
-                tickprefix='$',
-                title_text=None,
-                tickfont=dict(size=10),
-                zeroline=False
-            ),
-            margin=dict(l=50, r=20, t=10, b=50),
-            height=500,
-            width=1000,
-            hovermode='x unified'
-        )
-
-        return fig
-    except Exception as e:
-        print(f"Error creating candlestick chart for {product_name}: {str(e)}")
-        return go.Figure()
-
-def create_product_page(df, product_name, compare_products=None):
-    """this function will diaplay all the main features of the product"""
-    stats = calculate_30_day_stats(df, product_name)
-    # this calculates 30-day stats for the selected product.
-    price_change = ((stats['current'] - stats['previous']) / stats['previous'] * 100) if stats['previous'] else 0
-    #the lines of codes below basically create a header for displaying the product name and its price info
-    #and also displays the low high and average price of the product
-    return html.Div([
-        html.Div([
-            html.Div([
-                html.H1(product_name, className="product-title"),
-                html.Div([
-                    html.H2(f"${stats['current']:.2f}", className="current-price"),
-                    html.Div([
-                        html.Span(
-                            f"{'+' if price_change >= 0 else ''}{price_change:.2f}% vs previous",
-                            className=f"price-change {'positive' if price_change >= 0 else 'negative'}"
-                        )
-                    ], className="price-change-container")
-                ], className="price-info")
-            ], className="product-header-content")
-        ], className="product-header"),
-
-        html.Div([
-            html.Div([
-                html.H3("30-Day Low", className="stat-title"),
-                html.Div(f"${stats['low']:.2f}", className="stat-value"),
-                html.Div("Last 30 days", className="stat-subtitle")
-            ], className="stat-card"),
-            html.Div([
-                html.H3("30-Day High", className="stat-title"),
-                html.Div(f"${stats['high']:.2f}", className="stat-value"),
-                html.Div("Last 30 days", className="stat-subtitle")
-            ], className="stat-card"),
-            html.Div([
-                html.H3("30-Day Average", className="stat-title"),
-                html.Div(f"${stats['average']:.2f}", className="stat-value"),
-                html.Div("Last 30 days", className="stat-subtitle")
-            ], className="stat-card"),
-        ], className="stats-container"),
-
-        html.Div([
-            html.H3("Compare with other products", className="section-title"),
-            dcc.Dropdown(
-                id='compare-dropdown',
-                options=[{'label': p, 'value': p} for p in df['CPU Name'].unique()],
-                value=compare_products,
-                multi=True,
-                className="compare-dropdown",
-                placeholder="Select products to compare..."
-            ),
-        ], className="compare-section"),
-
-        html.Div([
-            html.Div([
-                html.H3("Price History", className="chart-title"),
-                dcc.Graph(
-                    figure=create_line_chart(
-                        df,
-                        [product_name] + (compare_products if compare_products else [])
-                    ),
-                    className="price-chart",
-                    config={'displayModeBar': False}
-                )
-            ], className="chart-container"),
-
-            html.Div([
-                html.H3("Weekly Price Ranges", className="chart-title"),
-                dcc.Graph(
-                    figure=create_candlestick_chart(df, product_name),
-                    className="candlestick-chart",
-                    config={'displayModeBar': False}
-                )
-            ], className="chart-container")
-        ], className="charts-container")
-    ], className="product-page")
-
-# Main app layout
-app.layout = html.Div([
-    dcc.Store(id='current-product-store'),
-    html.Header([
-        html.Div([
-            html.H1("Hardware Price Tracker", className="nav-title-large"),
-            dcc.Dropdown(
-                id="product-search",
-                options=[{"label": product, "value": product}
-                         for product in data["CPU Name"].unique()],
-                placeholder="Search for a product...",
-                className="search-dropdown",
-                searchable=True,
-                clearable=True,
-            )
-        ], className="header-content")
-    ], className="header"),
-
-    html.Main([
-        html.Div([
-            html.H2("Welcome to Hardware Price Tracker", className="welcome-title"),
-            html.P("Select a product to view detailed price analysis and history.",
-                  className="welcome-subtitle"),
-
-            html.Div([
-                html.H3("Popular CPU Products", className="section-title"),
-                html.P("Explore a selection of the latest and most powerful CPU options from leading manufacturers.",
-                      className="section-description"),
-                html.Div([
-                    html.Div([
-                        html.H4(product, className="product-title"),
-                        html.P("High-performance CPU with advanced features for demanding workloads.",
-                              className="product-description"),
-                        html.Button("View Details", id={"type": "product-button", "index": i},
-                                  className="product-button")
-                    ], className="product-card")
-                    for i, product in enumerate([
-                        'AMD Ryzen 7 5800X',
-                        'Intel Core i7-12700K',
-                        'AMD Ryzen 9 5950X'
-                    ])
-                ], className="product-grid"),
-            ], className="product-section"),
-
-            html.Div(style={"height": "3rem"}),
-
-            html.Div([
-                html.H3("Popular GPU Products", className="section-title"),
-                html.P("Check out the latest and most powerful graphics cards for gaming, content creation, and beyond.",
-                      className="section-description"),
-                html.Div([
-                    html.Div([
-                        html.H4(product, className="product-title"),
-                        html.P("Cutting-edge GPU with advanced ray tracing and powerful features.",
-                              className="product-description"),
-                        html.Button("View Details", id={"type": "product-button", "index": i + 3},
-                                  className="product-button")
-                    ], className="product-card")
-                    for i, product in enumerate([
-                        'GeForce RTX 4090',
-                        'Radeon RX 7900 XTX',
-                        'GeForce RTX 4080'
-                    ])
-                ], className="product-grid"),
-            ], className="product-section"),
-
-            html.Div(style={"height": "3rem"}),
-
-            html.Div([
-                html.H2("Featured Hardware", className="section-title"),
-                html.Div([
-                    html.Div([
-                        html.H4('Intel Core i9-13900K', className="product-title"),
-                        html.P("High-performance CPU with 12 cores for demanding workloads.",
-                              className="product-description"),
-                        html.Button("View Details", id={"type": "featured-button", "index": 0},
-                                  className="product-button")
-                    ], className="product-card"),
-                    html.Div([
-                        html.H4('GeForce RTX 4070 Ti', className="product-title"),
-                        html.P("Powerful GPU with advanced features.", className="product-description"),
-                        html.Button("View Details", id={"type": "featured-button", "index": 1},
-                                  className="product-button")
-                    ], className="product-card")], className="product-grid")
-            ], className="featured-section"),
-            html.Div(style={"height": "3rem"}),
-
-            html.Div([
-                html.H2("Latest Hardware News", className="section-title news-title"),
-                html.Div([
-                    html.Div([
-                        html.H3("NVIDIA Announces New GeForce RTX 5000 Series", className="news-title"),
-                        html.P(
-                            "The latest GPUs promise even more powerful performance for gaming and content creation.",
-                            className="news-description"),
-                        html.A("Read More", href="#", className="news-link")
-                    ], className="news-item"),
-                    html.Div([
-                        html.H3("AMD Unveils Ryzen 7000 CPUs with New Zen 4 Architecture", className="news-title"),
-                        html.P("The new Ryzen CPUs offer significant improvements in processing power and efficiency.",
-                               className="news-description"),
-                        html.A("Read More", href="#", className="news-link")
-                    ], className="news-item"),
-                    html.Div([
-                        html.H3("Intel Launches 13th Gen Core Processors", className="news-title"),
-                        html.P(
-                            "Intel's latest CPUs deliver enhanced performance and power efficiency for various workloads.",
-                            className="news-description"),
-                        html.A("Read More", href="#", className="news-link")
-                    ], className="news-item")
-                ], className="news-grid")
-            ], className="news-section")
-        ], id="page-content", className="main-content")
-    ]),
-])
-
-
-# callbacks
-@app.callback(
-    [Output("page-content", "children"),
-     Output("current-product-store", "data")],
-    [Input("product-search", "value"),
-     Input({"type": "product-button", "index": ALL}, "n_clicks"),
-     Input({"type": "featured-button", "index": ALL}, "n_clicks")],
-    prevent_initial_call=True
-)
-def update_page(search_value, product_button_clicks, featured_button_clicks):
-    ctx = callback_context
-    if not ctx.triggered:
-        return app.layout.children[1].children, None
-
-    trigger_id = ctx.triggered[0]["prop_id"]
-    current_product = None
-
-    try:
-        if trigger_id == "product-search.value" and search_value:
-            current_product = search_value
-            return create_product_page(data, current_product), current_product
-
-        elif "product-button" in trigger_id:
-            button_index = int(eval(trigger_id.split('.')[0])["index"])
-            if any(n for n in product_button_clicks if n):
-                all_products = [
-                    'AMD Ryzen 7 5800X',
-                    'Core i7-12700K',
-                    'AMD Ryzen 9 5950X',
-                    'GeForce RTX 4090',
-                    'Radeon RX 7900 XTX',
-                    'GeForce RTX 4080'
-                ]
-
-                if button_index < len(all_products):
-                    current_product = all_products[button_index]
-                    return create_product_page(data, current_product), current_product
-
-        elif "featured-button" in trigger_id:
-            button_index = int(eval(trigger_id.split('.')[0])["index"])
-            if any(n for n in featured_button_clicks if n):
-                featured_products = [
-                    'Core i9-13900K',
-                    'GeForce RTX 4070 Ti'
-                ]
-                if button_index < len(featured_products):
-                    current_product = featured_products[button_index]
-                    return create_product_page(data, current_product), current_product
-
-        return app.layout.children[1].children, None
-    except Exception as e:
-        print(f"Error in update_page: {str(e)}")
-        return app.layout.children[1].children, None
-
-
-@app.callback(
-    Output("page-content", "children", allow_duplicate=True),
-    [Input("compare-dropdown", "value")],
-    [State("current-product-store", "data")],
-    prevent_initial_call=True
-)
-def update_comparison(compare_products, current_product):
-    if not current_product:
-        raise PreventUpdate
-
-    return create_product_page(data, current_product, compare_products)
-
-
-if __name__ == '__main__':
-    app.run_server(debug=True)
+import time
+STARTED = time.perf_counter()
+#the startup time breakdown is measured from here, before the heavy imports
+
+from dash import Dash, html, dcc, Input, Output, State, ALL, callback_context
+#Dash,html and dcc are needed to building the web app
+#Input,Output are used to handle any callback errors
+from dash.exceptions import PreventUpdate
+#prevent update has been used by me to skip any updates to the layout during any callback
+from dash import no_update, Patch
+import plotly.graph_objects as go
+#the above module is used for creating line charts and candle charts
+from datetime import datetime, timedelta
+import numpy as np
+import threading
+from collections import OrderedDict
+from flask import Response
+from metrics import METRICS
+from data_files import load_snapshot, snapshot_stale, dataset_version, rebuild_lock, STATS_COLUMNS, OHLC_COLUMNS
+from product_search import ProductSearchIndex
+#pandas is only imported when the snapshot has to be rebuilt, see load_and_merge_data
+IMPORTED = time.perf_counter()
+
+app = Dash(__name__, suppress_callback_exceptions=True)
+#this initializes the dash app and also suppress_callback exceptions has been used in order to allow callbacks
+#to work even if associated layout elements are not present
+
+METRICS.describe("dashboard_callback_seconds", "Duration of the dashboard callbacks, including the ones that send no update")
+METRICS.describe("dashboard_chart_cache_total", "Chart cache lookups by whether the figure was already built")
+METRICS.describe("dashboard_data_reloads_total", "New datasets swapped in by the data watcher")
+METRICS.describe("dashboard_startup_seconds", "Time spent starting the dashboard, by phase")
+
+
+@app.server.route('/metrics')
+def metrics_endpoint():
+    """serves the timings and counters of this process in the Prometheus text format.
+    under gunicorn every worker has its own numbers, so each scrape sees whichever worker answered
+    """
+    return Response(METRICS.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+
+def load_and_merge_data():
+    """loads the snapshot of the daily, weekly and 30 day tables precomputed for all four categories. if it is out of
+    date it is rebuilt first, along with the rollups and the dataset when they are out of date too, which is the
+    only time pandas is imported
+    """
+    if snapshot_stale():
+        # every gunicorn worker finds the snapshot out of date at the same moment, at midnight or after the scraper
+        # wrote new csvs. the first to get the lock rebuilds it and the others wait, then just map the new file
+        with rebuild_lock():
+            if snapshot_stale():
+                from price_data import build_snapshot
+                build_snapshot()
+    return load_snapshot()
+
+
+class ProductTable:
+    """maps product names to their rows of the snapshot, slicing them out the first time a product is asked for
+    and keeping them, so startup doesn't depend on the number of products
+    """
+
+    def __init__(self, positions, build):
+        self.positions = positions
+        self.build = build
+        self._built = {}
+
+    def __contains__(self, product):
+        return product in self.positions
+
+    def __getitem__(self, product):
+        value = self._built.get(product)
+        if value is None:
+            value = self._built[product] = self.build(self.positions[product])
+        return value
+
+    def get(self, product, default=None):
+        return self[product] if product in self.positions else default
+
+
+class PriceIndex:
+    """looks products up in the snapshot arrays so that the charts and stats don't compute anything on a callback.
+    only the product names are indexed when the data is loaded, everything else is sliced out on first use
+    """
+
+    def __init__(self, snapshot, version=1):
+        self.version = version
+        # counts the datasets loaded since the app started, so figures built from an older one are never reused
+        self.products = snapshot['products'].tolist()
+        positions = {product: position for position, product in enumerate(self.products)}
+
+        def stats(position):
+            values = dict(zip(STATS_COLUMNS, snapshot['stats'][position].tolist()))
+            values['previous'] = None if np.isnan(values['previous']) else values['previous']
+            return values
+
+        def rows(name, columns):
+            def build(position):
+                start, end = snapshot[f'{name}_bounds'][position]
+                table = {'date': snapshot[f'{name}_dates'][start:end]}
+                for column, values in zip(columns, snapshot[f'{name}_values'][start:end].T):
+                    table[column] = values
+                return table
+            return build
+
+        self.stats = ProductTable(positions, stats)
+        # product -> 30 day low, high, average, current and previous price
+        self.daily = ProductTable(positions, rows('daily', ['price']))
+        # product -> dates and prices on every day since the chart start date with the gaps filled
+        self.weekly = ProductTable(positions, rows('weekly', OHLC_COLUMNS))
+        # product -> dates and first, highest, lowest and last price of every week it sold in
+        self._search = None
+        self._resolved = {}
+
+    @property
+    def search(self):
+        """the prefix index of the product names, built by the first search"""
+        if self._search is None:
+            self._search = ProductSearchIndex(self.products)
+        return self._search
+
+    def resolve(self, product_name):
+        """returns the product a name refers to: the product itself if the name is exact, otherwise the first
+        product whose name contains it ignoring case, or None if nothing matches
+        """
+        if product_name in self.stats:
+            return product_name
+        if product_name not in self._resolved:
+            lowered = product_name.lower()
+            resolved = next((p for p in self.products if lowered in p.lower()), None)
+            if resolved is None:
+                # names come from the client, so only the ones naming a product are kept, which bounds the cache
+                # by the substrings of the product names
+                return None
+            self._resolved[product_name] = resolved
+        return self._resolved[product_name]
+
+
+CACHE_SIZE = 256
+#the most figures kept in memory at once
+
+
+class LRUCache:
+    """keeps the figures built by the chart functions so that revisiting a product or comparison set
+    returns the stored result instead of building it again. once maxsize entries are held the least recently
+    used one is dropped, and everything is dropped as soon as a newer dataset is used
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key, create):
+        """returns the entry stored under key for the given dataset version, calling create to build and store it
+        when there isn't one. results for an older version than the newest seen are built but never stored
+        """
+        with self._lock:
+            if version > self.version:
+                # a newer dataset has been swapped in so nothing cached so far can be trusted
+                self._entries.clear()
+                self.version = version
+            elif version == self.version and key in self._entries:
+                self._entries.move_to_end(key)
+                METRICS.inc('dashboard_chart_cache_total', result='hit')
+                return self._entries[key]
+
+        METRICS.inc('dashboard_chart_cache_total', result='miss')
+
+        value = create()
+        with self._lock:
+            if self.version == version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """drops every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+DATA_POLL_SECONDS = 30
+#how often the watcher checks the data files for changes
+
+
+class LiveData:
+    """holds the price index the callbacks read and swaps in a new one when the data files change.
+    the new index is built completely on the watcher thread and made visible by a single assignment, so a
+    callback that took the old index keeps using it until it returns and never sees a half loaded dataset
+    """
+
+    def __init__(self):
+        self.index = PriceIndex(load_and_merge_data())
+        self.files_version = dataset_version()
+        self._thread = None
+
+    def reload_if_changed(self):
+        """loads the data again if any data file changed, or the rollups are from an earlier day, and swaps
+        the new index in. returns True if it did
+        """
+        if dataset_version() == self.files_version and not snapshot_stale():
+            return False
+        index = PriceIndex(load_and_merge_data(), self.index.version + 1)
+        # rebuilding the snapshot writes it again, so the files are compared from here on
+        self.files_version = dataset_version()
+        self.index = index
+        METRICS.inc('dashboard_data_reloads_total')
+        print(f"Loaded price data version {index.version} with {len(index.products)} products")
+        return True
+
+    def start_watcher(self, interval=DATA_POLL_SECONDS):
+        """starts the background thread checking for new data every interval seconds, unless it is running.
+        threads don't survive a fork, so under gunicorn every worker starts its own after forking
+        """
+        if self._thread and self._thread.is_alive():
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_if_changed()
+                except Exception as e:
+                    # a file may be caught half written, the next check will see it again once it is complete
+                    print(f"Error reloading price data: {str(e)}")
+
+        self._thread = threading.Thread(target=watch, name="data-watcher", daemon=True)
+        self._thread.start()
+
+
+#The first step is to load the precomputed tables and index them by product
+live_data = LiveData()
+cache = LRUCache()
+LOADED = time.perf_counter()
+
+def calculate_30_day_stats(index, product_name):
+    """""the function looks up the statistics of any specific product over its last 30 prices,
+        which are precomputed in the rollup tables
+    """
+    return index.stats[index.resolve(product_name)]
+
+LINE_COLORS = ['#4457ec', '#10B981', '#EF4444', '#F59E0B', '#6366F1']
+#each line takes the colour at its position on the chart
+
+
+def plotted_product_names(index, product_names):
+    """returns the names that get a line on the price history chart in the order they are drawn.
+    names without any data are left out and a name picked twice is only drawn once
+    """
+    if isinstance(product_names, str):
+        product_names = [product_names]
+    elif product_names is None:
+        product_names = []
+    # converting product in string to list
+
+    plotted = []
+    for product_name in product_names:
+        if product_name in plotted:
+            continue
+        if index.resolve(product_name) is None:
+            # the above line finds the product whose name matches
+            print(f"Could not find data for product: {product_name}")
+            continue
+        plotted.append(product_name)
+    return plotted
+
+CHART_POINTS = 500
+#the most points sent for one line, whatever the length of its history or of the visible range. the chart is
+#about 1100 pixels wide so this is still close to one point for every two pixels
+
+
+EMPTY_PRICES = {'date': np.array([], dtype='datetime64[D]'), 'price': np.array([], dtype=float)}
+#what products without any price since the chart start date draw
+
+
+def downsample(dates, prices, points=CHART_POINTS):
+    """shrinks a price series to at most points entries by splitting it into points // 2 equal buckets and
+    keeping the lowest and highest price of each, so the drawn line keeps every spike and dip
+    """
+    if len(prices) <= points:
+        return dates, prices
+    buckets = np.arange(len(prices)) * (points // 2) // len(prices)
+    bounds = np.flatnonzero(np.diff(buckets)) + 1
+    # sorted by bucket and then by price, the first and last position of every bucket are its low and high
+    order = np.lexsort((prices, buckets))
+    keep = np.union1d(order[np.r_[0, bounds]], order[np.r_[bounds - 1, len(prices) - 1]])
+    return dates[keep], prices[keep]
+
+def visible_prices(dates, prices, x_range=None):
+    """returns the part of the price series inside the visible date range, plus the closest price on either
+    side so the line still runs to the edges of the chart
+    """
+    if x_range is None:
+        return dates, prices
+    start = np.searchsorted(dates, np.datetime64(x_range[0], 'D'), side='left')
+    end = np.searchsorted(dates, np.datetime64(x_range[1], 'D'), side='right')
+    return dates[max(start - 1, 0):end + 1], prices[max(start - 1, 0):end + 1]
+
+def create_line_trace(index, product_name, position, x_range=None):
+    """creates the line of daily filled prices for one product, coloured by its position on the chart.
+    only the visible date range is sent, downsampled to CHART_POINTS
+    """
+    daily = index.daily.get(index.resolve(product_name), EMPTY_PRICES)
+    dates, prices = downsample(*visible_prices(daily['date'], daily['price'], x_range))
+    return go.Scatter(
+        x=dates,
+        y=prices,
+        mode='lines',
+        name=product_name,
+        line=dict(color=LINE_COLORS[position % len(LINE_COLORS)], width=2),
+        hovertemplate='$%{y:.2f}<extra>%{x|%b %d, %Y}</extra>'
+    )
+
+def create_line_chart(index, product_names, x_range=None):
+    """the function will create the line chart
+    and will filter the dataset for the product selected
+    We have used dark mode and dynamic coloring
+    """
+    fig = go.Figure()
+    # initializing an empty Plotly figure
+
+    plotted = plotted_product_names(index, product_names)
+    for idx, product_name in enumerate(plotted):
+        fig.add_trace(create_line_trace(index, product_name, idx, x_range))
+
+    fig.update_layout(
+        plot_bgcolor='#1e293b',
+        paper_bgcolor='#1e293b',
+        font=dict(color='white', size=10),
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255, 255, 255, 0.1)',
+            tickformat='%b %d\n%Y',
+            tickangle=45,
+            tickmode='auto',
+            nticks=15,
+            title_text=None,
+            tickfont=dict(size=10),
+            rangeslider=dict(visible=False),
+            type='date',
+            dtick='M1',
+            ticklabelmode='period',
+            range=list(x_range) if x_range else None
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(255, 255, 255, 0.1)',
+            tickprefix='$',
+            title_text=None,
+            tickfont=dict(size=10),
+            zeroline=False
+        ),
+        margin=dict(l=50, r=20, t=10, b=50),
+        height=600,
+        width=1200,
+        hovermode='x unified',
+        uirevision=plotted[0] if plotted else None,
+        #keeps the user's zoom when the lines are replaced for the same product
+        showlegend=True,
+        legend=dict(
+            bgcolor='rgba(0,0,0,0)',
+            bordercolor='rgba(255,255,255,0.1)',
+            borderwidth=1,
+            font=dict(size=10),
+            yanchor="top",
+            y=0.99,
+            xanchor="right",
+            x=0.99
+        )
+    )
+
+    return fig
+
+def calculate_weekly_ohlc(index, product):
+    """returns the precomputed first, highest, lowest and last price of every week the product sold in"""
+    return index.weekly[product]
+
+def create_candlestick_chart(index, product_name):
+    """creates a candlestick chart and it will handle exceptions too by returning an empty figure
+    in case any error occurs
+    """
+    try:
+        product = index.resolve(product_name)
+        if product is None:
+            raise ValueError(f"Product not found: {product_name}")
+
+        weekly = calculate_weekly_ohlc(index, product)
+
+        fig = go.Figure(data=[go.Candlestick(
+            x=weekly['date'],
+            open=weekly['open'],
+            high=weekly['high'],
+            low=weekly['low'],
+            close=weekly['close'],
+            increasing_line_color='#10B981',
+            decreasing_line_color='#EF4444',
+            name=product_name
+        )])
+
+        fig.update_layout(
+            plot_bgcolor='#1e293b',
+            paper_bgcolor='#1e293b',
+            font=dict(color='white', size=10),
+            xaxis=dict(
+                showgrid=True,
+                gridcolor='rgba(255, 255, 255, 0.1)',
+                tickformat='%b %d\n%Y',
+                tickangle=45,
+                nticks=20,
+                tickmode='auto',
+                title_text=None,
+                tickfont=dict(size=10),
+                rangeslider=dict(visible=False),
+            ),
+            yaxis=dict(
+                showgrid=True,
+                gridcolor='rgba(255, 255, 255, 0.1)',
+                tickprefix='$',
+                title_text=None,
+                tickfont=dict(size=10),
+                zeroline=False
+            ),
+            margin=dict(l=50, r=20, t=10, b=50),
+            height=500,
+            width=1000,
+            hovermode='x unified'
+        )
+
+        return fig
+    except Exception as e:
+        print(f"Error creating candlestick chart for {product_name}: {str(e)}")
+        return go.Figure()
+
+def search_options(matches, selected=None):
+    """turns search matches into dropdown options, keeping the selected products in the list so the dropdown
+    can still show them after the user types something else
+    """
+    if isinstance(selected, str):
+        selected = [selected]
+    names = list(selected or []) + [m for m in matches if m not in (selected or [])]
+    return [{'label': p, 'value': p} for p in names]
+
+def get_line_chart(index, product_name, compare_products=None, x_range=None):
+    """returns the price history chart for the product and comparison set, reusing it from the cache if possible.
+    charts zoomed into a date range are built every time since the same range is rarely asked for twice
+    """
+    compare_key = tuple(compare_products) if compare_products else ()
+    if x_range:
+        return create_line_chart(index, [product_name] + list(compare_key), x_range)
+    return cache.get(index.version, ('line', product_name, compare_key),
+                     lambda: create_line_chart(index, [product_name] + list(compare_key)))
+
+def zoomed_range(relayout_data):
+    """reads the visible date range out of the chart's relayoutData. returns None when the user zoomed back
+    out to the whole history, and no_update when the event wasn't a change of the date axis
+    """
+    if not relayout_data:
+        return no_update
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+    if 'xaxis.range' in relayout_data:
+        return list(relayout_data['xaxis.range'])
+    return no_update
+
+def create_product_page(index, product_name, compare_products=None):
+    """this function will diaplay all the main features of the product.
+    it is only built when a product is opened: changing the comparison updates the price history chart alone
+    """
+    stats = calculate_30_day_stats(index, product_name)
+    # this looks up the 30-day stats for the selected product
+    price_change = ((stats['current'] - stats['previous']) / stats['previous'] * 100) if stats['previous'] else 0
+    #the lines of codes below basically create a header for displaying the product name and its price info
+    #and also displays the low high and average price of the product
+    return html.Div([
+        html.Div([
+            html.Div([
+                html.H1(product_name, className="product-title"),
+                html.Div([
+                    html.H2(f"${stats['current']:.2f}", className="current-price"),
+                    html.Div([
+                        html.Span(
+                            f"{'+' if price_change >= 0 else ''}{price_change:.2f}% vs previous",
+                            className=f"price-change {'positive' if price_change >= 0 else 'negative'}"
+                        )
+                    ], className="price-change-container")
+                ], className="price-info")
+            ], className="product-header-content")
+        ], className="product-header"),
+
+        html.Div([
+            html.Div([
+                html.H3("30-Day Low", className="stat-title"),
+                html.Div(f"${stats['low']:.2f}", className="stat-value"),
+                html.Div("Last 30 days", className="stat-subtitle")
+            ], className="stat-card"),
+            html.Div([
+                html.H3("30-Day High", className="stat-title"),
+                html.Div(f"${stats['high']:.2f}", className="stat-value"),
+                html.Div("Last 30 days", className="stat-subtitle")
+            ], className="stat-card"),
+            html.Div([
+                html.H3("30-Day Average", className="stat-title"),
+                html.Div(f"${stats['average']:.2f}", className="stat-value"),
+                html.Div("Last 30 days", className="stat-subtitle")
+            ], className="stat-card"),
+        ], className="stats-container"),
+
+        html.Div([
+            html.H3("Compare with other products", className="section-title"),
+            dcc.Dropdown(
+                id='compare-dropdown',
+                options=search_options([], compare_products),
+                #only the selected products are sent with the page, the rest are looked up as the user types
+                value=compare_products,
+                multi=True,
+                className="compare-dropdown",
+                placeholder="Select products to compare..."
+            ),
+        ], className="compare-section"),
+
+        dcc.Store(id='plotted-products-store',
+                  data=plotted_product_names(index, [product_name] + (compare_products or []))),
+        #the names drawn on the price history chart, so a comparison change knows which lines are already there
+        dcc.Store(id='chart-range-store'),
+        #the date range the user zoomed the price history chart into, or nothing when the whole history is shown
+
+        html.Div([
+            html.Div([
+                html.H3("Price History", className="chart-title"),
+                dcc.Graph(
+                    id='price-chart',
+                    figure=get_line_chart(index, product_name, compare_products),
+                    className="price-chart",
+                    config={'displayModeBar': False}
+                )
+            ], className="chart-container"),
+
+            html.Div([
+                html.H3("Weekly Price Ranges", className="chart-title"),
+                dcc.Graph(
+                    figure=cache.get(index.version, ('candlestick', product_name),
+                                     lambda: create_candlestick_chart(index, product_name)),
+                    className="candlestick-chart",
+                    config={'displayModeBar': False}
+                )
+            ], className="chart-container")
+        ], className="charts-container")
+    ], className="product-page")
+
+# Main app layout
+app.layout = html.Div([
+    dcc.Store(id='current-product-store'),
+    html.Header([
+        html.Div([
+            html.H1("Hardware Price Tracker", className="nav-title-large"),
+            dcc.Dropdown(
+                id="product-search",
+                options=[],
+                #matches are looked up on the server as the user types instead of sending the whole catalog
+                placeholder="Search for a product...",
+                className="search-dropdown",
+                searchable=True,
+                clearable=True,
+            )
+        ], className="header-content")
+    ], className="header"),
+
+    html.Main([
+        html.Div([
+            html.H2("Welcome to Hardware Price Tracker", className="welcome-title"),
+            html.P("Select a product to view detailed price analysis and history.",
+                  className="welcome-subtitle"),
+
+            html.Div([
+                html.H3("Popular CPU Products", className="section-title"),
+                html.P("Explore a selection of the latest and most powerful CPU options from leading manufacturers.",
+                      className="section-description"),
+                html.Div([
+                    html.Div([
+                        html.H4(product, className="product-title"),
+                        html.P("High-performance CPU with advanced features for demanding workloads.",
+                              className="product-description"),
+                        html.Button("View Details", id={"type": "product-button", "index": i},
+                                  className="product-button")
+                    ], className="product-card")
+                    for i, product in enumerate([
+                        'AMD Ryzen 7 5800X',
+                        'Intel Core i7-12700K',
+                        'AMD Ryzen 9 5950X'
+                    ])
+                ], className="product-grid"),
+            ], className="product-section"),
+
+            html.Div(style={"height": "3rem"}),
+
+            html.Div([
+                html.H3("Popular GPU Products", className="section-title"),
+                html.P("Check out the latest and most powerful graphics cards for gaming, content creation, and beyond.",
+                      className="section-description"),
+                html.Div([
+                    html.Div([
+                        html.H4(product, className="product-title"),
+                        html.P("Cutting-edge GPU with advanced ray tracing and powerful features.",
+                              className="product-description"),
+                        html.Button("View Details", id={"type": "product-button", "index": i + 3},
+                                  className="product-button")
+                    ], className="product-card")
+                    for i, product in enumerate([
+                        'GeForce RTX 4090',
+                        'Radeon RX 7900 XTX',
+                        'GeForce RTX 4080'
+                    ])
+                ], className="product-grid"),
+            ], className="product-section"),
+
+            html.Div(style={"height": "3rem"}),
+
+            html.Div([
+                html.H2("Featured Hardware", className="section-title"),
+                html.Div([
+                    html.Div([
+                        html.H4('Intel Core i9-13900K', className="product-title"),
+                        html.P("High-performance CPU with 12 cores for demanding workloads.",
+                              className="product-description"),
+                        html.Button("View Details", id={"type": "featured-button", "index": 0},
+                                  className="product-button")
+                    ], className="product-card"),
+                    html.Div([
+                        html.H4('GeForce RTX 4070 Ti', className="product-title"),
+                        html.P("Powerful GPU with advanced features.", className="product-description"),
+                        html.Button("View Details", id={"type": "featured-button", "index": 1},
+                                  className="product-button")
+                    ], className="product-card")], className="product-grid")
+            ], className="featured-section"),
+            html.Div(style={"height": "3rem"}),
+
+            html.Div([
+                html.H2("Latest Hardware News", className="section-title news-title"),
+                html.Div([
+                    html.Div([
+                        html.H3("NVIDIA Announces New GeForce RTX 5000 Series", className="news-title"),
+                        html.P(
+                            "The latest GPUs promise even more powerful performance for gaming and content creation.",
+                            className="news-description"),
+                        html.A("Read More", href="#", className="news-link")
+                    ], className="news-item"),
+                    html.Div([
+                        html.H3("AMD Unveils Ryzen 7000 CPUs with New Zen 4 Architecture", className="news-title"),
+                        html.P("The new Ryzen CPUs offer significant improvements in processing power and efficiency.",
+                               className="news-description"),
+                        html.A("Read More", href="#", className="news-link")
+                    ], className="news-item"),
+                    html.Div([
+                        html.H3("Intel Launches 13th Gen Core Processors", className="news-title"),
+                        html.P(
+                            "Intel's latest CPUs deliver enhanced performance and power efficiency for various workloads.",
+                            className="news-description"),
+                        html.A("Read More", href="#", className="news-link")
+                    ], className="news-item")
+                ], className="news-grid")
+            ], className="news-section")
+        ], id="page-content", className="main-content")
+    ]),
+])
+
+#how long each phase of the startup took, also served on /metrics as dashboard_startup_seconds
+STARTUP_SECONDS = {
+    'imports': IMPORTED - STARTED,
+    'data': LOADED - IMPORTED,
+    'layout': time.perf_counter() - LOADED,
+}
+STARTUP_SECONDS['total'] = sum(STARTUP_SECONDS.values())
+for phase, seconds in STARTUP_SECONDS.items():
+    METRICS.observe('dashboard_startup_seconds', seconds, phase=phase)
+print(f"Dashboard started in {STARTUP_SECONDS['total']:.2f}s (imports {STARTUP_SECONDS['imports']:.2f}s, "
+      f"data {STARTUP_SECONDS['data']:.2f}s, layout {STARTUP_SECONDS['layout']:.2f}s)")
+
+
+# callbacks
+@app.callback(
+    [Output("page-content", "children"),
+     Output("current-product-store", "data")],
+    [Input("product-search", "value"),
+     Input({"type": "product-button", "index": ALL}, "n_clicks"),
+     Input({"type": "featured-button", "index": ALL}, "n_clicks")],
+    prevent_initial_call=True
+)
+@METRICS.timed('dashboard_callback_seconds', callback='update_page')
+def update_page(search_value, product_button_clicks, featured_button_clicks):
+    ctx = callback_context
+    if not ctx.triggered:
+        return app.layout.children[1].children, None
+
+    trigger_id = ctx.triggered[0]["prop_id"]
+    current_product = None
+    index = live_data.index
+
+    try:
+        if trigger_id == "product-search.value" and search_value:
+            current_product = search_value
+            return create_product_page(index, current_product), current_product
+
+        elif "product-button" in trigger_id:
+            button_index = int(eval(trigger_id.split('.')[0])["index"])
+            if any(n for n in product_button_clicks if n):
+                all_products = [
+                    'AMD Ryzen 7 5800X',
+                    'Core i7-12700K',
+                    'AMD Ryzen 9 5950X',
+                    'GeForce RTX 4090',
+                    'Radeon RX 7900 XTX',
+                    'GeForce RTX 4080'
+                ]
+
+                if button_index < len(all_products):
+                    current_product = all_products[button_index]
+                    return create_product_page(index, current_product), current_product
+
+        elif "featured-button" in trigger_id:
+            button_index = int(eval(trigger_id.split('.')[0])["index"])
+            if any(n for n in featured_button_clicks if n):
+                featured_products = [
+                    'Core i9-13900K',
+                    'GeForce RTX 4070 Ti'
+                ]
+                if button_index < len(featured_products):
+                    current_product = featured_products[button_index]
+                    return create_product_page(index, current_product), current_product
+
+        return app.layout.children[1].children, None
+    except Exception as e:
+        print(f"Error in update_page: {str(e)}")
+        return app.layout.children[1].children, None
+
+
+@app.callback(
+    Output("product-search", "options"),
+    [Input("product-search", "search_value")],
+    [State("product-search", "value")]
+)
+@METRICS.timed('dashboard_callback_seconds', callback='update_search_options')
+def update_search_options(search_value, value):
+    if not search_value:
+        raise PreventUpdate
+
+    return search_options(live_data.index.search.search(search_value), value)
+
+
+@app.callback(
+    Output("compare-dropdown", "options"),
+    [Input("compare-dropdown", "search_value")],
+    [State("compare-dropdown", "value")]
+)
+@METRICS.timed('dashboard_callback_seconds', callback='update_compare_options')
+def update_compare_options(search_value, compare_products):
+    if not search_value:
+        raise PreventUpdate
+
+    return search_options(live_data.index.search.search(search_value), compare_products)
+
+
+@app.callback(
+    [Output("price-chart", "figure"),
+     Output("plotted-products-store", "data")],
+    [Input("compare-dropdown", "value")],
+    [State("current-product-store", "data"),
+     State("plotted-products-store", "data"),
+     State("chart-range-store", "data")],
+    prevent_initial_call=True
+)
+@METRICS.timed('dashboard_callback_seconds', callback='update_comparison')
+def update_comparison(compare_products, current_product, plotted, x_range):
+    if not current_product:
+        raise PreventUpdate
+
+    plotted = plotted or []
+    index = live_data.index
+    # the index is read once so the whole callback uses the same dataset even if a new one is swapped in meanwhile
+    new_plotted = plotted_product_names(index, [current_product] + (compare_products or []))
+    if new_plotted == plotted:
+        raise PreventUpdate
+
+    if new_plotted[:len(plotted)] == plotted:
+        # products were only added, so only their lines are sent and appended to the chart already in the browser
+        fig = Patch()
+        for idx in range(len(plotted), len(new_plotted)):
+            fig['data'].append(create_line_trace(index, new_plotted[idx], idx, x_range))
+        return fig, new_plotted
+
+    # a product was removed, which shifts the colours of the lines after it, so the whole chart is replaced
+    return get_line_chart(index, current_product, compare_products, x_range), new_plotted
+
+
+@app.callback(
+    [Output("price-chart", "figure", allow_duplicate=True),
+     Output("chart-range-store", "data")],
+    [Input("price-chart", "relayoutData")],
+    [State("plotted-products-store", "data")],
+    prevent_initial_call=True
+)
+@METRICS.timed('dashboard_callback_seconds', callback='update_chart_range')
+def update_chart_range(relayout_data, plotted):
+    x_range = zoomed_range(relayout_data)
+    if x_range is no_update or not plotted:
+        raise PreventUpdate
+
+    # only the points of every line are replaced, at full detail for the zoomed range or downsampled for the
+    # whole history, so the figure sent stays about the same size however long the history is
+    index = live_data.index
+    fig = Patch()
+    for idx, product_name in enumerate(plotted):
+        trace = create_line_trace(index, product_name, idx, x_range)
+        fig['data'][idx]['x'] = trace.x
+        fig['data'][idx]['y'] = trace.y
+    return fig, x_range
+
+
+if __name__ == '__main__':
+    # development server; see wsgi.py and gunicorn.conf.py for serving with several workers
+    live_data.start_watcher()
+    app.run(debug=True)
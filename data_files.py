@@ -0,0 +1,216 @@
+import contextlib
+import json
+import mmap
+import os
+import threading
+from datetime import date, datetime
+
+import numpy as np
+
+# Wide CSVs written by ebay_price_logger_daily.py, keyed by the category they hold
+CATEGORY_FILES = {
+    "AMD_CPU": "assets/Average_Price_By_Day_AMD_CPU.csv",
+    "AMD_GPU": "assets/Average_Prices_By_Day_AMD_GPU.csv",
+    "Intel_CPU": "assets/Average_Prices_By_Day_Intel_CPU.csv",
+    "NVIDIA_GPU": "assets/Average_Prices_By_Day_NVIDIA_GPU.csv",
+}
+DATASET_FILE = "assets/price_history.parquet"
+# Tables precomputed from the dataset so the dashboard only has to look products up
+ROLLUP_FILES = {
+    "daily": "assets/price_daily.parquet",
+    "weekly": "assets/price_weekly.parquet",
+    "stats": "assets/price_stats.parquet",
+}
+# The rollups as plain arrays in one file, which the dashboard memory-maps at startup without pandas or pyarrow
+SNAPSHOT_FILE = "assets/dashboard_snapshot.bin"
+SNAPSHOT_MAGIC = b"HPCSNAP1"
+SNAPSHOT_ALIGNMENT = 64  # Every array starts at a multiple of this many bytes
+# Held by the process rebuilding the dataset, rollups and snapshot, so several dashboard workers finding them out of
+# date at the same moment rebuild them once
+REBUILD_LOCK_FILE = "assets/.rebuild.lock"
+STATS_COLUMNS = ["low", "high", "average", "current", "previous"]
+OHLC_COLUMNS = ["open", "high", "low", "close"]
+
+
+def is_stale(path=DATASET_FILE, files=None):
+    """
+    Check whether the dataset is missing or older than any of the wide CSVs it is built from.
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :param files: Category to CSV path mapping; defaults to CATEGORY_FILES.
+    :type files: dict
+    :return: True if the dataset needs to be rebuilt.
+    """
+    if not os.path.exists(path):
+        return True
+    built_at = os.path.getmtime(path)
+    return any(os.path.getmtime(csv_path) > built_at for csv_path in (files or CATEGORY_FILES).values()
+               if os.path.exists(csv_path))
+
+
+def rollups_stale(path=DATASET_FILE, files=None):
+    """
+    Check whether any rollup table is missing, older than the dataset, or was built before today and so
+    doesn't reach today in its daily table.
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :param files: Table name to Parquet path mapping; defaults to ROLLUP_FILES.
+    :type files: dict
+    :return: True if the rollups need to be rebuilt.
+    """
+    files = files or ROLLUP_FILES
+    if any(not os.path.exists(rollup_path) for rollup_path in files.values()):
+        return True
+    built_at = min(os.path.getmtime(rollup_path) for rollup_path in files.values())
+    if os.path.exists(path) and os.path.getmtime(path) > built_at:
+        return True
+    return datetime.fromtimestamp(built_at).date() < date.today()
+
+
+def snapshot_stale(snapshot=SNAPSHOT_FILE, path=DATASET_FILE, files=None):
+    """
+    Check whether the snapshot is missing, older than the rollups it is written from, or anything it
+    depends on needs rebuilding.
+    :param snapshot: Path of the snapshot.
+    :type snapshot: str
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :param files: Table name to Parquet path mapping; defaults to ROLLUP_FILES.
+    :type files: dict
+    :return: True if the snapshot needs to be rebuilt.
+    """
+    files = files or ROLLUP_FILES
+    if not os.path.exists(snapshot) or is_stale(path) or rollups_stale(path, files):
+        return True
+    return any(os.path.getmtime(rollup_path) > os.path.getmtime(snapshot) for rollup_path in files.values())
+
+
+@contextlib.contextmanager
+def replaced_atomically(path):
+    """
+    Give a temporary path next to `path` to write a file to, and rename it over `path` once the block completes,
+    so a reader only ever sees the old file or the new one. The temporary name is unique to the process and
+    thread, so writers of the same file at the same time never write into each other's copy.
+    :param path: Path of the file to write.
+    :type path: str
+    :return: A context manager giving the temporary path.
+    """
+    directory, name = os.path.split(path)
+    temporary = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+@contextlib.contextmanager
+def rebuild_lock(lock_file=REBUILD_LOCK_FILE):
+    """
+    Hold an exclusive lock on `lock_file` for the duration of the block, waiting until no other process holds
+    it. Without fcntl (on Windows) nothing is locked.
+    :param lock_file: Path of the lock file, created if missing.
+    :type lock_file: str
+    :return: A context manager.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(lock_file, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def dataset_version(path=DATASET_FILE, files=None):
+    """
+    Identify the current state of the dataset, the wide CSVs it is built from, and the rollups and snapshot
+    built from it by their modification times.
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :param files: Category to CSV path mapping; defaults to CATEGORY_FILES.
+    :type files: dict
+    :return: A tuple that changes whenever any of the files is written, added or removed.
+    """
+    paths = [path] + list((files or CATEGORY_FILES).values()) + list(ROLLUP_FILES.values()) + [SNAPSHOT_FILE]
+    return tuple(os.stat(file_path).st_mtime_ns if os.path.exists(file_path) else None for file_path in paths)
+
+
+def product_bounds(table_products, products):
+    """
+    Find where each product's rows start and end in a table whose rows are grouped by product.
+    :param table_products: The table's product column.
+    :type table_products: numpy.ndarray
+    :param products: The products to look up, in output order.
+    :type products: numpy.ndarray
+    :return: An array with a (start, end) row per product; (0, 0) for products without any rows.
+    """
+    if not len(table_products):
+        return np.zeros((len(products), 2), dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, table_products[1:] != table_products[:-1]])
+    ends = np.r_[starts[1:], len(table_products)]
+    positions = {product: (start, end) for product, start, end in zip(table_products[starts], starts, ends)}
+    return np.array([positions.get(product, (0, 0)) for product in products], dtype=np.int64).reshape(-1, 2)
+
+
+def write_snapshot(rollups, snapshot=SNAPSHOT_FILE):
+    """
+    Write the rollup tables as the plain arrays the dashboard loads: the products, their stats, and the
+    dates and values of the daily and weekly tables with the rows each product spans.
+    The arrays are stored one after the other in their in-memory layout, followed by a JSON index of their
+    names, types, shapes and offsets, the index's length and SNAPSHOT_MAGIC, so the file can be memory-mapped
+    and every array used in place.
+    :param rollups: The tables returned by price_data.build_rollups.
+    :type rollups: dict
+    :param snapshot: Path of the snapshot to write.
+    :type snapshot: str
+    :return: None
+    """
+    products = rollups["stats"]["product"].astype(str).to_numpy(dtype=str)
+    arrays = {"products": products, "stats": rollups["stats"][STATS_COLUMNS].to_numpy(dtype=np.float64)}
+    for name, columns in (("daily", ["price"]), ("weekly", OHLC_COLUMNS)):
+        table = rollups[name]
+        arrays[f"{name}_bounds"] = product_bounds(table["product"].astype(str).to_numpy(dtype=str), products)
+        arrays[f"{name}_dates"] = table["date"].to_numpy(dtype="datetime64[D]")
+        arrays[f"{name}_values"] = table[columns].to_numpy(dtype=np.float64)
+
+    index = {}
+    # Written under a temporary name and renamed, so a dashboard never loads a half-written snapshot, and the
+    # workers still mapping the old file keep reading it until they load the new one
+    with replaced_atomically(snapshot) as temporary, open(temporary, "wb") as f:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            f.write(b"\0" * (-f.tell() % SNAPSHOT_ALIGNMENT))
+            index[name] = {"dtype": array.dtype.str, "shape": array.shape, "offset": f.tell()}
+            f.write(array.tobytes())
+        header = json.dumps(index).encode("utf-8")
+        f.write(header + len(header).to_bytes(8, "little") + SNAPSHOT_MAGIC)
+
+
+def load_snapshot(snapshot=SNAPSHOT_FILE):
+    """
+    Memory-map the arrays written by write_snapshot. Nothing is read up front: the pages of an array are
+    read from the page cache as it is used, and every process mapping the same file shares them, so each
+    dashboard worker adds little memory of its own however large the dataset is.
+    :param snapshot: Path of the snapshot.
+    :type snapshot: str
+    :return: A dictionary of read-only arrays by name.
+    """
+    with open(snapshot, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_RANDOM"):
+        # Products are looked up one at a time all over the file, where reading ahead only fills memory
+        mapped.madvise(mmap.MADV_RANDOM)
+    data = np.frombuffer(mapped, dtype=np.uint8)
+    if data.size < 16 or bytes(data[-8:]) != SNAPSHOT_MAGIC:
+        raise ValueError(f"{snapshot} is not a dashboard snapshot; rebuild it with `python price_data.py`")
+    length = int.from_bytes(bytes(data[-16:-8]), "little")
+    index = json.loads(bytes(data[-16 - length:-16]).decode("utf-8"))
+    return {name: np.ndarray(tuple(entry["shape"]), dtype=np.dtype(entry["dtype"]), buffer=data,
+                             offset=entry["offset"])
+            for name, entry in index.items()}
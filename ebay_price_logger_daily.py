@@ -1,150 +1,1263 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
-import os
-
-
-def fetch_listings(search_keywords, page_number):
-    """
-    Fetch listings from eBay based on search keywords and page number.
-    :param search_keywords: List of keywords for the search query.
-    :type search_keywords: list
-    :param page_number: The page number to fetch listings from.
-    :type page_number: int
-    :return: A BeautifulSoup object containing the listings section.
-    """
-    search_query = "+".join(search_keywords)
-    url = (
-        f"https://www.ebay.com/sch/i.html?_nkw={search_query}&_sacat=0&rt=nc&LH_Sold=1&LH_Complete=1&_pgn={page_number}"
-    )
-    response = requests.get(url)
-    doc = BeautifulSoup(response.text, "html.parser")
-    return doc.find(class_="srp-results srp-list clearfix")
-
-
-def parse_listing(item):
-    """
-    Extract title, price, date, link, and condition from a listing.
-    :param item: A BeautifulSoup object representing a single listing.
-    :type item: bs4.element.Tag
-    :return: A tuple containing title, price, date, link, and condition.
-    """
-    title = item.find(class_="s-item__title").text.lower()
-    price = item.find(class_="s-item__price").text
-    date = item.find(class_="POSITIVE").string.replace("Sold", "").strip()  # Use raw date
-    link = item.find(class_="s-item__link")['href'].split("?")[0]
-    condition = item.find(class_="s-item__subtitle").text.lower() if item.find(class_="s-item__subtitle") else "Unknown"
-    return title, price, date, link, condition
-
-
-def is_valid_title(title, search_keywords):
-    """
-    Check if the title contains all search keywords as standalone words.
-    :param title: The title of the listing.
-    :type title: str
-    :param search_keywords: List of keywords to check in the title.
-    :type search_keywords: list
-    :return: True if the title contains all search keywords, False otherwise.
-    """
-    title_words = title.split()
-    for keyword in search_keywords:
-        if keyword not in title_words:
-            return False
-    return True
-
-
-def process_price(price):
-    """
-    Clean and process the price string into a numeric value.
-    :param price: The price string from the listing.
-    :type price: str
-    :return: The processed price as a numeric value.
-    """
-    price = price.replace("$", "").replace(",", "")
-    if 'to' in price:
-        price = sum(float(num) for num in price.split() if num != 'to') / 2
-    return round(float(price), 2)
-
-
-def scrape_ebay_for_term(search_term, month_price_dict):
-    """
-    Scrape eBay for the given search term and populate the month-price map.
-    :param search_term: The search term to query on eBay.
-    :type search_term: str
-    :param month_price_dict: A dictionary to store prices grouped by date.
-    :type month_price_dict: dict
-    :return: None
-    """
-    search_keywords = search_term.lower().split()
-
-    for page_number in range(1, 14):
-        listings_section = fetch_listings(search_keywords, page_number)
-        if not listings_section:
-            continue
-
-        listings = listings_section.find_all("li", class_="s-item s-item__pl-on-bottom")
-        for item in listings:
-            try:
-                title, price, date, link, condition = parse_listing(item)
-                if is_valid_title(title, search_keywords):
-                    price_value = process_price(price)
-                    # Only consider prices between $10 and $900
-                    if 10 < price_value < 900:
-                        if date not in month_price_dict:
-                            month_price_dict[date] = []
-                        month_price_dict[date].append(price_value)
-            except ValueError:
-                continue
-
-
-def main():
-    """
-    Main function to process search terms, scrape eBay, and save results to a CSV file.
-    :return: None
-    """
-    input_file = input("Input file (search_terms_NVIDIA_GPU.csv): ")  # Input file containing search terms
-    output_file = f"Average_Prices_By_Day_{input_file}"  # Summary output file
-
-    # Check input file exists
-    if not os.path.exists(input_file):
-        print(f"Error: '{input_file}' not found. Make sure the file exists.")
-        return
-
-    summary_data = {}
-
-    # Process each search term
-    with open(input_file, "r", newline="", encoding="utf-8") as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if row:  # Ignore empty rows
-                search_term = row[0].strip()  # Extract the search term from the first column
-                if search_term:
-                    print(f"Processing: {search_term}")
-                    month_price_dict = {}  # Store prices grouped by date
-                    scrape_ebay_for_term(search_term, month_price_dict)
-
-                    # Calculate average prices for each date
-                    daily_averages = {
-                        date: round(sum(prices) / len(prices), 2)
-                        for date, prices in month_price_dict.items()
-                    }
-                    summary_data[search_term] = daily_averages
-
-    # Write summary data to the output CSV file
-    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.writer(csvfile)
-
-        # Generate a header with all unique dates from all search terms
-        all_dates = sorted({date for averages in summary_data.values() for date in averages.keys()})
-        header = ["CPU Name"] + all_dates
-        writer.writerow(header)
-
-        # Write rows for each search term with corresponding averages
-        for search_term, daily_averages in summary_data.items():
-            row = [search_term] + [daily_averages.get(date, "") for date in all_dates]
-            writer.writerow(row)
-
-    print(f"Summary data written to {output_file}")
-
-
-main()
\ No newline at end of file
+from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+from data_files import replaced_atomically
+from listing_store import ListingStore, DEFAULT_STORE
+from metrics import METRICS
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from price_stats import PriceStats, dump_daily_stats, load_daily_stats, daily_averages
+from scrape_journal import ScrapeJournal
+from term_matcher import TermMatcher, term_key
+import requests
+import argparse
+import contextlib
+import multiprocessing
+import threading
+import math
+import random
+import time
+import json
+import glob
+import csv
+import os
+import re
+
+EBAY_SEARCH_URL = "https://www.ebay.com/sch/i.html"
+PAGES_PER_TERM = 13  # Upper bound on result pages requested per search term
+RESULTS_PER_PAGE = 60
+PAGE_WAVE_SIZE = 4  # Pages requested together before checking whether to stop paginating
+MAX_CONCURRENT_REQUESTS = 8  # Upper bound on page requests in flight across all search terms
+REQUESTS_PER_SECOND = 4.0  # Highest per-host request rate; the limiter slows down from here when eBay throttles
+MIN_REQUESTS_PER_SECOND = 0.2  # The per-host rate is never slowed down below this
+RATE_STEP = 0.1  # Requests per second the per-host rate speeds back up by after every successful request
+THROTTLE_COOLDOWN = 2.0  # Seconds after slowing a host down during which further throttled requests don't slow it again
+REQUEST_TIMEOUT = (5, 30)  # Seconds to wait for a connection and for the response
+MAX_ATTEMPTS = 5  # Tries per page before giving up on it
+BACKOFF_BASE = 1.0  # Retry n waits a random time up to BACKOFF_BASE * 2 ** (n - 1) seconds, at most BACKOFF_CAP
+BACKOFF_CAP = 60.0
+THROTTLE_STATUSES = (429, 503)
+BLOCK_PAGE_MARKERS = ("splashui/captcha", "Pardon Our Interruption", "g-recaptcha")  # Signs of a bot check page
+PARSE_WORKERS = max((os.cpu_count() or 1) - 1, 1)  # Processes parsing result pages; 0 parses on the fetch threads
+PARSER_BACKEND = "html.parser"  # "html.parser" (BeautifulSoup) or "lxml" (faster, needs lxml installed)
+# What reading a listing raises when eBay left out a field or changed its markup; such listings are counted and skipped
+LISTING_ERRORS = (AttributeError, KeyError, TypeError, ValueError)
+MIN_PRICE = 10  # Only prices strictly between these bounds are kept
+MAX_PRICE = 900
+
+METRICS.describe("scraper_fetch_seconds", "Duration of live result page requests")
+METRICS.describe("scraper_rate_limit_wait_seconds", "Time spent waiting for the per-host rate limit before a request")
+METRICS.describe("scraper_fetch_bytes_total", "Bytes of result pages downloaded")
+METRICS.describe("scraper_page_fetches_total", "Result pages fetched, by where they came from and the HTTP status")
+METRICS.describe("scraper_parse_seconds", "Duration of parsing a result page, including waiting for a parse worker")
+METRICS.describe("scraper_pages_total", "Result pages parsed, by whether they had new listings on them")
+METRICS.describe("scraper_listings_total", "Listings parsed, by whether they were accepted or why they were rejected")
+METRICS.describe("scraper_term_seconds", "Duration of scraping all pages of one search term")
+METRICS.describe("scraper_fetch_retries_total", "Result page requests retried, by why the previous attempt failed")
+METRICS.describe("scraper_throttled_total", "Requests eBay throttled with HTTP 429 or 503 or a bot check page")
+
+
+class FetchError(Exception):
+    """
+    Raised when a result page still couldn't be fetched after MAX_ATTEMPTS tries.
+    """
+
+
+class HostRateLimiter:
+    """
+    Space out requests so that each host sees at most `rate` requests per second.
+    The rate adapts to each host: it is halved whenever the host throttles a request and creeps back up
+    by `step` with every request that succeeds, so the scraper settles just below the rate the host
+    tolerates. Requests in flight together are often throttled together, so the rate is only halved once
+    per THROTTLE_COOLDOWN. A rate of 0 doesn't limit a host until it first throttles. Safe to share between threads.
+    """
+
+    def __init__(self, rate, min_rate=MIN_REQUESTS_PER_SECOND, step=RATE_STEP):
+        self.max_rate = rate or math.inf
+        self.min_rate = min_rate
+        self.step = step
+        self._rates = {}  # host -> current rate, for the hosts that have throttled a request
+        self._slowed_at = {}  # host -> when its rate was last halved
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """
+        Block until the host of `url` may be requested again.
+        :param url: The URL about to be requested.
+        :type url: str
+        :return: None
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1.0 / self._rates.get(host, self.max_rate)
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def succeeded(self, url):
+        """
+        Speed the host of `url` back up after a successful request.
+        :param url: The URL that was requested.
+        :type url: str
+        :return: None
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host in self._rates:
+                self._rates[host] = min(self._rates[host] + self.step, self.max_rate)
+
+    def throttled(self, url, retry_after=None):
+        """
+        Halve the rate for the host of `url` after it throttled a request, and hold back every request to it
+        for `retry_after` seconds if the host asked for that.
+        :param url: The URL that was throttled.
+        :type url: str
+        :param retry_after: Seconds from the response's Retry-After header, or None.
+        :type retry_after: float
+        :return: None
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            if now - self._slowed_at.get(host, -math.inf) >= THROTTLE_COOLDOWN:
+                rate = self._rates.get(host, self.max_rate)
+                # An unlimited host starts being limited at the default rate
+                self._rates[host] = max(rate / 2 if rate != math.inf else REQUESTS_PER_SECOND, self.min_rate)
+                self._slowed_at[host] = now
+            if retry_after:
+                self._next_slot[host] = max(self._next_slot.get(host, 0), now + retry_after)
+            METRICS.inc("scraper_throttled_total")
+
+
+class FetchEngine:
+    """
+    Fetches result pages concurrently through a pooled keep-alive session and parses them.
+    At most `max_concurrency` requests are in flight at once, no matter how many
+    search terms are being scraped, and each host is limited to `rate` requests per second.
+    Raw page bodies are handed to a pool of `parse_workers` processes as they arrive, so parsing
+    neither holds up the fetch threads nor competes with them for the GIL.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENT_REQUESTS, rate=REQUESTS_PER_SECOND, base_url=EBAY_SEARCH_URL,
+                 parse_workers=PARSE_WORKERS, parser=PARSER_BACKEND, cache=None):
+        self.base_url = base_url
+        self.cache = cache
+        self.parser = parser
+        # Forking a process that already runs threads can copy a lock some other thread holds, so the workers
+        # are started from a clean server process instead (or spawned where there is no forkserver)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.parse_pool = (ProcessPoolExecutor(max_workers=parse_workers,
+                                               mp_context=multiprocessing.get_context(start_method))
+                           if parse_workers else None)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.rate_limiter = HostRateLimiter(rate)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fetch")
+
+    def fetch_pages(self, search_keywords, page_numbers, newest_first=False):
+        """
+        Fetch and parse several result pages for one search concurrently.
+        :param search_keywords: List of keywords for the search query.
+        :type search_keywords: list
+        :param page_numbers: The page numbers to fetch.
+        :type page_numbers: iterable
+        :param newest_first: Sort results by most recently sold.
+        :type newest_first: bool
+        :return: A list of parsed result pages as returned by parse_result_page, in the same order as `page_numbers`.
+        """
+        return list(self.executor.map(
+            lambda page_number: self.parse(fetch_html(search_keywords, page_number, self.session, self.rate_limiter,
+                                                      self.base_url, newest_first, self.cache)),
+            page_numbers
+        ))
+
+    def parse(self, html):
+        """
+        Parse a raw result page, in the parse pool if there is one.
+        :param html: The raw page body.
+        :type html: str
+        :return: The parsed page as returned by parse_result_page.
+        """
+        with METRICS.timer("scraper_parse_seconds", backend=self.parser):
+            if self.parse_pool:
+                return self.parse_pool.submit(parse_result_page, html, self.parser).result()
+            return parse_result_page(html, self.parser)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.parse_pool:
+            self.parse_pool.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def build_search_url(search_keywords, page_number, base_url=EBAY_SEARCH_URL, newest_first=False):
+    """
+    Build the sold-listings search URL for the given keywords and page.
+    :param search_keywords: List of keywords for the search query.
+    :type search_keywords: list
+    :param page_number: The page number to fetch listings from.
+    :type page_number: int
+    :param base_url: The search endpoint, overridable to point at a local stand-in server.
+    :type base_url: str
+    :param newest_first: Sort results by most recently sold instead of eBay's best match.
+    :type newest_first: bool
+    :return: The search URL.
+    """
+    search_query = "+".join(search_keywords)
+    url = f"{base_url}?_nkw={search_query}&_sacat=0&rt=nc&LH_Sold=1&LH_Complete=1&_pgn={page_number}"
+    if newest_first:
+        url += "&_sop=13"
+    return url
+
+
+def fetch_html(search_keywords, page_number, session=None, rate_limiter=None, base_url=EBAY_SEARCH_URL,
+               newest_first=False, cache=None):
+    """
+    Fetch the raw body of one eBay search result page, from the page cache if it holds a copy.
+    :param search_keywords: List of keywords for the search query.
+    :type search_keywords: list
+    :param page_number: The page number to fetch listings from.
+    :type page_number: int
+    :param session: Optional session to reuse pooled connections.
+    :type session: requests.Session
+    :param rate_limiter: Optional limiter shared between concurrent fetches.
+    :type rate_limiter: HostRateLimiter
+    :param base_url: The search endpoint, overridable to point at a local stand-in server.
+    :type base_url: str
+    :param newest_first: Sort results by most recently sold.
+    :type newest_first: bool
+    :param cache: Optional cache that pages are read from and fetched pages are written to.
+    :type cache: PageCache
+    :return: The page body; an empty body in replay mode if the page isn't cached.
+    :raises FetchError: If the page couldn't be fetched, so a failed page is never taken for one without results.
+    """
+    url = build_search_url(search_keywords, page_number, base_url, newest_first)
+    if cache:
+        html = cache.get(url)
+        if html is not None:
+            METRICS.inc("scraper_page_fetches_total", source="cache")
+            return html
+        if cache.replay:
+            print(f"Not in cache, skipped: {url}")
+            METRICS.inc("scraper_page_fetches_total", source="not_cached")
+            return ""
+    response = request_page(url, session, rate_limiter)
+    if cache and response.ok:
+        cache.put(url, response.text)
+    return response.text
+
+
+def is_block_page(response):
+    """
+    Check whether eBay throttled a request, with HTTP 429 or 503 or a bot check page served in place of the results.
+    :param response: The response to a result page request.
+    :type response: requests.Response
+    :return: True if the request was throttled.
+    """
+    if response.status_code in THROTTLE_STATUSES:
+        return True
+    return any(marker in response.url or marker in response.text for marker in BLOCK_PAGE_MARKERS)
+
+
+def retry_after(response):
+    """
+    Read the seconds to wait from a response's Retry-After header.
+    :return: The number of seconds, or None if the header is missing or holds a date.
+    """
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.strip().isdigit() else None
+
+
+def backoff_delay(attempt):
+    """
+    Random wait before retry number `attempt` (1 for the first retry): exponential backoff with full jitter,
+    so that fetches failing together don't all retry at the same moment.
+    """
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def request_page(url, session=None, rate_limiter=None, timeout=REQUEST_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+    """
+    Request a result page, retrying timeouts, connection errors, server errors and throttling after a
+    backoff_delay. Throttling also slows the rate limiter down for the host, and a successful request
+    speeds it back up. Other client errors, such as 403 or 404, aren't retried.
+    :param url: The page URL.
+    :type url: str
+    :param session: Optional session to reuse pooled connections.
+    :type session: requests.Session
+    :param rate_limiter: Optional limiter shared between concurrent fetches.
+    :type rate_limiter: HostRateLimiter
+    :param timeout: Seconds to wait for the connection and for the response.
+    :type timeout: tuple
+    :param max_attempts: Tries before giving up.
+    :type max_attempts: int
+    :return: The response.
+    :raises FetchError: If every attempt failed, or the request got a client error other than 429.
+    """
+    reason = None
+    for attempt in range(max_attempts):
+        if attempt:
+            METRICS.inc("scraper_fetch_retries_total", reason=reason)
+            time.sleep(backoff_delay(attempt))
+        if rate_limiter:
+            with METRICS.timer("scraper_rate_limit_wait_seconds"):
+                rate_limiter.wait(url)
+        try:
+            with METRICS.timer("scraper_fetch_seconds"):
+                response = (session or requests).get(url, timeout=timeout)
+        except requests.Timeout:
+            reason = "timeout"
+            continue
+        except requests.ConnectionError:
+            reason = "connection_error"
+            continue
+        METRICS.inc("scraper_page_fetches_total", source="live", status=response.status_code)
+        METRICS.inc("scraper_fetch_bytes_total", len(response.content))
+
+        if is_block_page(response):
+            reason = "throttled"
+            if rate_limiter:
+                rate_limiter.throttled(url, retry_after(response))
+            continue
+        if response.status_code >= 500:
+            reason = "server_error"
+            continue
+        if response.status_code >= 400:
+            raise FetchError(f"Gave up on {url}, which failed with HTTP {response.status_code}")
+        if rate_limiter:
+            rate_limiter.succeeded(url)
+        return response
+    raise FetchError(f"Gave up on {url} after {max_attempts} attempts, the last one failed with: {reason}")
+
+
+def discover_page_count(count_text, page_labels, next_disabled=False):
+    """
+    Work out how many result pages a search has from its first page, using the result count
+    heading, capped at PAGES_PER_TERM. The pagination bar only shows a window of about nine pages
+    around the current one, so its page numbers are only used when its Next link is disabled,
+    which means the highest of them is the last page. Otherwise pagination relies on stopping at
+    the first empty or repeated page.
+    :param count_text: Text of the result count heading, such as "1,234", or None if the page has none.
+    :type count_text: str
+    :param page_labels: Texts of the links in the pagination bar.
+    :type page_labels: list
+    :param next_disabled: Whether the pagination bar marks its Next link as disabled.
+    :type next_disabled: bool
+    :return: The number of pages worth requesting.
+    """
+    page_count = PAGES_PER_TERM
+
+    if count_text:
+        digits = re.sub(r"[^0-9]", "", count_text)
+        if digits:
+            page_count = min(page_count, math.ceil(int(digits) / RESULTS_PER_PAGE))
+
+    page_numbers = [int(label) for label in page_labels if label.strip().isdigit()]
+    if next_disabled and page_numbers:
+        page_count = min(page_count, max(page_numbers))
+
+    return max(page_count, 1)
+
+
+def parse_result_page(html, backend=PARSER_BACKEND):
+    """
+    Parse a raw result page into its listings and page count. Only takes and returns plain values
+    so that it can run in a worker process.
+    :param html: The raw page body.
+    :type html: str
+    :param backend: "html.parser" to parse with BeautifulSoup or "lxml" to parse with lxml; both give the same result.
+    :type backend: str
+    :return: A tuple of the page's (title, price, date, link, condition) listings, or None if the page has no
+        results section, the number of pages worth requesting, and the number of listings skipped because a
+        field couldn't be read.
+    """
+    if backend == "lxml":
+        return parse_result_page_lxml(html)
+    if backend != "html.parser":
+        raise ValueError(f"Unknown parser backend: {backend}")
+
+    doc = BeautifulSoup(html, "html.parser")
+    heading = doc.find(class_="srp-controls__count-heading")
+    count_tag = heading.find(class_="BOLD") if heading else None
+    next_link = doc.find(class_="pagination__next")
+    page_count = discover_page_count(count_tag.text if count_tag else None,
+                                     [link.text for link in doc.find_all(class_="pagination__item")],
+                                     next_link is not None and next_link.get("aria-disabled") == "true")
+
+    listings_section = doc.find(class_="srp-results srp-list clearfix")
+    if not listings_section:
+        return None, page_count, 0
+
+    listings = []
+    parse_errors = 0
+    for item in listings_section.find_all("li", class_="s-item s-item__pl-on-bottom"):
+        try:
+            listings.append(parse_listing(item))
+        except LISTING_ERRORS:
+            parse_errors += 1
+    return listings, page_count, parse_errors
+
+
+def _class_xpath(class_name):
+    """
+    XPath step matching elements that have `class_name` among their classes, as BeautifulSoup's class_ does.
+    """
+    return f"descendant::*[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')][1]"
+
+
+def _string(element):
+    """
+    The lxml equivalent of BeautifulSoup's Tag.string: the element's only string, found through any chain of
+    single-child tags, or None if it has several children.
+    """
+    contents = [element.text] if element.text else []
+    for child in element:
+        contents.append(child)
+        if child.tail:
+            contents.append(child.tail)
+    if len(contents) != 1:
+        return None
+    return contents[0] if isinstance(contents[0], str) else _string(contents[0])
+
+
+def parse_result_page_lxml(html):
+    """
+    Same as parse_result_page with the BeautifulSoup backend, but extracts the fields with lxml XPath queries,
+    which avoids building a Python object per node.
+    :param html: The raw page body.
+    :type html: str
+    :return: A tuple of the page's listings, or None if the page has no results section, the page count and
+        the number of listings that couldn't be read.
+    """
+    import lxml.html  # Optional dependency, only needed for this backend
+
+    doc = lxml.html.document_fromstring(html)
+    first = lambda element, class_name: next(iter(element.xpath(_class_xpath(class_name))), None)
+
+    heading = first(doc, "srp-controls__count-heading")
+    count_tag = first(heading, "BOLD") if heading is not None else None
+    page_labels = [link.text_content() for link in
+                   doc.xpath("descendant::*[contains(concat(' ', normalize-space(@class), ' '), ' pagination__item ')]")]
+    next_link = first(doc, "pagination__next")
+    page_count = discover_page_count(count_tag.text_content() if count_tag is not None else None, page_labels,
+                                     next_link is not None and next_link.get("aria-disabled") == "true")
+
+    listings_section = next(iter(doc.xpath("descendant::*[@class='srp-results srp-list clearfix'][1]")), None)
+    if listings_section is None:
+        return None, page_count, 0
+
+    listings = []
+    parse_errors = 0
+    for item in listings_section.xpath("descendant::li[@class='s-item s-item__pl-on-bottom']"):
+        try:
+            title = first(item, "s-item__title").text_content().lower()
+            price = str(first(item, "s-item__price").text_content())
+            date = _string(first(item, "POSITIVE")).replace("Sold", "").strip()  # Use raw date
+            link = first(item, "s-item__link").attrib['href'].split("?")[0]
+            subtitle = first(item, "s-item__subtitle")
+            condition = subtitle.text_content().lower() if subtitle is not None else "Unknown"
+        except LISTING_ERRORS:
+            parse_errors += 1
+            continue
+        listings.append((title, price, date, link, condition))
+    return listings, page_count, parse_errors
+
+
+def parse_sold_date(date):
+    """
+    Parse a raw eBay sold date such as "Apr 13, 2024".
+    :param date: The raw date string.
+    :type date: str
+    :return: The date, or None if it is not in the expected format.
+    """
+    try:
+        return datetime.strptime(date, "%b %d, %Y").date()
+    except ValueError:
+        return None
+
+
+def parse_listing(item):
+    """
+    Extract title, price, date, link, and condition from a listing.
+    :param item: A BeautifulSoup object representing a single listing.
+    :type item: bs4.element.Tag
+    :return: A tuple containing title, price, date, link, and condition.
+    """
+    title = item.find(class_="s-item__title").text.lower()
+    price = item.find(class_="s-item__price").text
+    date = item.find(class_="POSITIVE").string.replace("Sold", "").strip()  # Use raw date
+    link = item.find(class_="s-item__link")['href'].split("?")[0]
+    condition = item.find(class_="s-item__subtitle").text.lower() if item.find(class_="s-item__subtitle") else "Unknown"
+    return title, price, date, link, condition
+
+
+def is_valid_title(title, search_keywords):
+    """
+    Check if the title contains all search keywords as standalone words.
+    :param title: The title of the listing.
+    :type title: str
+    :param search_keywords: List of keywords to check in the title.
+    :type search_keywords: list
+    :return: True if the title contains all search keywords, False otherwise.
+    """
+    title_words = title.split()
+    for keyword in search_keywords:
+        if keyword not in title_words:
+            return False
+    return True
+
+
+def process_price(price):
+    """
+    Clean and process the price string into a numeric value.
+    :param price: The price string from the listing.
+    :type price: str
+    :return: The processed price as a numeric value.
+    """
+    price = price.replace("$", "").replace(",", "")
+    if 'to' in price:
+        price = sum(float(num) for num in price.split() if num != 'to') / 2
+    return round(float(price), 2)
+
+
+def filter_listings(listings, search_keywords, matcher=None):
+    """
+    Process the prices of a term's listings and keep those whose title contains every keyword and whose
+    price is between MIN_PRICE and MAX_PRICE. With a matcher, titles that belong to a more specific term,
+    or to several unrelated terms, are left out as well.
+    :param listings: (title, price, date, link, condition) tuples with the raw price.
+    :type listings: list
+    :param search_keywords: List of keywords of the term the listings are filtered for.
+    :type search_keywords: list
+    :param matcher: Optional matcher compiled from every term of the run, this one included.
+    :type matcher: TermMatcher
+    :return: The accepted (title, price, date, link, condition) tuples with the processed price, in listing order.
+    """
+    key = term_key(" ".join(search_keywords)) if matcher else None
+    rejected = {"title_mismatch": 0, "other_term": 0, "unparseable_price": 0, "price_out_of_bounds": 0}
+    accepted = []
+    for title, price, date, link, condition in listings:
+        # Most listings fail the title check, so only the rest are matched against the other terms
+        if not is_valid_title(title, search_keywords):
+            rejected["title_mismatch"] += 1
+            continue
+        if matcher and matcher.match(title) != key:
+            rejected["other_term"] += 1
+            continue
+        try:
+            price_value = process_price(price)
+        except ValueError:
+            rejected["unparseable_price"] += 1
+            continue
+        if MIN_PRICE < price_value < MAX_PRICE:
+            accepted.append((title, price_value, date, link, condition))
+        else:
+            rejected["price_out_of_bounds"] += 1
+
+    for result, count in rejected.items():
+        METRICS.inc("scraper_listings_total", count, result=result)
+    METRICS.inc("scraper_listings_total", len(accepted), result="accepted")
+    return accepted
+
+
+def iter_result_pages(search_keywords, engine=None, newest_first=False):
+    """
+    Yield the result pages for a search in page order. The first page is fetched on its own to
+    discover the page count, then the rest are requested in waves of PAGE_WAVE_SIZE so that a
+    caller that stops iterating saves the remaining requests.
+    :param search_keywords: List of keywords for the search query.
+    :type search_keywords: list
+    :param engine: Optional engine to fetch each wave concurrently.
+    :type engine: FetchEngine
+    :param newest_first: Sort results by most recently sold.
+    :type newest_first: bool
+    :return: A generator of parsed pages as returned by parse_result_page.
+    """
+    if engine:
+        fetch = lambda page_numbers: engine.fetch_pages(search_keywords, page_numbers, newest_first)
+    else:
+        fetch = lambda page_numbers: [parse_result_page(fetch_html(search_keywords, page_number,
+                                                                   newest_first=newest_first))
+                                      for page_number in page_numbers]
+
+    first_page = fetch([1])[0]
+    yield first_page
+
+    # Newest-first pages usually run into already-ingested or too-old listings within a page or two,
+    # so they are requested one at a time rather than speculatively
+    wave_size = 1 if newest_first else PAGE_WAVE_SIZE
+    page_count = first_page[1]
+    for wave_start in range(2, page_count + 1, wave_size):
+        yield from fetch(range(wave_start, min(wave_start + wave_size, page_count + 1)))
+
+
+def sold_before(date, cutoff):
+    """
+    Check whether a raw sold date falls before the cutoff. Unparseable dates are never treated as old.
+    :param date: The raw date string.
+    :type date: str
+    :param cutoff: The cutoff date, or None for no cutoff.
+    :type cutoff: datetime.date
+    :return: True if the listing sold before the cutoff, False otherwise.
+    """
+    if cutoff is None:
+        return False
+    sold_date = parse_sold_date(date)
+    return sold_date is not None and sold_date < cutoff
+
+
+def collect_new_listings(search_keywords, engine=None, cutoff=None, known_links=None, month_link_dict=None):
+    """
+    Fetch the result pages of a search and collect the listings on them that are new.
+    Each listing is collected once, and pagination stops at the discovered last page or at the first
+    page with nothing new on it: missing, empty, only listings already seen (on earlier pages or in
+    `known_links`), or only listings sold before the cutoff.
+    :param search_keywords: List of keywords for the search query.
+    :type search_keywords: list
+    :param engine: Optional engine to fetch the pages concurrently; pages are fetched one by one without it.
+    :type engine: FetchEngine
+    :param cutoff: Optional oldest sold date to keep; results are then requested newest first.
+    :type cutoff: datetime.date
+    :param known_links: Optional links ingested by an earlier run, which are skipped.
+    :type known_links: set
+    :param month_link_dict: Optional dictionary to store the links of every new listing grouped by date,
+        including the ones the title or price filters will reject.
+    :type month_link_dict: dict
+    :return: A list of (title, price, date, link, condition) tuples with the raw price, in page order.
+    """
+    seen_links = set(known_links or ())
+    new_listings = []
+
+    # Pages are processed in page order so the per-date price totals, and therefore the averages, match a serial run
+    for parsed, _, parse_errors in iter_result_pages(search_keywords, engine, newest_first=cutoff is not None):
+        METRICS.inc("scraper_listings_total", parse_errors, result="parse_error")
+        if parsed is None:
+            METRICS.inc("scraper_pages_total", result="no_results")
+            break
+
+        fresh = [listing for listing in parsed if listing[3] not in seen_links and not sold_before(listing[2], cutoff)]
+        METRICS.inc("scraper_listings_total", len(parsed) - len(fresh), result="seen_or_too_old")
+        if not fresh:
+            METRICS.inc("scraper_pages_total", result="empty" if not parsed else "nothing_new")
+            break
+        METRICS.inc("scraper_pages_total", result="new_listings")
+        seen_links.update(link for _, _, _, link, _ in parsed)
+        new_listings.extend(fresh)
+
+        if month_link_dict is not None:
+            for _, _, date, link, _ in fresh:
+                month_link_dict.setdefault(date, []).append(link)
+    return new_listings
+
+
+def add_accepted(accepted, daily_stats, accepted_listings=None):
+    """
+    Add the prices of accepted listings to a term's daily stats, and optionally collect the listings.
+    :param accepted: The listings returned by filter_listings.
+    :type accepted: list
+    :param daily_stats: A dictionary of PriceStats by date, which the prices are added to.
+    :type daily_stats: dict
+    :param accepted_listings: Optional list to collect the accepted listings in.
+    :type accepted_listings: list
+    :return: None
+    """
+    for _, price, date, _, _ in accepted:
+        daily_stats.setdefault(date, PriceStats()).add(price)
+    if accepted_listings is not None:
+        accepted_listings.extend(accepted)
+
+
+@METRICS.timed("scraper_term_seconds")
+def scrape_ebay_for_term(search_term, daily_stats, engine=None, cutoff=None, known_links=None,
+                         month_link_dict=None, accepted_listings=None, matcher=None):
+    """
+    Scrape eBay for the given search term and add the accepted prices to its daily stats.
+    :param search_term: The search term to query on eBay.
+    :type search_term: str
+    :param daily_stats: A dictionary of PriceStats by date, which the accepted prices are added to.
+    :type daily_stats: dict
+    :param engine: Optional engine to fetch the pages concurrently; pages are fetched one by one without it.
+    :type engine: FetchEngine
+    :param cutoff: Optional oldest sold date to keep; results are then requested newest first.
+    :type cutoff: datetime.date
+    :param known_links: Optional links ingested by an earlier run, which are skipped.
+    :type known_links: set
+    :param month_link_dict: Optional dictionary to store the links of every new listing grouped by date,
+        including the ones rejected by the title or price filters.
+    :type month_link_dict: dict
+    :param accepted_listings: Optional list to collect a (title, price, date, link, condition) tuple for
+        every accepted listing, with the processed price.
+    :type accepted_listings: list
+    :param matcher: Optional matcher compiled from every term of the run, to leave out listings of more
+        specific terms.
+    :type matcher: TermMatcher
+    :return: None
+    """
+    search_keywords = search_term.lower().split()
+    new_listings = collect_new_listings(search_keywords, engine, cutoff, known_links, month_link_dict)
+    # The title and price checks run once over all of the term's new listings rather than page by page
+    add_accepted(filter_listings(new_listings, search_keywords, matcher), daily_stats, accepted_listings)
+
+
+@METRICS.timed("scraper_term_seconds")
+def scrape_shared_query(search_term, search_terms, matcher, engine=None, cutoff=None, store=None):
+    """
+    Scrape the results of one search term and split its listings among several terms that all contain its
+    keywords, each listing going to the most specific term it matches, so the narrower terms need no
+    requests of their own.
+    :param search_term: The search term to query on eBay.
+    :type search_term: str
+    :param search_terms: The terms to collect price stats for, `search_term` included.
+    :type search_terms: list
+    :param matcher: Matcher compiled from every term of the run.
+    :type matcher: TermMatcher
+    :param engine: Optional engine to fetch the pages concurrently.
+    :type engine: FetchEngine
+    :param cutoff: Optional oldest sold date to keep.
+    :type cutoff: datetime.date
+    :param store: Optional store to persist every accepted listing to.
+    :type store: ListingStore
+    :return: A dictionary mapping each of `search_terms` to its PriceStats by date.
+    """
+    print(f"Processing: {search_term}, shared with {', '.join(term for term in search_terms if term != search_term)}")
+    new_listings = collect_new_listings(search_term.lower().split(), engine, cutoff)
+    results = {}
+    for term in search_terms:
+        daily_stats = {}
+        accepted_listings = []
+        add_accepted(filter_listings(new_listings, term.lower().split(), matcher), daily_stats, accepted_listings)
+        if store:
+            store.add_listings(term, accepted_listings)
+        results[term] = daily_stats
+    return results
+
+
+def read_search_terms(input_file):
+    """
+    Read the search terms from the first column of a CSV file.
+    :param input_file: Path to the search terms CSV.
+    :type input_file: str
+    :return: A list of search terms in file order.
+    """
+    search_terms = []
+    with open(input_file, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        for row in reader:
+            if row:  # Ignore empty rows
+                search_term = row[0].strip()  # Extract the search term from the first column
+                if search_term:
+                    search_terms.append(search_term)
+    return search_terms
+
+
+def scrape_daily_stats(search_term, engine=None, cutoff=None, store=None, matcher=None):
+    """
+    Scrape a single search term and collect its price stats per date.
+    :param search_term: The search term to query on eBay.
+    :type search_term: str
+    :param engine: Optional engine to fetch the pages concurrently.
+    :type engine: FetchEngine
+    :param cutoff: Optional oldest sold date to keep.
+    :type cutoff: datetime.date
+    :param store: Optional store to persist every accepted listing to.
+    :type store: ListingStore
+    :param matcher: Optional matcher compiled from every term of the run.
+    :type matcher: TermMatcher
+    :return: A dictionary mapping each date to its PriceStats.
+    """
+    print(f"Processing: {search_term}")
+    daily_stats = {}
+    accepted_listings = []
+    scrape_ebay_for_term(search_term, daily_stats, engine, cutoff, accepted_listings=accepted_listings, matcher=matcher)
+    if store:
+        store.add_listings(search_term, accepted_listings)
+    return daily_stats
+
+
+def scrape_incremental(search_term, daily_stats, watermark, engine=None, store=None, matcher=None):
+    """
+    Scrape only the listings sold since the term's watermark and merge them into its daily stats.
+    The watermark holds the newest sold date already ingested together with the links seen on that
+    date, so late listings on that date are merged into its stats while older dates are left as they are.
+    :param search_term: The search term to query on eBay.
+    :type search_term: str
+    :param daily_stats: The term's existing PriceStats keyed by date, which are left unchanged.
+    :type daily_stats: dict
+    :param watermark: The term's watermark from the previous run, or None to scrape everything.
+    :type watermark: dict
+    :param engine: Optional engine to fetch the pages concurrently.
+    :type engine: FetchEngine
+    :param store: Optional store to persist every accepted listing to.
+    :type store: ListingStore
+    :param matcher: Optional matcher compiled from every term of the run.
+    :type matcher: TermMatcher
+    :return: A tuple of the merged daily stats and the new watermark.
+    """
+    print(f"Processing: {search_term}")
+    cutoff = parse_sold_date(watermark["date"]) if watermark else None
+    known_links = set(watermark["links"]) if watermark else set()
+    new_stats = {}
+    month_link_dict = {}
+    accepted_listings = []
+    scrape_ebay_for_term(search_term, new_stats, engine, cutoff, known_links, month_link_dict, accepted_listings,
+                         matcher)
+    if store:
+        store.add_listings(search_term, accepted_listings)
+
+    # Dates after the watermark are scraped in full and replace their stats; on the watermark date itself only
+    # listings not seen before are scraped, so they are merged into its stats
+    merged = dict(daily_stats)
+    for date, stats in new_stats.items():
+        if watermark and date == watermark["date"] and date in daily_stats:
+            merged[date] = daily_stats[date] + stats
+        else:
+            merged[date] = stats
+    if not month_link_dict:
+        return merged, watermark
+
+    newest_date = max(month_link_dict, key=lambda date: parse_sold_date(date) or datetime.min.date())
+    links = month_link_dict[newest_date]
+    if watermark and newest_date == watermark["date"]:
+        return merged, {"date": newest_date, "links": watermark["links"] + links}
+    return merged, {"date": newest_date, "links": links}
+
+
+def read_summary(output_file):
+    """
+    Read a summary CSV written by write_summary back into daily averages keyed by search term.
+    :param output_file: Path of the summary CSV.
+    :type output_file: str
+    :return: Daily averages keyed by search term in row order, or an empty dict if the file does not exist.
+    """
+    summary_data = {}
+    if not os.path.exists(output_file):
+        return summary_data
+    with open(output_file, "r", newline="", encoding="utf-8") as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None)
+        for row in reader:
+            if row:
+                summary_data[row[0]] = {date: value for date, value in zip(header[1:], row[1:]) if value != ""}
+    return summary_data
+
+
+def read_watermarks(watermark_file):
+    """
+    Read the per-term watermarks left by the last incremental run.
+    :param watermark_file: Path of the watermark JSON file.
+    :type watermark_file: str
+    :return: Watermarks keyed by search term, or an empty dict if the file does not exist.
+    """
+    if not os.path.exists(watermark_file):
+        return {}
+    with open(watermark_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_watermarks(watermark_file, watermarks):
+    """
+    Write the per-term watermarks for the next incremental run.
+    :param watermark_file: Path of the watermark JSON file.
+    :type watermark_file: str
+    :param watermarks: Watermarks keyed by search term.
+    :type watermarks: dict
+    :return: None
+    """
+    # Written under a temporary name and renamed, so a crash never leaves a truncated file behind
+    with replaced_atomically(watermark_file) as temporary, open(temporary, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=1, sort_keys=True)
+
+
+def read_daily_stats(stats_file):
+    """
+    Read the per-term daily price stats kept for the next incremental run.
+    :param stats_file: Path of the stats JSON file.
+    :type stats_file: str
+    :return: Dictionaries of PriceStats by date keyed by search term, or an empty dict if the file does not exist.
+    """
+    if not os.path.exists(stats_file):
+        return {}
+    with open(stats_file, "r", encoding="utf-8") as f:
+        return {search_term: load_daily_stats(data) for search_term, data in json.load(f).items()}
+
+
+def write_daily_stats(stats_file, stats_by_term):
+    """
+    Write the per-term daily price stats, quantile sketches included, so the next incremental run can merge
+    new listings into them.
+    :param stats_file: Path of the stats JSON file.
+    :type stats_file: str
+    :param stats_by_term: Dictionaries of PriceStats by date keyed by search term.
+    :type stats_by_term: dict
+    :return: None
+    """
+    with replaced_atomically(stats_file) as temporary, open(temporary, "w", encoding="utf-8") as f:
+        json.dump({search_term: dump_daily_stats(daily_stats) for search_term, daily_stats in stats_by_term.items()},
+                  f, separators=(",", ":"))
+
+
+def write_stats_summary(output_file, stats_by_term):
+    """
+    Write one row per search term and date with the count and the average, median, trimmed mean, lowest
+    and highest price of the listings sold that day, dates oldest first. Written under a temporary name and
+    renamed like the summary.
+    :param output_file: Path of the CSV to write.
+    :type output_file: str
+    :param stats_by_term: Dictionaries of PriceStats by date keyed by search term, in output row order.
+    :type stats_by_term: dict
+    :return: None
+    """
+    columns = ["count", "average", "median", "trimmed_mean", "low", "high"]
+    with replaced_atomically(output_file) as temporary, open(temporary, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["term", "date"] + columns)
+        for search_term, daily_stats in stats_by_term.items():
+            for date in sorted(daily_stats, key=lambda date: parse_sold_date(date) or datetime.min.date()):
+                summary = daily_stats[date].summary()
+                writer.writerow([search_term, date] + [summary[column] for column in columns])
+
+
+def write_summary(output_file, summary_data):
+    """
+    Write the per-term daily averages as one row per term and one column per date. The CSV is written under
+    a temporary name and renamed over the old one, so the dashboard never loads a half-written file.
+    :param output_file: Path of the CSV to write.
+    :type output_file: str
+    :param summary_data: Daily averages keyed by search term, in output row order.
+    :type summary_data: dict
+    :return: None
+    """
+    with replaced_atomically(output_file) as temporary, open(temporary, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+
+        # Generate a header with all unique dates from all search terms
+        all_dates = sorted({date for averages in summary_data.values() for date in averages.keys()})
+        header = ["CPU Name"] + all_dates
+        writer.writerow(header)
+
+        # Write rows for each search term with corresponding averages
+        for search_term, averages in summary_data.items():
+            row = [search_term] + [averages.get(date, "") for date in all_dates]
+            writer.writerow(row)
+
+
+class TermFile:
+    """
+    One search terms file of a run, with the summary, watermark and journal files that belong to it and the
+    time its terms took to scrape. Safe to share between threads.
+    """
+
+    def __init__(self, input_file):
+        self.input_file = input_file
+        directory, name = os.path.split(input_file)
+        self.output_file = os.path.join(directory, f"Average_Prices_By_Day_{name}")  # Summary output file
+        stem = os.path.splitext(self.output_file)[0]
+        self.watermark_file = f"{stem}_watermarks.json"  # Newest ingested listings per term
+        self.journal_file = f"{stem}_journal.jsonl"  # Terms finished by this run so far
+        self.daily_stats_file = f"{stem}_daily_stats.json"  # Mergeable daily price stats per term
+        self.stats_file = os.path.join(directory, f"Price_Stats_By_Day_{name}")  # Median and trimmed mean output file
+        self.search_terms = read_search_terms(input_file)
+        self.journal = None
+        self.summary_data = {}
+        self.daily_stats = {}
+        self.watermarks = {}
+        self.scrape_seconds = 0.0  # Time spent scraping the file's terms, added up over its terms
+        self.finished_after = 0.0  # Seconds from the start of the run until the file's last term finished
+        self._lock = threading.Lock()
+
+    def record(self, search_term, daily_stats, watermark, seconds, finished_after):
+        """
+        Journal a finished term and add its time to the file's timings.
+        :param search_term: The term as spelled in this file.
+        :type search_term: str
+        :param daily_stats: The term's PriceStats by date.
+        :type daily_stats: dict
+        :param watermark: The term's new watermark, or None.
+        :type watermark: dict
+        :param seconds: How long the term took to scrape.
+        :type seconds: float
+        :param finished_after: Seconds from the start of the run until the term finished.
+        :type finished_after: float
+        :return: None
+        """
+        self.journal.record(search_term, dump_daily_stats(daily_stats), watermark)
+        with self._lock:
+            self.scrape_seconds += seconds
+            self.finished_after = max(self.finished_after, finished_after)
+
+
+def expand_input_files(patterns):
+    """
+    Expand glob patterns such as "search_terms_*.csv" into the files they match, in the order given and
+    without repeats. A pattern that matches nothing is kept as it is, so that it is reported as missing.
+    :param patterns: File names or glob patterns.
+    :type patterns: list
+    :return: The list of file names.
+    """
+    input_files = []
+    for pattern in patterns:
+        for input_file in sorted(glob.glob(pattern)) or [pattern]:
+            if input_file not in input_files:
+                input_files.append(input_file)
+    return input_files
+
+
+def plan_scrape_jobs(term_files, incremental=False, listing_counts=None, matcher=None):
+    """
+    Merge the unfinished terms of several search term files into one list of scrape jobs, longest first,
+    so that the last jobs to start are short and the run isn't left waiting on one long term at the end.
+    Terms sending the same query, in one file or in several, become a single job whose result goes to each
+    of them; in an incremental run they are only merged if they also start from the same stats and watermark.
+    Given a matcher, a term whose keywords all belong to a broader term of the run ("GeForce RTX 4080 Super"
+    and "GeForce RTX 4080") is scraped from the broader term's results instead of its own query.
+    :param term_files: The files of the run, with their journals opened and, for an incremental run, their
+        daily stats and watermarks read.
+    :type term_files: list
+    :param incremental: Whether the run is incremental.
+    :type incremental: bool
+    :param listing_counts: Stored listings per term, as an estimate of the work a term takes; terms without
+        any stored listings are assumed to be the longest.
+    :type listing_counts: dict
+    :param matcher: Optional matcher compiled from every term of the run, to share queries; not for incremental runs.
+    :type matcher: TermMatcher
+    :return: A list of jobs, each a dictionary with the "term" to scrape, the "daily_stats" and "watermark"
+        it starts from in an incremental run, the (term file, term) pairs in "targets" given its result, and
+        the jobs of the narrower terms scraped from its results in "shared".
+    """
+    jobs = {}
+    for term_file in term_files:
+        for search_term in term_file.search_terms:
+            if search_term in term_file.journal.completed:
+                continue
+            daily_stats = term_file.daily_stats.get(search_term, {})
+            watermark = term_file.watermarks.get(search_term)
+            # The scraper lowercases a term and splits it into keywords, so this is the query actually sent
+            key = " ".join(search_term.lower().split())
+            if incremental:
+                key = (key, json.dumps([dump_daily_stats(daily_stats), watermark], sort_keys=True))
+            job = jobs.setdefault(key, {"term": search_term, "daily_stats": daily_stats, "watermark": watermark,
+                                        "targets": [], "shared": []})
+            if (term_file, search_term) not in job["targets"]:
+                job["targets"].append((term_file, search_term))
+
+    if matcher:
+        by_key = {term_key(job["term"]): job for job in jobs.values()}
+        for key, job in list(jobs.items()):
+            broader = [broader_key for broader_key in matcher.broader_terms(job["term"]) if broader_key in by_key]
+            if broader:
+                # The broadest term is never narrower than another, so it is scraped with its own query
+                by_key[broader[0]]["shared"].append(jobs.pop(key))
+
+    listing_counts = listing_counts or {}
+    return sorted(jobs.values(), key=lambda job: -listing_counts.get(job["term"], math.inf))
+
+
+def main(max_concurrency=MAX_CONCURRENT_REQUESTS, rate=REQUESTS_PER_SECOND, base_url=EBAY_SEARCH_URL, cutoff=None,
+         incremental=False, store_path=DEFAULT_STORE, from_store=False, parse_workers=PARSE_WORKERS,
+         parser=PARSER_BACKEND, cache_dir=DEFAULT_CACHE_DIR, replay=False, metrics_file=None, resume=False,
+         input_files=None, shared_queries=False):
+    """
+    Main function to process search terms, scrape eBay, and save the daily averages and the daily price stats
+    to CSV files per search terms file.
+    The terms of every file are scraped from one shared queue, so the run takes as long as the concurrency
+    limit allows rather than the sum of the files.
+    :param max_concurrency: Maximum number of page requests in flight at once.
+    :type max_concurrency: int
+    :param rate: Maximum requests per second to a single host.
+    :type rate: float
+    :param base_url: The search endpoint, overridable to point at a local stand-in server.
+    :type base_url: str
+    :param cutoff: Optional oldest sold date to keep; pagination stops once pages are older than this.
+    :type cutoff: datetime.date
+    :param incremental: Only fetch listings newer than each term's watermark and merge them into the existing output.
+    :type incremental: bool
+    :param store_path: SQLite file every accepted listing is appended to.
+    :type store_path: str
+    :param from_store: Recompute the output from the stored listings instead of scraping.
+    :type from_store: bool
+    :param parse_workers: Number of processes parsing result pages; 0 parses on the fetch threads.
+    :type parse_workers: int
+    :param parser: Parser backend, "html.parser" or "lxml".
+    :type parser: str
+    :param cache_dir: Directory raw result pages are cached in, or None to always fetch live.
+    :type cache_dir: str
+    :param replay: Run offline, reading every page from the cache.
+    :type replay: bool
+    :param metrics_file: Optional JSON file the run's fetch, parse and filter metrics are written to.
+    :type metrics_file: str
+    :param resume: Continue a run that died partway, keeping the terms it finished.
+    :type resume: bool
+    :param input_files: Search terms CSV files or glob patterns; the user is asked for one file if not given.
+    :type input_files: list
+    :param shared_queries: Scrape terms whose keywords all belong to a broader term of the run from the broader
+        term's results, saving their requests; not combined with incremental runs.
+    :type shared_queries: bool
+    :return: None
+    """
+    if input_files is None:
+        input_files = [input("Input file (search_terms_NVIDIA_GPU.csv): ")]  # Input file containing search terms
+    input_files = expand_input_files(input_files)
+
+    # Check input files exist
+    missing = [input_file for input_file in input_files if not os.path.exists(input_file)]
+    for input_file in missing:
+        print(f"Error: '{input_file}' not found. Make sure the file exists.")
+    if missing or not input_files:
+        return
+
+    term_files = [TermFile(input_file) for input_file in input_files]
+    # Listings go to the most specific term of the whole run, so a "4080 Super" listing doesn't count for "4080"
+    matcher = TermMatcher(search_term for term_file in term_files for search_term in term_file.search_terms)
+
+    if from_store:
+        with ListingStore(store_path) as store:
+            for term_file in term_files:
+                stats_by_term = store.daily_stats(term_file.search_terms)
+                write_summary(term_file.output_file, {search_term: daily_averages(daily_stats)
+                                                      for search_term, daily_stats in stats_by_term.items()})
+                write_stats_summary(term_file.stats_file, stats_by_term)
+                write_daily_stats(term_file.daily_stats_file, stats_by_term)
+                print(f"Summary data recomputed from {store_path} and written to {term_file.output_file} "
+                      f"and {term_file.stats_file}")
+        return
+
+    # Every finished term is journaled, so a resumed run only scrapes the rest. The outputs and watermarks
+    # are only written once every term is done, so they stay as the last complete run left them until then
+    for term_file in term_files:
+        settings = {"input_file": term_file.input_file, "incremental": incremental,
+                    "cutoff": cutoff.isoformat() if cutoff else None}
+        term_file.journal = ScrapeJournal(term_file.journal_file, settings, resume)
+        if term_file.journal.completed:
+            print(f"Resuming {term_file.input_file}: {len(term_file.journal.completed)} of "
+                  f"{len(term_file.search_terms)} terms already scraped")
+    started = time.monotonic()
+
+    def run_job(job):
+        job_started = time.monotonic()
+        if job["shared"]:
+            results = scrape_shared_query(job["term"], [part["term"] for part in [job] + job["shared"]], matcher,
+                                          engine, cutoff, store)
+            results = {term: (daily_stats, None) for term, daily_stats in results.items()}
+        elif incremental:
+            results = {job["term"]: scrape_incremental(job["term"], job["daily_stats"], job["watermark"], engine, store,
+                                                       matcher)}
+        else:
+            results = {job["term"]: (scrape_daily_stats(job["term"], engine, cutoff, store, matcher), None)}
+        finished = time.monotonic()
+        for part in [job] + job["shared"]:
+            daily_stats, watermark = results[part["term"]]
+            for term_file, search_term in part["targets"]:
+                term_file.record(search_term, daily_stats, watermark, finished - job_started, finished - started)
+
+    # Terms run concurrently; their page fetches all share the engine's pool, which enforces the global limit.
+    # Pages fetched before a crash are in today's page cache, so a resumed term doesn't download them again
+    cache = PageCache(cache_dir, replay=replay) if cache_dir else None
+    with contextlib.ExitStack() as journals, \
+            FetchEngine(max_concurrency, rate, base_url, parse_workers, parser, cache) as engine, \
+            ListingStore(store_path) as store, \
+            ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="term") as term_pool:
+        for term_file in term_files:
+            journals.enter_context(term_file.journal)
+            if incremental:
+                term_file.summary_data = read_summary(term_file.output_file)
+                term_file.watermarks = read_watermarks(term_file.watermark_file)
+                if os.path.exists(term_file.daily_stats_file):
+                    term_file.daily_stats = read_daily_stats(term_file.daily_stats_file)
+                else:
+                    # Output from before the daily stats were kept: rebuild them from the stored listings
+                    term_file.daily_stats = store.daily_stats(term_file.search_terms)
+        jobs = plan_scrape_jobs(term_files, incremental, store.listing_counts(), matcher if shared_queries else None)
+        futures = [term_pool.submit(run_job, job) for job in jobs]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            # On an error or Ctrl-C, terms not started yet are dropped; the running ones finish and are journaled
+            term_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    if cache:
+        cache.close()
+
+    for term_file in term_files:
+        for search_term in term_file.search_terms:
+            stats_data, watermark = term_file.journal.completed[search_term]
+            term_file.daily_stats[search_term] = load_daily_stats(stats_data)
+            # Dates without stats keep the average already in the output
+            term_file.summary_data[search_term] = {**term_file.summary_data.get(search_term, {}),
+                                                   **daily_averages(term_file.daily_stats[search_term])}
+            if watermark:
+                term_file.watermarks[search_term] = watermark
+
+        # Write summary data to the output CSV files, and the stats the next incremental run merges into
+        write_summary(term_file.output_file, term_file.summary_data)
+        write_stats_summary(term_file.stats_file, term_file.daily_stats)
+        write_daily_stats(term_file.daily_stats_file, term_file.daily_stats)
+        if incremental:
+            write_watermarks(term_file.watermark_file, term_file.watermarks)
+        term_file.journal.finish()
+        print(f"Summary data written to {term_file.output_file} and {term_file.stats_file}")
+
+    print(f"Scraped {len(jobs)} queries for {sum(1 + len(job['shared']) for job in jobs)} terms in "
+          f"{time.monotonic() - started:.1f}s")
+    for term_file in term_files:
+        print(f"  {term_file.input_file}: {len(term_file.search_terms)} terms, done after "
+              f"{term_file.finished_after:.1f}s, {term_file.scrape_seconds:.1f}s spent scraping its terms")
+    if metrics_file:
+        METRICS.dump(metrics_file)
+        print(f"Metrics written to {metrics_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape eBay sold listings into daily average prices.")
+    parser.add_argument("input_files", nargs="*",
+                        help="search terms CSV files or glob patterns such as 'search_terms_*.csv', all scraped "
+                             "in one run; asks for a single file if none are given")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch listings sold since the last run and merge them into the existing output")
+    parser.add_argument("--cutoff", type=lambda value: datetime.strptime(value, "%Y-%m-%d").date(),
+                        help="ignore listings sold before this date (YYYY-MM-DD)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help="maximum page requests in flight at once")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="maximum requests per second to eBay; slowed down automatically when throttled")
+    parser.add_argument("--base-url", default=EBAY_SEARCH_URL,
+                        help="search endpoint, such as a local stand_in_server.py (default: %(default)s)")
+    parser.add_argument("--store", default=DEFAULT_STORE,
+                        help="SQLite file every accepted listing is appended to (default: %(default)s)")
+    parser.add_argument("--from-store", action="store_true",
+                        help="recompute the output from the stored listings without scraping")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                        help="processes parsing result pages, 0 to parse on the fetch threads (default: %(default)s)")
+    parser.add_argument("--parser", choices=["html.parser", "lxml"], default=PARSER_BACKEND,
+                        help="HTML parser backend; lxml is faster but must be installed (default: %(default)s)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_DIR,
+                        help="directory raw result pages are cached in (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="always fetch pages live and don't cache them")
+    parser.add_argument("--replay", action="store_true",
+                        help="run offline from the newest cached copy of every page, without contacting eBay")
+    parser.add_argument("--metrics", help="JSON file to write fetch, parse and filtering metrics to")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue a run that was interrupted, skipping the search terms it already finished")
+    parser.add_argument("--shared-queries", action="store_true",
+                        help="scrape terms that extend a broader term of the run, such as '4080 Super' and '4080', "
+                             "from the broader term's results instead of their own query")
+    args = parser.parse_args()
+    if args.replay and args.no_cache:
+        parser.error("--replay reads from the cache and can't be combined with --no-cache")
+    if args.shared_queries and args.incremental:
+        parser.error("--shared-queries can't be combined with --incremental, whose terms each have their own watermark")
+    main(args.concurrency, args.rate, args.base_url, cutoff=args.cutoff, incremental=args.incremental, store_path=args.store,
+         from_store=args.from_store, parse_workers=args.parse_workers, parser=args.parser,
+         cache_dir=None if args.no_cache else args.cache, replay=args.replay, metrics_file=args.metrics,
+         resume=args.resume, input_files=args.input_files or None, shared_queries=args.shared_queries)
@@ -0,0 +1,25 @@
+# Production settings for `gunicorn -c gunicorn.conf.py wsgi:server`
+import gc
+import os
+
+bind = os.environ.get("DASHBOARD_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("DASHBOARD_WORKERS", os.cpu_count() or 1))
+threads = int(os.environ.get("DASHBOARD_THREADS", 1))
+timeout = 60
+
+# Load the dashboard once in the master before forking the workers, so they share its imports and indexes
+# copy-on-write. The dataset itself is memory-mapped from the snapshot and shared through the page cache.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Move every object loaded so far out of the garbage collector's generations, so collections in the workers
+    # don't write to them and turn the shared pages into private copies
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The data watcher thread can't be inherited through the fork, so every worker starts its own. A reloaded
+    # dataset maps the same new snapshot file in every worker, so its arrays stay shared after the reload too.
+    from dashboardapp import live_data
+    live_data.start_watcher()
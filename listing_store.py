@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from price_stats import PriceStats, grouped_stats
+
+DEFAULT_STORE = "sold_listings.db"
+REBUILD_BATCH = 200000  # Listings read and aggregated at a time when recomputing the stats
+KEY_SEPARATOR = "\x1f"  # Joins a listing's term and date when recomputing the stats; in neither of them
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    term TEXT NOT NULL,
+    link TEXT NOT NULL,
+    title TEXT NOT NULL,
+    price REAL NOT NULL,
+    sold_date TEXT,
+    raw_date TEXT NOT NULL,
+    condition TEXT,
+    PRIMARY KEY (term, link)
+);
+CREATE INDEX IF NOT EXISTS listings_term_date ON listings (term, sold_date);
+"""
+
+
+def to_iso_date(date):
+    """
+    Convert a raw eBay sold date such as "Apr 13, 2024" to "2024-04-13".
+    :param date: The raw date string.
+    :type date: str
+    :return: The ISO date string, or None if the date is not in the expected format.
+    """
+    try:
+        return datetime.strptime(date, "%b %d, %Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+class ListingStore:
+    """
+    Append-only SQLite store of every accepted sold listing.
+    A listing is identified by its link within a search term, so re-ingesting the same listing is a
+    no-op while a listing that matches two search terms still counts towards both, as it does in the
+    scraped averages. Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def add_listings(self, search_term, listings):
+        """
+        Insert the accepted listings for a search term, ignoring any already stored.
+        :param search_term: The search term the listings were accepted for.
+        :type search_term: str
+        :param listings: (title, price, date, link, condition) tuples with the processed price and raw date.
+        :type listings: list
+        :return: The number of listings that were new.
+        """
+        rows = [(search_term, link, title, price, to_iso_date(date), date, condition)
+                for title, price, date, link, condition in listings]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            return self._conn.total_changes - before
+
+    def daily_stats(self, search_terms=None):
+        """
+        Recompute the per-term daily price statistics from the stored listings. The listings are read in
+        batches of REBUILD_BATCH, each aggregated as columns by grouped_stats and added to the stats so
+        far, so memory stays bounded by the batch size however many are stored. The stats are the same as
+        adding the listings one at a time, dates in the order their first listing was stored.
+        :param search_terms: Optional search terms to include, in output order; defaults to every stored term.
+        :type search_terms: list
+        :return: Daily stats keyed by search term, each a dictionary mapping raw date to its PriceStats.
+        """
+        stats = {}
+        with self._lock:
+            # Term and date come as one string, which is quicker to number than a tuple per listing
+            cursor = self._conn.execute(f"SELECT term || char({ord(KEY_SEPARATOR)}) || raw_date, price FROM listings "
+                                        "ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(REBUILD_BATCH)
+                if not rows:
+                    break
+                keys = [key for key, _ in rows]
+                # Number each (term, date) of the batch in the order it first appears
+                numbers = {key: number for number, key in enumerate(dict.fromkeys(keys))}
+                groups = np.fromiter(map(numbers.__getitem__, keys), dtype=np.int64, count=len(rows))
+                prices = np.fromiter((price for _, price in rows), dtype=np.float64, count=len(rows))
+                # Days already seen in an earlier batch carry on from their stats so far
+                day_stats = []
+                for key in numbers:
+                    search_term, date = key.split(KEY_SEPARATOR)
+                    day_stats.append(stats.setdefault(search_term, {}).setdefault(date, PriceStats()))
+                grouped_stats(groups, prices, day_stats)
+
+        if search_terms is None:
+            search_terms = list(stats)
+        return {search_term: stats.get(search_term, {}) for search_term in search_terms}
+
+    def listing_counts(self):
+        """
+        Count the stored listings of every search term, as a measure of how long each term takes to scrape.
+        :return: A dictionary mapping each stored term to its number of listings.
+        """
+        with self._lock:
+            return dict(self._conn.execute("SELECT term, COUNT(*) FROM listings GROUP BY term").fetchall())
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,332 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from data_files import SNAPSHOT_FILE, load_snapshot
+
+WORKER_COUNTS = [1, 2, 4]
+CLIENTS = 16  # Concurrent client threads
+DURATION = 10  # Seconds of load per worker count
+PORT = 8060
+SEARCH_QUERIES = ["rtx", "rtx 40", "4090", "ryzen 7", "14900k", "radeon rx", "core i5", "gtx 10"]
+MEMORY_SCALES = [1, 10]  # Dataset sizes, in copies of the bundled products, the memory check compares
+MEMORY_WORKERS = 4  # Workers the memory check compares against a single one
+MEMORY_DURATION = 3  # Seconds of load before memory is measured, so the workers have opened products
+MAX_WORKER_MB = 50  # Most memory an added worker may cost; about 35 MB when the workers share the data
+MAX_WORKER_GROWTH_MB = 10  # Most the cost of an added worker may rise from the smallest dataset to the largest
+
+
+def product_page_request(product):
+    """
+    Body of the callback request the browser sends when a product is picked in the search dropdown.
+    """
+    buttons = lambda button_type, count: [{"id": {"type": button_type, "index": i}, "property": "n_clicks",
+                                           "value": None} for i in range(count)]
+    return {
+        "output": "..page-content.children...current-product-store.data..",
+        "outputs": [{"id": "page-content", "property": "children"},
+                    {"id": "current-product-store", "property": "data"}],
+        "inputs": [{"id": "product-search", "property": "value", "value": product},
+                   buttons("product-button", 6), buttons("featured-button", 2)],
+        "changedPropIds": ["product-search.value"],
+        "state": [],
+    }
+
+
+def search_request(query):
+    """
+    Body of the callback request the browser sends while the user types in the search dropdown.
+    """
+    return {
+        "output": "product-search.options",
+        "outputs": {"id": "product-search", "property": "options"},
+        "inputs": [{"id": "product-search", "property": "search_value", "value": query}],
+        "changedPropIds": ["product-search.search_value"],
+        "state": [{"id": "product-search", "property": "value", "value": None}],
+    }
+
+
+def start_server(workers, port, data_dir="."):
+    """
+    Start the production server with the given number of workers and wait until it answers.
+    :param workers: Number of gunicorn workers.
+    :type workers: int
+    :param port: Local port to bind.
+    :type port: int
+    :param data_dir: Directory whose assets folder the dashboard loads its data from.
+    :type data_dir: str
+    :return: The gunicorn master process.
+    """
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, DASHBOARD_BIND=f"127.0.0.1:{port}", DASHBOARD_WORKERS=str(workers), PYTHONPATH=repo)
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", os.path.join(repo, "gunicorn.conf.py"),
+                               "wsgi:server"], cwd=data_dir, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/", timeout=1).ok:
+                return server
+        except (requests.ConnectionError, requests.Timeout):
+            # Not listening yet, or listening while the workers still load
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    server.wait()
+    raise RuntimeError(f"The server with {workers} workers didn't start")
+
+
+def memory_mb(pid):
+    """
+    Proportional set size of a process and its children, which counts pages shared between the gunicorn
+    workers once rather than once per worker. Only available on Linux.
+    :param pid: The gunicorn master's process id.
+    :type pid: int
+    :return: The total in megabytes, or None if /proc isn't available.
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids = [pid] + [int(child) for child in f.read().split()]
+        total = 0
+        for process_id in pids:
+            with open(f"/proc/{process_id}/smaps_rollup") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+        return total / 1024
+    except (OSError, StopIteration):
+        return None
+
+
+def worker_private_mb(pid):
+    """
+    Memory each gunicorn worker has written to itself, which is what every added worker costs on top of the
+    pages it shares with the master and the other workers. Pages of the memory-mapped snapshot are never
+    written, so they don't count even when no other worker has read them yet. Only available on Linux.
+    :param pid: The gunicorn master's process id.
+    :type pid: int
+    :return: A list of megabytes per worker, or None if /proc isn't available.
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            workers = [int(child) for child in f.read().split()]
+        private = []
+        for process_id in workers:
+            with open(f"/proc/{process_id}/smaps_rollup") as f:
+                private.append(next(int(line.split()[1]) for line in f if line.startswith("Private_Dirty:")) / 1024)
+        return private
+    except (OSError, StopIteration):
+        return None
+
+
+def run_load(port, products, clients, duration):
+    """
+    Send a mix of product page and search callbacks from several client threads for a fixed time.
+    :return: A dictionary of requests per second, latency percentiles in milliseconds and the error count.
+    """
+    url = f"http://127.0.0.1:{port}/_dash-update-component"
+    latencies = []
+    errors = []
+    stop_at = time.monotonic() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            if rng.random() < 0.5:
+                payload = product_page_request(rng.choice(products))
+            else:
+                payload = search_request(rng.choice(SEARCH_QUERIES))
+            start = time.perf_counter()
+            try:
+                ok = session.post(url, json=payload, timeout=30).ok
+            except requests.RequestException:
+                ok = False
+            (latencies if ok else errors).append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(p / 100 * len(latencies)), len(latencies) - 1)] * 1000
+    return {
+        "requests_per_second": len(latencies) / duration,
+        "p50_ms": percentile(50) if latencies else None,
+        "p99_ms": percentile(99) if latencies else None,
+        "errors": len(errors),
+    }
+
+
+def main(worker_counts=None, clients=CLIENTS, duration=DURATION, port=PORT, output=None, data_dir="."):
+    """
+    Load test the production server at each worker count and print how throughput scales.
+    :param worker_counts: Worker counts to test; defaults to WORKER_COUNTS.
+    :type worker_counts: list
+    :param clients: Concurrent client threads.
+    :type clients: int
+    :param duration: Seconds of load per worker count.
+    :type duration: int
+    :param port: Local port the server is started on.
+    :type port: int
+    :param output: Optional path to write the results to as JSON.
+    :type output: str
+    :param data_dir: Directory whose assets folder the dashboard loads its data from, such as a scaled-up copy.
+    :type data_dir: str
+    :return: The results keyed by worker count.
+    """
+    results = {}
+    for workers in worker_counts or WORKER_COUNTS:
+        server = start_server(workers, port, data_dir)
+        try:
+            # The server has brought the snapshot up to date by the time it answers
+            products = load_snapshot(os.path.join(data_dir, SNAPSHOT_FILE))["products"].tolist()
+            result = run_load(port, products, clients, duration)
+            result["memory_mb"] = memory_mb(server.pid)
+            result["worker_private_mb"] = worker_private_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        results[workers] = result
+        memory = f"{result['memory_mb']:8.1f} MB" if result["memory_mb"] is not None else "n/a"
+        private = (f"{max(result['worker_private_mb']):6.1f} MB" if result["worker_private_mb"] else "n/a")
+        print(f"{workers:3} workers: {result['requests_per_second']:8.1f} req/s  p50 {result['p50_ms']:8.1f} ms  "
+              f"p99 {result['p99_ms']:8.1f} ms  errors {result['errors']}  memory {memory}  "
+              f"largest private per worker {private}")
+
+    # Workers share the snapshot through the page cache, so each one should add about its private memory only
+    measured = sorted(workers for workers, result in results.items() if result["memory_mb"] is not None)
+    if len(measured) > 1 and measured[-1] > measured[0]:
+        added = (results[measured[-1]]["memory_mb"] - results[measured[0]]["memory_mb"]) / (measured[-1] - measured[0])
+        print(f"Memory added per worker: {added:.1f} MB")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+    return results
+
+
+def scaled_data_dir(directory, scale):
+    """
+    Fill a directory with an assets folder holding the bundled data scaled up `scale` times, and build its
+    dataset, rollups and snapshot so the server doesn't rebuild them while it is being measured.
+    :param directory: Directory to create the assets folder in.
+    :type directory: str
+    :param scale: How many copies of each product to write.
+    :type scale: int
+    :return: The directory.
+    """
+    # benchmark imports pandas, which only the memory check needs
+    from benchmark import scaled_wide_csvs
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    os.makedirs(os.path.join(directory, "assets"), exist_ok=True)
+    scaled_wide_csvs(os.path.join(directory, "assets"), scale)
+    subprocess.run([sys.executable, os.path.join(repo, "price_data.py")], cwd=directory, check=True,
+                   env=dict(os.environ, PYTHONPATH=repo), stdout=subprocess.DEVNULL)
+    return directory
+
+
+def added_worker_mb(workers, port, data_dir, duration=MEMORY_DURATION):
+    """
+    Memory each worker beyond the first adds to the server, from its total proportional set size at 1 and at
+    `workers` workers after the same load. Only available on Linux.
+    :param workers: Worker count compared against a single worker.
+    :type workers: int
+    :param port: Local port the server is started on.
+    :type port: int
+    :param data_dir: Directory whose assets folder the dashboard loads its data from.
+    :type data_dir: str
+    :param duration: Seconds of load before the memory is measured.
+    :type duration: int
+    :return: The memory in megabytes, or None if /proc isn't available.
+    """
+    totals = []
+    for count in [1, workers]:
+        server = start_server(count, port, data_dir)
+        try:
+            products = load_snapshot(os.path.join(data_dir, SNAPSHOT_FILE))["products"].tolist()
+            run_load(port, products, CLIENTS, duration)
+            totals.append(memory_mb(server.pid))
+        finally:
+            server.terminate()
+            server.wait()
+    if None in totals:
+        return None
+    return (totals[1] - totals[0]) / (workers - 1)
+
+
+def check_memory(scales=None, workers=MEMORY_WORKERS, port=PORT, max_worker_mb=MAX_WORKER_MB,
+                 max_growth_mb=MAX_WORKER_GROWTH_MB, duration=MEMORY_DURATION):
+    """
+    Check that workers share the price data: the memory each added worker costs has to stay under
+    `max_worker_mb` at every dataset scale and may rise by at most `max_growth_mb` from the smallest scale to
+    the largest. A worker holding its own copy of the data costs more the larger the dataset is.
+    :param scales: Dataset sizes in copies of the bundled products; defaults to MEMORY_SCALES.
+    :type scales: list
+    :param workers: Worker count compared against a single worker.
+    :type workers: int
+    :param port: Local port the server is started on.
+    :type port: int
+    :param max_worker_mb: Most memory an added worker may cost, in megabytes.
+    :type max_worker_mb: float
+    :param max_growth_mb: Most the cost of an added worker may rise between the smallest and largest scale.
+    :type max_growth_mb: float
+    :param duration: Seconds of load before the memory is measured.
+    :type duration: int
+    :return: A list of the failed checks, empty if they all passed.
+    """
+    added = {}
+    for scale in sorted(scales or MEMORY_SCALES):
+        with tempfile.TemporaryDirectory() as directory:
+            added[scale] = added_worker_mb(workers, port, scaled_data_dir(directory, scale), duration)
+        if added[scale] is None:
+            raise RuntimeError("Memory can only be measured on Linux")
+        print(f"{scale:4}x data: memory added per worker {added[scale]:6.1f} MB")
+
+    failures = [f"An added worker costs {mb:.1f} MB at {scale}x data, over the limit of {max_worker_mb} MB"
+                for scale, mb in added.items() if mb > max_worker_mb]
+    smallest, largest = min(added), max(added)
+    if added[largest] - added[smallest] > max_growth_mb:
+        failures.append(f"An added worker costs {added[largest] - added[smallest]:.1f} MB more at {largest}x data "
+                        f"than at {smallest}x, over the limit of {max_growth_mb} MB")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the dashboard under gunicorn at several worker counts.")
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKER_COUNTS,
+                        help="worker counts to test (default: 1 2 4)")
+    parser.add_argument("--clients", type=int, default=CLIENTS, help="concurrent clients (default: %(default)s)")
+    parser.add_argument("--duration", type=int, default=DURATION,
+                        help="seconds of load per worker count (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=PORT, help="local port to start the server on (default: %(default)s)")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--data-dir", default=".",
+                        help="directory with the assets folder to serve, such as a scaled-up copy (default: this one)")
+    parser.add_argument("--check-memory", action="store_true",
+                        help="instead of the load test, check the memory added per worker at every --scales and exit "
+                             "with an error if it is over --max-worker-mb or grows with the data by over "
+                             "--max-growth-mb")
+    parser.add_argument("--scales", type=int, nargs="+", default=MEMORY_SCALES,
+                        help="dataset sizes for --check-memory, in copies of the bundled products (default: 1 10)")
+    parser.add_argument("--max-worker-mb", type=float, default=MAX_WORKER_MB,
+                        help="most memory an added worker may cost (default: %(default)s)")
+    parser.add_argument("--max-growth-mb", type=float, default=MAX_WORKER_GROWTH_MB,
+                        help="most the cost of an added worker may rise from the smallest scale to the largest "
+                             "(default: %(default)s)")
+    args = parser.parse_args()
+    if args.check_memory:
+        failures = check_memory(args.scales, max(args.workers), args.port, args.max_worker_mb, args.max_growth_mb)
+        for failure in failures:
+            print(failure)
+        sys.exit(1 if failures else 0)
+    main(args.workers, args.clients, args.duration, args.port, args.output, args.data_dir)
@@ -0,0 +1,200 @@
+import functools
+import json
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets, as in the Prometheus client libraries
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """
+    In-process registry of counters and latency histograms, identified by a metric name and a set of labels,
+    such as scraper_listings_total{result="title_mismatch"}. Recording is a dictionary update under a lock,
+    cheap enough for every request and callback. Safe to share between threads; each process keeps its own
+    registry, so every gunicorn worker reports its own numbers.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}  # name -> label key -> value
+        self._histograms = {}  # name -> label key -> [count per bucket..., count, sum]
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        """
+        Set the help text shown above a metric in the Prometheus output.
+        :param name: The metric name.
+        :type name: str
+        :param text: One line describing the metric.
+        :type text: str
+        :return: None
+        """
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Add to a counter.
+        :param name: The metric name, ending in _total by convention.
+        :type name: str
+        :param amount: How much to add.
+        :type amount: float
+        :param labels: The labels identifying the series, such as result="empty".
+        :return: None
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Record one measurement, usually a duration in seconds, in a histogram.
+        :param name: The metric name, ending in _seconds for durations.
+        :type name: str
+        :param value: The measured value.
+        :type value: float
+        :param labels: The labels identifying the series.
+        :return: None
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(self.buckets) + 2)
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+                    break
+            counts[-2] += 1
+            counts[-1] += value
+
+    def timer(self, name, **labels):
+        """
+        Context manager that records the time spent inside it in a histogram, also when it raises.
+        :param name: The metric name.
+        :type name: str
+        :param labels: The labels identifying the series.
+        :return: The context manager.
+        """
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """
+        Decorator recording every call's duration in a histogram, also calls that raise.
+        :param name: The metric name.
+        :type name: str
+        :param labels: The labels identifying the series.
+        :return: The decorator.
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """
+        Copy the current values as plain data.
+        :return: A dictionary with "counters", mapping each name to a list of {"labels", "value"}, and
+            "histograms", mapping each name to a list of {"labels", "count", "sum", "mean", "buckets"},
+            where buckets maps each upper bound to the cumulative count of measurements up to it.
+        """
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(counts) for key, counts in series.items()}
+                          for name, series in self._histograms.items()}
+
+        snapshot = {"counters": {}, "histograms": {}}
+        for name, series in sorted(counters.items()):
+            snapshot["counters"][name] = [{"labels": dict(key), "value": value} for key, value in sorted(series.items())]
+        for name, series in sorted(histograms.items()):
+            snapshot["histograms"][name] = []
+            for key, counts in sorted(series.items()):
+                cumulative = 0
+                buckets = {}
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                snapshot["histograms"][name].append({
+                    "labels": dict(key),
+                    "count": counts[-2],
+                    "sum": counts[-1],
+                    "mean": counts[-1] / counts[-2] if counts[-2] else None,
+                    "buckets": buckets,
+                })
+        return snapshot
+
+    def to_prometheus(self):
+        """
+        Render the current values in the Prometheus text exposition format.
+        :return: The metrics as text, one sample per line.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, samples in snapshot["counters"].items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for sample in samples:
+                lines.append(f"{name}{_format_labels(_label_key(sample['labels']))} {sample['value']}")
+        for name, samples in snapshot["histograms"].items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for sample in samples:
+                key = _label_key(sample["labels"])
+                for bound, count in list(sample["buckets"].items()) + [("+Inf", sample["count"])]:
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {sample['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {sample['count']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """
+        Write the current values to a JSON file.
+        :param path: The file to write.
+        :type path: str
+        :return: None
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=1)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class _Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+# The registry the scraper and the dashboard record to
+METRICS = Metrics()
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+
+from data_files import replaced_atomically
+
+DEFAULT_CACHE_DIR = "page_cache"
+CACHE_TTL_DAYS = 7  # Pages fetched longer ago than this are evicted
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # Compressed size the cache is trimmed to, oldest pages first
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT NOT NULL,
+    fetch_date TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (url, fetch_date)
+);
+CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+"""
+
+
+class PageCache:
+    """
+    On-disk cache of raw result pages, keyed by URL (which holds the query, page number and sort order)
+    and the date the page was fetched, so a page is downloaded at most once a day.
+    Bodies are stored zlib-compressed under the SHA-256 of their content, so identical pages fetched
+    on different days or for different URLs are stored once; a SQLite index maps each key to its body.
+    In replay mode nothing is evicted and a lookup returns the newest stored copy of a URL whatever its
+    age, so a whole run can be repeated offline. Expired pages are evicted and the cache trimmed to
+    max_bytes when it is closed, once per run, and as soon as a put takes it over max_bytes. Safe to share
+    between threads.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl_days=CACHE_TTL_DAYS, max_bytes=CACHE_MAX_BYTES, replay=False):
+        self.directory = directory
+        self.ttl = ttl_days * 24 * 60 * 60
+        self.max_bytes = max_bytes
+        self.replay = replay
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        # Compressed size of the distinct bodies, so a put knows when the cache goes over max_bytes
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size "
+                                         "FROM pages)").fetchone()[0]
+        self._lock = threading.Lock()
+
+    def _body_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.z")
+
+    def get(self, url):
+        """
+        Look up the cached body of a page.
+        :param url: The page URL.
+        :type url: str
+        :return: The page body, or None if it isn't cached (today's copy, or any copy in replay mode).
+        """
+        with self._lock:
+            if self.replay:
+                row = self._conn.execute("SELECT digest FROM pages WHERE url = ? ORDER BY fetched_at DESC LIMIT 1",
+                                         (url,)).fetchone()
+            else:
+                row = self._conn.execute("SELECT digest FROM pages WHERE url = ? AND fetch_date = ? AND fetched_at > ?",
+                                         (url, date.today().isoformat(), time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._body_path(row[0]), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except (OSError, zlib.error):
+            return None
+
+    def put(self, url, body):
+        """
+        Store a freshly fetched page body under today's date, and trim the cache if that takes it over its
+        size limit.
+        :param url: The page URL.
+        :type url: str
+        :param body: The page body.
+        :type body: str
+        :return: None
+        """
+        if self.replay:
+            return
+        data = body.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        compressed = zlib.compress(data, 6)
+        with self._lock, self._conn:
+            path = self._body_path(digest)
+            if not os.path.exists(path):
+                # Write under a temporary name so a reader never sees a partial body
+                with replaced_atomically(path) as temporary, open(temporary, "wb") as f:
+                    f.write(compressed)
+                self._bytes += len(compressed)
+            self._conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                               (url, date.today().isoformat(), digest, len(compressed), time.time()))
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Drop pages past the TTL, then the oldest pages until the distinct bodies fit in max_bytes,
+        and delete the bodies no page refers to any more. Called with the lock held.
+        """
+        oldest_kept = time.time() - self.ttl
+        evicted = self._conn.execute("SELECT url, fetch_date, digest FROM pages WHERE fetched_at <= ?",
+                                     (oldest_kept,)).fetchall()
+        live = self._conn.execute("SELECT url, fetch_date, digest, size FROM pages WHERE fetched_at > ? "
+                                  "ORDER BY fetched_at", (oldest_kept,)).fetchall()
+        references = {}
+        for _, _, digest, size in live:
+            references[digest] = references.get(digest, 0) + 1
+        total = sum(size for digest, size in {(digest, size) for _, _, digest, size in live})
+        for url, fetch_date, digest, size in live:
+            if total <= self.max_bytes:
+                break
+            evicted.append((url, fetch_date, digest))
+            references[digest] -= 1
+            if not references[digest]:
+                total -= size
+
+        for url, fetch_date, _ in evicted:
+            self._conn.execute("DELETE FROM pages WHERE url = ? AND fetch_date = ?", (url, fetch_date))
+        for digest in {digest for _, _, digest in evicted}:
+            path = self._body_path(digest)
+            if not self._conn.execute("SELECT 1 FROM pages WHERE digest = ?", (digest,)).fetchone() \
+                    and os.path.exists(path):
+                os.remove(path)
+        self._bytes = total
+
+    def close(self):
+        """
+        Evict expired pages and trim the cache to its size limit, then close the index.
+        :return: None
+        """
+        if not self.replay:
+            with self._lock, self._conn:
+                self._evict()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,188 @@
+import pandas as pd
+# The file locations and freshness checks live in data_files so the dashboard can use them without pandas
+from data_files import (CATEGORY_FILES, DATASET_FILE, ROLLUP_FILES, SNAPSHOT_FILE, is_stale, rollups_stale,
+                        write_snapshot, replaced_atomically, rebuild_lock)
+
+COLUMNS = ["product", "category", "date", "price", "count"]
+CHART_START_DATE = pd.Timestamp("2024-09-01")  # The daily table covers every day from this date until the build date
+STATS_WINDOW = 30  # Most recent observations the low, high and average are taken over
+
+
+def wide_to_long(wide_df, category):
+    """
+    Convert a wide summary frame (one row per product, one column per raw date string) into
+    one row per observed (product, date) pair.
+    :param wide_df: Frame with a "CPU Name" column followed by one column per date such as "Apr 13, 2024".
+    :type wide_df: pandas.DataFrame
+    :param category: The category every product in the frame belongs to.
+    :type category: str
+    :return: A long frame with product, category, date, price and count columns, sorted by product then date.
+    """
+    long_df = wide_df.melt(id_vars="CPU Name", var_name="date", value_name="price").dropna(subset=["price"])
+    long_df = long_df.rename(columns={"CPU Name": "product"})
+    long_df["date"] = pd.to_datetime(long_df["date"], format="%b %d, %Y", errors="coerce")
+    long_df = long_df.dropna(subset=["date"])
+    long_df["price"] = long_df["price"].astype("float64")
+    long_df["category"] = category
+    # The wide files only hold averages, so the number of listings behind each one is unknown
+    long_df["count"] = pd.array([pd.NA] * len(long_df), dtype="Int32")
+
+    # Keep products in their original row order, which is the order the dashboard lists them in
+    long_df["product"] = pd.Categorical(long_df["product"], categories=pd.unique(wide_df["CPU Name"]))
+    long_df = long_df.sort_values(["product", "date"], kind="stable")
+    long_df["product"] = long_df["product"].astype(str)
+    return long_df[COLUMNS].reset_index(drop=True)
+
+
+def convert_csvs(files=None, output=DATASET_FILE):
+    """
+    One-time conversion of the wide per-category CSVs into the long dataset file.
+    :param files: Category to CSV path mapping; defaults to CATEGORY_FILES.
+    :type files: dict
+    :param output: Path of the Parquet file to write.
+    :type output: str
+    :return: The combined long frame.
+    """
+    files = files or CATEGORY_FILES
+    long_df = pd.concat(
+        [wide_to_long(pd.read_csv(path), category) for category, path in files.items()],
+        ignore_index=True
+    )
+    long_df = to_compact_types(long_df)
+    with replaced_atomically(output) as temporary:
+        long_df.to_parquet(temporary, index=False)
+    return long_df
+
+
+def to_compact_types(long_df):
+    """
+    Store product and category as categoricals, ordered as they first appear, so that each name is
+    held once rather than once per observation.
+    :param long_df: A long price frame.
+    :type long_df: pandas.DataFrame
+    :return: The same frame with categorical product and category columns.
+    """
+    long_df = long_df.copy()
+    for column in ["product", "category"]:
+        long_df[column] = pd.Categorical(long_df[column], categories=pd.unique(long_df[column]))
+    return long_df
+
+
+def build_rollups(long_df, end=None):
+    """
+    Precompute the tables the dashboard reads for every product at once.
+    daily: the prices reindexed onto every day from CHART_START_DATE to `end`, gaps filled forwards then backwards.
+    weekly: the first, highest, lowest and last price of every week (ending Sunday) a product sold in.
+    stats: the low, high and average of the STATS_WINDOW most recent prices, and the latest and previous price.
+    :param long_df: A long price frame.
+    :type long_df: pandas.DataFrame
+    :param end: Last day of the daily table; defaults to today.
+    :type end: pandas.Timestamp
+    :return: A dictionary with the daily (product, date, price), weekly (product, date, open, high, low, close) and
+        stats (product, low, high, average, current, previous) frames, products in dataset order.
+    """
+    prices = long_df[["product", "date", "price"]].copy()
+    prices["product"] = pd.Categorical(prices["product"], categories=pd.unique(prices["product"]))
+    prices["price"] = prices["price"].astype("float64")
+    prices = prices.sort_values(["product", "date"], kind="stable")
+    by_product = prices.groupby("product", observed=True, sort=False)
+
+    date_range = pd.date_range(start=CHART_START_DATE, end=end if end is not None else pd.Timestamp.now(), freq="D")
+    wide = prices.pivot_table(index="date", columns="product", values="price", aggfunc="last", observed=True)
+    daily = wide.reindex(date_range).ffill().bfill()
+    daily.index.name = "date"
+    daily = daily.melt(ignore_index=False, var_name="product", value_name="price").dropna().reset_index()
+
+    # Label each price with the Sunday ending its week, as resample("W") does, so all products are grouped at once
+    week_end = prices["date"] + pd.to_timedelta(6 - prices["date"].dt.dayofweek, unit="D")
+    weekly = prices.groupby([prices["product"], week_end.rename("date")], observed=True, sort=False)["price"] \
+        .agg(["first", "max", "min", "last"])
+    weekly.columns = ["open", "high", "low", "close"]
+    weekly = weekly.reset_index()
+
+    # The last row of each product then holds both its latest and its previous price
+    prices["previous"] = by_product["price"].shift()
+    latest = prices.groupby("product", observed=True, sort=False).tail(1).set_index("product")
+    recent = prices.groupby("product", observed=True, sort=False).tail(STATS_WINDOW) \
+        .groupby("product", observed=True, sort=False)["price"]
+    stats = pd.DataFrame({
+        "low": recent.min(),
+        "high": recent.max(),
+        "average": recent.mean(),
+        "current": latest["price"],
+        "previous": latest["previous"],
+    }).rename_axis("product").reset_index()
+
+    return {
+        "daily": daily[["product", "date", "price"]],
+        "weekly": weekly[["product", "date", "open", "high", "low", "close"]],
+        "stats": stats[["product", "low", "high", "average", "current", "previous"]],
+    }
+
+
+def load_price_data(path=DATASET_FILE):
+    """
+    Load the long price dataset, rebuilding it from the wide CSVs first if it is missing or out of date.
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :return: A long frame with product, category, date, price and count columns.
+    """
+    if is_stale(path):
+        return convert_csvs(output=path)
+    return pd.read_parquet(path)
+
+
+def write_rollups(rollups, files=None):
+    """
+    Write the rollup tables, one Parquet file each, every file under a temporary name renamed into place.
+    :param rollups: The tables returned by build_rollups.
+    :type rollups: dict
+    :param files: Table name to Parquet path mapping; defaults to ROLLUP_FILES.
+    :type files: dict
+    :return: None
+    """
+    for name, rollup_path in (files or ROLLUP_FILES).items():
+        with replaced_atomically(rollup_path) as temporary:
+            rollups[name].to_parquet(temporary, index=False)
+
+
+def load_rollups(path=DATASET_FILE, files=None):
+    """
+    Load the rollup tables, rebuilding them first if the dataset changed or they were built on an earlier day.
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :param files: Table name to Parquet path mapping; defaults to ROLLUP_FILES.
+    :type files: dict
+    :return: The tables as returned by build_rollups.
+    """
+    files = files or ROLLUP_FILES
+    if is_stale(path) or rollups_stale(path, files):
+        rollups = build_rollups(load_price_data(path))
+        write_rollups(rollups, files)
+        return rollups
+    return {name: pd.read_parquet(rollup_path) for name, rollup_path in files.items()}
+
+
+def build_snapshot(path=DATASET_FILE, files=None, snapshot=SNAPSHOT_FILE):
+    """
+    Write the dashboard snapshot from the rollups, rebuilding the dataset and rollups first if they are out of date.
+    :param path: Path of the Parquet dataset.
+    :type path: str
+    :param files: Table name to Parquet path mapping; defaults to ROLLUP_FILES.
+    :type files: dict
+    :param snapshot: Path of the snapshot to write.
+    :type snapshot: str
+    :return: None
+    """
+    write_snapshot(load_rollups(path, files), snapshot)
+
+
+if __name__ == "__main__":
+    # A running dashboard waits for this rebuild rather than starting its own
+    with rebuild_lock():
+        dataset = convert_csvs()
+        print(f"Wrote {len(dataset)} observations for {dataset['product'].nunique()} products to {DATASET_FILE}")
+        write_rollups(build_rollups(dataset))
+        print(f"Wrote the daily, weekly and stats rollups to {', '.join(ROLLUP_FILES.values())}")
+        build_snapshot()
+        print(f"Wrote the dashboard snapshot to {SNAPSHOT_FILE}")
@@ -0,0 +1,222 @@
+import math
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.005  # Medians and trimmed means are within this fraction of the exact value
+TRIM = 0.2  # Share of the lowest and of the highest prices the trimmed mean leaves out
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class PriceStats:
+    """
+    Running statistics of the prices accepted on one day: the exact count, total in cents, lowest and highest
+    price, a float total for the summary CSV, and a quantile sketch for the median and trimmed mean. The sketch counts prices in buckets whose bounds
+    grow by a constant ratio, as in DDSketch, so every quantile it gives is within RELATIVE_ACCURACY of an
+    actual price and its size depends only on the price range (a few hundred buckets between MIN_PRICE and
+    MAX_PRICE), never on the number of listings. Prices are in whole cents, as process_price rounds them, and
+    totalled as integers, so stats of the same day merge exactly, in any order and however the listings were
+    split, whether between parallel workers or earlier incremental runs, as long as no listing is counted twice.
+    The float total adds the prices in the order they came, as the scraper always summed them, so the average
+    written to the summary CSV rounds the same as before; merging adds it as a float and may round differently.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.cents = 0  # Total of the prices, in cents so that adding and merging never round
+        self.total = 0.0  # Total of the prices, summed as floats in the order they were added
+        self.low = None
+        self.high = None
+        self.buckets = {}  # bucket index -> count of prices in it
+
+    def add(self, price):
+        """
+        Add one price.
+        :param price: The price, which must be positive.
+        :type price: float
+        :return: None
+        """
+        if price <= 0:
+            raise ValueError(f"Prices must be positive, got {price}")
+        index = math.ceil(math.log(price) / _LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.cents += round(price * 100)
+        self.total += price
+        self.low = price if self.low is None else min(self.low, price)
+        self.high = price if self.high is None else max(self.high, price)
+
+    def extend(self, prices):
+        for price in prices:
+            self.add(price)
+        return self
+
+    def merge(self, other):
+        """
+        Add the prices counted by another PriceStats, in place.
+        :param other: The stats to merge in.
+        :type other: PriceStats
+        :return: This PriceStats.
+        """
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.cents += other.cents
+        self.total += other.total
+        if other.low is not None:
+            self.low = other.low if self.low is None else min(self.low, other.low)
+            self.high = other.high if self.high is None else max(self.high, other.high)
+        return self
+
+    def __add__(self, other):
+        return PriceStats().merge(self).merge(other)
+
+    def _value(self, index):
+        # The bucket's midpoint in relative terms, kept within the exact range of the prices seen
+        return min(max(2 * _GAMMA ** index / (_GAMMA + 1), self.low), self.high)
+
+    def _ranks(self):
+        # (first rank, count, value) per bucket, from the lowest prices up
+        rank = 0
+        for index in sorted(self.buckets):
+            yield rank, self.buckets[index], self._value(index)
+            rank += self.buckets[index]
+
+    def _value_at(self, rank):
+        # The lowest and highest prices are known exactly
+        if rank <= 0:
+            return self.low
+        if rank >= self.count - 1:
+            return self.high
+        for first, count, value in self._ranks():
+            if rank < first + count:
+                return value
+
+    @property
+    def mean(self):
+        return self.cents / self.count / 100 if self.count else None
+
+    @property
+    def median(self):
+        if not self.count:
+            return None
+        return (self._value_at((self.count - 1) // 2) + self._value_at(self.count // 2)) / 2
+
+    def trimmed_mean(self, trim=TRIM):
+        """
+        Average the prices left after dropping the lowest and the highest `trim` share of them, which keeps
+        bundles and parts-only listings that slipped through the price bounds from skewing the day.
+        :param trim: Share of the prices dropped at each end.
+        :type trim: float
+        :return: The trimmed mean, the exact mean if too few prices to drop any, or None without prices.
+        """
+        dropped = int(self.count * trim)
+        if not dropped:
+            return self.mean
+        kept_from, kept_to = dropped, self.count - dropped
+        total = 0.0
+        for first, count, value in self._ranks():
+            total += max(min(first + count, kept_to) - max(first, kept_from), 0) * value
+        return total / (kept_to - kept_from)
+
+    def summary(self):
+        """
+        :return: A dictionary of the count and the average, median, trimmed mean, lowest and highest price,
+            rounded to cents.
+        """
+        rounded = lambda value: None if value is None else round(value, 2)
+        return {"count": self.count, "average": rounded(self.mean), "median": rounded(self.median),
+                "trimmed_mean": rounded(self.trimmed_mean()), "low": rounded(self.low), "high": rounded(self.high)}
+
+    def to_dict(self):
+        return {"count": self.count, "cents": self.cents, "total": self.total, "low": self.low, "high": self.high,
+                "buckets": sorted(self.buckets.items())}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.low, stats.high = data["count"], data["low"], data["high"]
+        # Stats written before totals were kept in cents hold a float total of whole-cent prices, and stats
+        # written before the float total was kept again only the cents
+        stats.cents = data["cents"] if "cents" in data else round(data["total"] * 100)
+        stats.total = data["total"] if "total" in data else stats.cents / 100
+        stats.buckets = {index: count for index, count in data["buckets"]}
+        return stats
+
+
+def grouped_stats(groups, prices, stats=None):
+    """
+    Batch version of PriceStats.add for many groups of prices at once, with the counts, totals, bounds and
+    sketch buckets of every group computed as NumPy columns. Gives the same stats as adding each price to its
+    group one by one.
+    :param groups: The group of each price, numbered from 0.
+    :type groups: numpy.ndarray
+    :param prices: The prices, which must be positive.
+    :type prices: numpy.ndarray
+    :param stats: Optional PriceStats of every group to add the prices to, in place; new ones by default.
+    :type stats: list
+    :return: A list with the PriceStats of each group, up to the highest group number.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if not len(prices):
+        return [] if stats is None else stats
+    if not (prices > 0).all():
+        raise ValueError(f"Prices must be positive, got {prices[~(prices > 0)][0]}")
+    size = int(groups.max()) + 1
+    counts = np.bincount(groups, minlength=size)
+    # np.rint rounds halves to even like round(); the sums stay exact as floats up to 2 ** 53 cents
+    cents = np.bincount(groups, weights=np.rint(prices * 100), minlength=size)
+    if stats is None:
+        stats = [PriceStats() for _ in range(size)]
+    # np.add.at adds one price at a time in order, continuing from each group's total so far, so the float totals
+    # round exactly as PriceStats.add does
+    totals = np.array([group_stats.total for group_stats in stats[:size]], dtype=np.float64)
+    np.add.at(totals, groups, prices)
+    lows = np.full(size, np.inf)
+    np.minimum.at(lows, groups, prices)
+    highs = np.full(size, -np.inf)
+    np.maximum.at(highs, groups, prices)
+    indexes = np.ceil(np.log(prices) / _LOG_GAMMA).astype(np.int64)
+    # Each (group, bucket) pair as one number, so the bucket counts of every group come from a single np.unique
+    first = int(indexes.min())
+    span = int(indexes.max()) - first + 1
+    pairs, pair_counts = np.unique(groups * span + (indexes - first), return_counts=True)
+
+    for group_stats, count, group_cents, total, low, high in zip(stats, counts.tolist(), cents.tolist(),
+                                                                 totals.tolist(), lows.tolist(), highs.tolist()):
+        if count:
+            group_stats.count += count
+            group_stats.cents += int(group_cents)
+            group_stats.total = total
+            group_stats.low = low if group_stats.low is None else min(group_stats.low, low)
+            group_stats.high = high if group_stats.high is None else max(group_stats.high, high)
+    for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+        buckets = stats[pair // span].buckets
+        index = pair % span + first
+        buckets[index] = buckets.get(index, 0) + count
+    return stats
+
+
+def dump_daily_stats(daily_stats):
+    """
+    :param daily_stats: A dictionary mapping each date to its PriceStats.
+    :return: The same as JSON-serializable data.
+    """
+    return {date: stats.to_dict() for date, stats in daily_stats.items()}
+
+
+def load_daily_stats(data):
+    """
+    :param data: Per-day stats as returned by dump_daily_stats.
+    :return: A dictionary mapping each date to its PriceStats.
+    """
+    return {date: PriceStats.from_dict(stats) for date, stats in data.items()}
+
+
+def daily_averages(daily_stats):
+    """
+    :param daily_stats: A dictionary mapping each date to its PriceStats.
+    :return: A dictionary mapping each date to its average price rounded to cents, as in the summary CSV.
+    """
+    return {date: round(stats.total / stats.count, 2) for date, stats in daily_stats.items() if stats.count}
@@ -0,0 +1,60 @@
+import heapq
+import re
+
+MAX_RESULTS = 10  # Matches returned per query
+
+
+def normalize(text):
+    """
+    Lower-case a product name or query and split it into alphanumeric tokens, so that
+    "GeForce RTX 4070 Ti" and "Core i9-14900K" become ["geforce", "rtx", "4070", "ti"] and ["core", "i9", "14900k"].
+    :param text: The product name or query.
+    :type text: str
+    :return: The list of tokens in order.
+    """
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class ProductSearchIndex:
+    """
+    Prefix index over the tokens of every product name, built once so that a query is answered
+    with a few dictionary lookups however many products there are.
+    A product matches when every query token is a prefix of one of its tokens.
+    """
+
+    def __init__(self, products):
+        self.products = list(products)
+        self._tokens = [set(normalize(product)) for product in self.products]
+        self._by_prefix = {}  # token prefix -> positions of the products with a token starting with it
+        for position, tokens in enumerate(self._tokens):
+            for token in tokens:
+                for end in range(1, len(token) + 1):
+                    self._by_prefix.setdefault(token[:end], set()).add(position)
+
+    def search(self, query, limit=MAX_RESULTS):
+        """
+        Find the products matching a query, best first: products where more query tokens match a whole
+        token come first, then shorter names, then catalog order.
+        :param query: The text typed so far, such as "rtx 4070 ti" or "14900k".
+        :type query: str
+        :param limit: The most matches to return.
+        :type limit: int
+        :return: A list of at most `limit` product names.
+        """
+        query_tokens = normalize(query)
+        if not query_tokens:
+            return []
+
+        # Intersect the rarest prefixes first so the candidate set shrinks as quickly as possible
+        candidate_sets = sorted((self._by_prefix.get(token, set()) for token in query_tokens), key=len)
+        candidates = set(candidate_sets[0])
+        for positions in candidate_sets[1:]:
+            candidates &= positions
+            if not candidates:
+                return []
+
+        def rank(position):
+            whole_matches = sum(token in self._tokens[position] for token in query_tokens)
+            return -whole_matches, len(self.products[position]), position
+
+        return [self.products[position] for position in heapq.nsmallest(limit, candidates, key=rank)]
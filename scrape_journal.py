@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+
+
+class ScrapeJournal:
+    """
+    Append-only journal of the search terms a scraping run has finished, so that a run that dies partway
+    can be resumed without scraping those terms again. Each finished term is one JSON line holding its
+    daily price stats and watermark, flushed to disk before the term counts as done; the first line holds the
+    run's settings, so only a run with the same settings picks up the results. A line cut short by a crash
+    is ignored. Safe to share between threads.
+    """
+
+    def __init__(self, path, settings, resume=False):
+        """
+        Open the journal, starting a new one unless resuming a run with the same settings.
+        :param path: Path of the journal file.
+        :type path: str
+        :param settings: JSON-serializable settings of the run, such as its input file and cutoff.
+        :type settings: dict
+        :param resume: Keep the terms finished by an earlier run with the same settings.
+        :type resume: bool
+        """
+        self.path = path
+        self.completed = self._read(settings) if resume else {}  # term -> (daily stats, watermark)
+        self._lock = threading.Lock()
+        if self.completed:
+            self._file = open(path, "a", encoding="utf-8")
+        else:
+            self._file = open(path, "w", encoding="utf-8")
+            self._write({"settings": settings})
+
+    def _read(self, settings):
+        if not os.path.exists(self.path):
+            return {}
+        completed = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                if json.loads(next(f, "{}")).get("settings") != settings:
+                    return {}
+            except json.JSONDecodeError:
+                return {}
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    completed[entry["term"]] = (entry["stats"], entry["watermark"])
+                except (json.JSONDecodeError, KeyError):
+                    break
+        return completed
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record(self, search_term, daily_stats, watermark=None):
+        """
+        Durably record a finished search term.
+        :param search_term: The search term.
+        :type search_term: str
+        :param daily_stats: The term's daily price stats keyed by date, as returned by price_stats.dump_daily_stats.
+        :type daily_stats: dict
+        :param watermark: The term's new watermark in an incremental run.
+        :type watermark: dict
+        :return: None
+        """
+        with self._lock:
+            self._write({"term": search_term, "stats": daily_stats, "watermark": watermark})
+            self.completed[search_term] = (daily_stats, watermark)
+
+    def finish(self):
+        """
+        Close and delete the journal once the run's output has been written.
+        :return: None
+        """
+        self.close()
+        os.remove(self.path)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,193 @@
+import argparse
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmark import synthetic_page
+
+PORT = 8765
+PATH = "/sch/i.html"
+BLOCK_PAGE = ("<html><head><title>Pardon Our Interruption...</title></head>"
+              "<body><p>Please verify yourself to continue.</p></body></html>")
+
+
+class FaultInjector:
+    """
+    Decides how the stand-in server answers each request: after a random delay, and either with the result
+    page or with one of the failures eBay produces, drawn at the configured rates. Requests above
+    `rate_limit` per second are answered with HTTP 429, the way eBay throttles a scraper that is too fast.
+    Counts every kind of answer. Safe to share between threads.
+    """
+
+    def __init__(self, delay=0.0, error_rate=0.0, throttle_rate=0.0, block_rate=0.0, hang_rate=0.0,
+                 rate_limit=0.0, seed=None):
+        self.delay = delay
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.block_rate = block_rate
+        self.hang_rate = hang_rate
+        self.rate_limit = rate_limit
+        self.counts = {}
+        self._rng = random.Random(seed)
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _over_rate_limit(self):
+        # Token bucket holding up to one second of requests
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def choose(self):
+        """
+        Pick the answer for one request.
+        :return: A tuple of the seconds to wait before answering and the kind of answer: "ok", "error" (HTTP 503),
+            "throttle" (HTTP 429), "block" (a bot check page with HTTP 200), or "hang" (no answer in time).
+        """
+        with self._lock:
+            delay = self._rng.uniform(0, self.delay)
+            roll = self._rng.random()
+            if self.rate_limit and self._over_rate_limit():
+                kind = "throttle"
+            elif roll < self.error_rate:
+                kind = "error"
+            elif roll < self.error_rate + self.throttle_rate:
+                kind = "throttle"
+            elif roll < self.error_rate + self.throttle_rate + self.block_rate:
+                kind = "block"
+            elif roll < self.error_rate + self.throttle_rate + self.block_rate + self.hang_rate:
+                kind = "hang"
+            else:
+                kind = "ok"
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+        return delay, kind
+
+
+def saved_page_name(query, page):
+    """
+    Name of the saved result page the stand-in serves for a search query and page number, such as
+    "geforce+rtx+3060-2.html", the query's words joined as they are in the search URL.
+    """
+    return f"{'+'.join(query.split())}-{page}.html"
+
+
+def make_handler(injector, hang_seconds, pages_dir=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != PATH:
+                self.send_error(404)
+                return
+            delay, kind = injector.choose()
+            time.sleep(hang_seconds if kind == "hang" else delay)
+
+            if kind == "error":
+                self.send_error(503)
+                return
+            if kind == "throttle":
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            query = parse_qs(url.query)
+            page = int(query.get("_pgn", ["1"])[0])
+            search_query = query.get("_nkw", [""])[0]
+            if kind == "block":
+                body = BLOCK_PAGE
+            elif pages_dir:
+                # Saved pages are served as they are; a page that wasn't saved doesn't exist
+                path = os.path.join(pages_dir, saved_page_name(search_query, page))
+                if not os.path.exists(path):
+                    self.send_error(404)
+                    return
+                with open(path, "r", encoding="utf-8") as f:
+                    body = f.read()
+            else:
+                # The same query and page always give the same listings, and every page has its own links
+                seed = zlib.crc32(search_query.encode("utf-8"))
+                body = synthetic_page(random.Random(seed * 100 + page), first_link=seed % 1000 * 10000 + page * 100)
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main(port=PORT, delay=0.0, error_rate=0.0, throttle_rate=0.0, block_rate=0.0, hang_rate=0.0, hang_seconds=60.0,
+         rate_limit=0.0, seed=None, pages_dir=None):
+    """
+    Serve sold listing pages at http://127.0.0.1:<port>/sch/i.html, injecting delays and failures, until
+    interrupted, then print how many requests got each kind of answer. The pages are generated unless
+    `pages_dir` holds saved ones.
+    :param port: Local port to listen on.
+    :type port: int
+    :param delay: Each answer is delayed by a random time up to this many seconds.
+    :type delay: float
+    :param error_rate: Share of requests answered with HTTP 503.
+    :type error_rate: float
+    :param throttle_rate: Share of requests answered with HTTP 429.
+    :type throttle_rate: float
+    :param block_rate: Share of requests answered with a bot check page.
+    :type block_rate: float
+    :param hang_rate: Share of requests answered only after `hang_seconds`, to trigger the client's timeout.
+    :type hang_rate: float
+    :param hang_seconds: How long a hanging request takes.
+    :type hang_seconds: float
+    :param rate_limit: Requests per second above which every request is answered with HTTP 429; 0 for no limit.
+    :type rate_limit: float
+    :param seed: Optional seed for the injected failures.
+    :type seed: int
+    :param pages_dir: Optional directory of saved result pages named as by saved_page_name; pages that aren't
+        in it are answered with HTTP 404.
+    :type pages_dir: str
+    :return: The number of requests per kind of answer.
+    """
+    injector = FaultInjector(delay, error_rate, throttle_rate, block_rate, hang_rate, rate_limit, seed)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(injector, hang_seconds, pages_dir))
+    server.daemon_threads = True
+    print(f"Serving on http://127.0.0.1:{port}{PATH}, Ctrl-C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    print(", ".join(f"{kind}: {count}" for kind, count in sorted(injector.counts.items())))
+    return injector.counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for eBay's search that injects delays and errors, "
+                                                 "to run the scraper against with --base-url.")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--delay", type=float, default=0.0, help="maximum random delay per answer in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with HTTP 429")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="share of requests answered with a captcha page")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that hang past the timeout")
+    parser.add_argument("--hang-seconds", type=float, default=60.0, help="how long a hanging request takes")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="requests per second above which every request gets HTTP 429 (default: no limit)")
+    parser.add_argument("--seed", type=int, help="seed for the injected failures")
+    parser.add_argument("--pages", help="directory of saved result pages such as 'geforce+rtx+3060-1.html' to serve "
+                                        "instead of generated ones, e.g. tests/fixtures/pages")
+    args = parser.parse_args()
+    main(args.port, args.delay, args.error_rate, args.throttle_rate, args.block_rate, args.hang_rate,
+         args.hang_seconds, args.rate_limit, args.seed, args.pages)
@@ -0,0 +1,71 @@
+def term_key(search_term):
+    """
+    Identify a search term by its keywords, the way the scraper matches them against titles, so that
+    "GeForce RTX 4090" and "geforce  rtx 4090" are the same term.
+    :param search_term: The search term.
+    :type search_term: str
+    :return: The term's lowercased keywords as a sorted tuple.
+    """
+    return tuple(sorted(set(search_term.lower().split())))
+
+
+class TermMatcher:
+    """
+    Index from title words to search terms, compiled once from every term of a run, which finds the most
+    specific term a listing title belongs to in one pass over its words.
+    A term matches a title when every keyword of the term is a word of the title, as in is_valid_title.
+    A term whose keywords all belong to a longer term ("GeForce RTX 4080" and "GeForce RTX 4080 Super")
+    never gets a title the longer term also matches, so the longer term acts as an exclusion rule for the
+    shorter one. A title matching several terms that don't contain one another ("rtx 4080 vs rtx 4090")
+    belongs to none of them.
+    """
+
+    def __init__(self, search_terms):
+        self.keys = list(dict.fromkeys(term_key(search_term) for search_term in search_terms))
+        self._keywords = [frozenset(key) for key in self.keys]
+        # Each term is indexed under its rarest keyword only, usually the model number, so a title's words
+        # lead to a handful of candidates rather than to every term sharing "geforce" or "rtx"
+        usage = {}
+        for keywords in self._keywords:
+            for keyword in keywords:
+                usage[keyword] = usage.get(keyword, 0) + 1
+        self._by_word = {}  # rarest keyword -> positions of the terms indexed under it
+        for position, keywords in enumerate(self._keywords):
+            rarest = min(sorted(keywords), key=usage.get)
+            self._by_word.setdefault(rarest, []).append(position)
+        # Positions of the terms whose keywords include all of this term's and more
+        self._more_specific = [{other for other, other_keywords in enumerate(self._keywords)
+                                if keywords < other_keywords} for keywords in self._keywords]
+
+    def matches(self, title):
+        """
+        Find every term whose keywords are all words of a title.
+        :param title: The lowercased listing title.
+        :type title: str
+        :return: The set of positions in `keys` of the matching terms.
+        """
+        words = set(title.split())
+        return {position for word in words for position in self._by_word.get(word, ())
+                if self._keywords[position] <= words}
+
+    def match(self, title):
+        """
+        Find the most specific term matching a title.
+        :param title: The lowercased listing title.
+        :type title: str
+        :return: The term's key as returned by term_key, or None if no term, or more than one unrelated term, matches.
+        """
+        matched = self.matches(title)
+        most_specific = [position for position in matched if not self._more_specific[position] & matched]
+        return self.keys[most_specific[0]] if len(most_specific) == 1 else None
+
+    def broader_terms(self, search_term):
+        """
+        Find the terms whose keywords are a strict subset of the term's, whose search results therefore
+        include the term's listings.
+        :param search_term: The search term.
+        :type search_term: str
+        :return: The keys of the broader terms, fewest keywords first.
+        """
+        keywords = set(term_key(search_term))
+        return sorted((key for key in self.keys if set(key) < keywords), key=len)
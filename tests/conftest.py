@@ -0,0 +1,58 @@
+import contextlib
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+PAGES_DIR = os.path.join(FIXTURES, "pages")  # Saved result pages, named as stand_in_server.saved_page_name does
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="module")
+def dashboard():
+    """
+    Import the dashboard, which loads the bundled data relative to the repository.
+    :return: The dashboardapp module.
+    """
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        import dashboardapp
+    finally:
+        os.chdir(cwd)
+    return dashboardapp
+
+
+@contextlib.contextmanager
+def stand_in(injector=None, pages_dir=PAGES_DIR):
+    """
+    Serve saved result pages from a stand_in_server on a free local port.
+    :param injector: Optional FaultInjector deciding how each request is answered; none fail by default.
+    :param pages_dir: Directory of the saved pages, the ones in tests/fixtures/pages by default.
+    :return: The search URL to pass as base_url.
+    """
+    from stand_in_server import PATH, FaultInjector, make_handler
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(injector or FaultInjector(), 0, pages_dir))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}{PATH}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def stand_in_url():
+    """
+    Serve the saved result pages from a stand_in_server for as long as the test runs.
+    :return: The search URL to pass as base_url.
+    """
+    with stand_in() as url:
+        yield url
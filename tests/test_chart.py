@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from dash.exceptions import PreventUpdate
+
+
+def patched_lines(patch):
+    """
+    :return: The x and y values a Patch assigns to each line of the chart, by line position.
+    """
+    lines = {}
+    for operation in patch.to_plotly_json()["operations"]:
+        _, position, axis = operation["location"]
+        lines.setdefault(position, {})[axis] = np.asarray(operation["params"]["value"])
+    return lines
+
+
+def test_downsample_keeps_every_buckets_low_and_high(dashboard):
+    rng = np.random.default_rng(17)
+    dates = np.arange("2019-01-01", "2024-06-01", dtype="datetime64[D]")
+    prices = 500 + rng.normal(0, 20, len(dates)).cumsum()
+    prices[[40, 1200, 1900]] = [5000, 1, 4000]  # One-day spikes and dips
+    kept_dates, kept_prices = dashboard.downsample(dates, prices)
+
+    assert len(kept_prices) <= dashboard.CHART_POINTS
+    assert (np.diff(kept_dates) > np.timedelta64(0, "D")).all()
+    assert (prices[np.searchsorted(dates, kept_dates)] == kept_prices).all()
+    buckets = np.arange(len(prices)) * (dashboard.CHART_POINTS // 2) // len(prices)
+    kept_buckets = buckets[np.searchsorted(dates, kept_dates)]
+    for bucket in np.unique(buckets):
+        assert prices[buckets == bucket].min() in kept_prices[kept_buckets == bucket]
+        assert prices[buckets == bucket].max() in kept_prices[kept_buckets == bucket]
+
+
+def test_short_series_are_not_downsampled(dashboard):
+    dates = np.arange("2024-01-01", "2024-03-01", dtype="datetime64[D]")
+    prices = np.arange(len(dates), dtype=np.float64)
+    kept_dates, kept_prices = dashboard.downsample(dates, prices)
+    assert (kept_dates == dates).all() and (kept_prices == prices).all()
+
+
+def test_zoom_sends_the_range_at_full_detail(dashboard):
+    index = dashboard.live_data.index
+    plotted = list(index.products)[:2]
+    patch, x_range = dashboard.update_chart_range({"xaxis.range[0]": "2025-01-01 00:00:00",
+                                                   "xaxis.range[1]": "2025-01-31 00:00:00"}, plotted)
+    assert x_range == ["2025-01-01 00:00:00", "2025-01-31 00:00:00"]
+    lines = patched_lines(patch)
+    assert sorted(lines) == [0, 1]
+    for position, product_name in enumerate(plotted):
+        daily = index.daily[index.resolve(product_name)]
+        # Every day of the range, and the closest day on either side so the line runs to the chart's edges
+        inside = (daily["date"] >= np.datetime64("2024-12-31")) & (daily["date"] <= np.datetime64("2025-02-01"))
+        assert (lines[position]["x"].astype("datetime64[D]") == daily["date"][inside]).all()
+        assert (lines[position]["y"] == daily["price"][inside]).all()
+
+
+def test_zooming_out_resets_to_the_downsampled_history(dashboard):
+    index = dashboard.live_data.index
+    plotted = list(index.products)[:1]
+    patch, x_range = dashboard.update_chart_range({"xaxis.autorange": True}, plotted)
+    assert x_range is None
+    daily = index.daily[index.resolve(plotted[0])]
+    assert len(daily["price"]) > dashboard.CHART_POINTS
+    line = patched_lines(patch)[0]
+    expected_dates, expected_prices = dashboard.downsample(daily["date"], daily["price"])
+    assert (line["x"].astype("datetime64[D]") == expected_dates).all() and (line["y"] == expected_prices).all()
+
+
+def test_other_relayouts_dont_update(dashboard):
+    plotted = list(dashboard.live_data.index.products)[:1]
+    with pytest.raises(PreventUpdate):
+        dashboard.update_chart_range({"dragmode": "pan"}, plotted)
+    with pytest.raises(PreventUpdate):
+        dashboard.update_chart_range({"xaxis.autorange": True}, [])
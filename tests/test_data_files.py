@@ -0,0 +1,56 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import data_files
+from conftest import ROOT
+
+# Imports the dashboard as a gunicorn worker would, counting the snapshot rebuilds in the "builds" file
+WORKER_SCRIPT = """
+import price_data
+build_snapshot = price_data.build_snapshot
+
+def counted_build_snapshot(*args, **kwargs):
+    with open("builds", "a") as f:
+        f.write("build\\n")
+    build_snapshot(*args, **kwargs)
+
+price_data.build_snapshot = counted_build_snapshot
+import dashboardapp
+assert dashboardapp.live_data.index.products
+"""
+
+
+def test_replaced_atomically_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / "table.parquet"
+    path.write_text("old")
+    with pytest.raises(RuntimeError):
+        with data_files.replaced_atomically(str(path)) as temporary:
+            with open(temporary, "w") as f:
+                f.write("half")
+            raise RuntimeError("interrupted")
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["table.parquet"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="the rebuild lock needs fcntl")
+def test_workers_finding_stale_data_rebuild_it_once(tmp_path):
+    """
+    Dashboard workers starting together on out-of-date data rebuild the dataset, rollups and snapshot once
+    between them, and each of them loads the result.
+    """
+    os.makedirs(tmp_path / "assets")
+    for path in data_files.CATEGORY_FILES.values():
+        shutil.copy(os.path.join(ROOT, path), tmp_path / path)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT], cwd=tmp_path, env=env,
+                                stdout=subprocess.DEVNULL) for _ in range(4)]
+    assert [worker.wait(timeout=120) for worker in workers] == [0] * 4
+    assert (tmp_path / "builds").read_text() == "build\n"
+    assert not [name for name in os.listdir(tmp_path / "assets") if name.endswith(".tmp")]
+    assert sorted(data_files.load_snapshot(str(tmp_path / data_files.SNAPSHOT_FILE))) == [
+        "daily_bounds", "daily_dates", "daily_values", "products", "stats",
+        "weekly_bounds", "weekly_dates", "weekly_values"]
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import pytest
+
+import ebay_price_logger_daily as scraper
+from conftest import FIXTURES
+
+TERMS_FILE = "search_terms_fixture.csv"
+OUTPUT_FILE = f"Average_Prices_By_Day_{TERMS_FILE}"
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("max_concurrency, parse_workers", [(1, 0), (8, 0), (8, 2)])
+def test_output_matches_serial_scraper(tmp_path, stand_in_url, max_concurrency, parse_workers):
+    """
+    The summary written from the saved pages is byte for byte the one the original one-page-at-a-time scraper
+    wrote from them (tests/fixtures/expected), however many requests and parse workers run at once.
+    """
+    shutil.copy(os.path.join(FIXTURES, TERMS_FILE), tmp_path)
+    scraper.main(max_concurrency, rate=0, base_url=stand_in_url, store_path=str(tmp_path / "listings.db"),
+                 parse_workers=parse_workers, cache_dir=None, input_files=[str(tmp_path / TERMS_FILE)])
+    assert read(tmp_path / OUTPUT_FILE) == read(os.path.join(FIXTURES, "expected", OUTPUT_FILE))
+
+
+def test_engine_fetches_pages_in_order(stand_in_url):
+    """
+    Pages fetched together come back parsed in the order they were asked for, and a page the stand-in
+    answers with HTTP 404 fails the fetch rather than being taken for a page without results.
+    """
+    with scraper.FetchEngine(max_concurrency=4, rate=0, base_url=stand_in_url, parse_workers=0) as engine:
+        pages = engine.fetch_pages(["geforce", "rtx", "3060"], [2, 1])
+        with pytest.raises(scraper.FetchError, match="HTTP 404"):
+            engine.fetch_pages(["geforce", "rtx", "3060"], [3])
+    assert [len(listings) for listings, _, _ in pages] == [15, 60]
+    assert pages[0][0][0][3] == "https://www.ebay.com/itm/204712000300"
@@ -0,0 +1,74 @@
+import ebay_price_logger_daily as scraper
+from term_matcher import TermMatcher
+
+TERMS = ["GeForce RTX 4080", "GeForce RTX 4080 Super", "GeForce RTX 4090", "Ryzen 7 5800X"]
+
+
+def listing(title, price="$500.00", link="l1"):
+    return title, price, "Apr 13, 2024", link, "used"
+
+
+def accepted_links(accepted):
+    return [link for _, _, _, link, _ in accepted]
+
+
+def test_no_title_matches_with_matcher():
+    """
+    A term none of whose listings have a matching title accepts nothing, rather than failing the run.
+    """
+    accepted = scraper.filter_listings([listing("amd ryzen 7 5800x used", "$100.00")], ["geforce", "rtx", "4090"],
+                                       TermMatcher(TERMS))
+    assert accepted_links(accepted) == []
+
+
+def test_every_title_belongs_to_another_term():
+    accepted = scraper.filter_listings([listing("geforce rtx 4080 super oc", link="l1"),
+                                        listing("geforce rtx 4080 vs 4090", link="l2")],
+                                       ["geforce", "rtx", "4080"], TermMatcher(TERMS))
+    assert accepted_links(accepted) == []
+
+
+def test_listings_go_to_the_most_specific_term():
+    listings = [listing("msi geforce rtx 4080 super", link="l1"), listing("asus geforce rtx 4080 16gb", link="l2"),
+                listing("geforce rtx 4080 founders", "$1,100.00", link="l3")]
+    matcher = TermMatcher(TERMS)
+    assert accepted_links(scraper.filter_listings(listings, ["geforce", "rtx", "4080"], matcher)) == ["l2"]
+    assert accepted_links(scraper.filter_listings(listings, ["geforce", "rtx", "4080", "super"], matcher)) == ["l1"]
+    # Without a matcher every title containing the keywords counts, as before
+    assert accepted_links(scraper.filter_listings(listings, ["geforce", "rtx", "4080"])) == ["l1", "l2"]
+
+
+def test_no_listings():
+    assert accepted_links(scraper.filter_listings([], ["geforce", "rtx", "4090"], TermMatcher(TERMS))) == []
+
+
+def test_store_rebuild_matches_scraped_stats(tmp_path, monkeypatch):
+    """
+    Recomputing the daily stats from 200,000 stored listings as columns, in batches that split days between
+    them, gives the same stats, in the same date order, as the scraper built adding the listings one by one.
+    """
+    import random
+
+    import listing_store
+    from benchmark import synthetic_listings
+    from price_stats import dump_daily_stats
+
+    monkeypatch.setattr(listing_store, "REBUILD_BATCH", 7000)
+    rng = random.Random(13)
+    terms = ["GeForce RTX 4090", "GeForce RTX 4070 Ti", "Core i9-14900K", "Ryzen 7 5800X", "Radeon RX 7900 XTX"]
+    listings = [(title, price, date, f"https://www.ebay.com/itm/{number}", "used")
+                for number, (title, price, date) in enumerate(synthetic_listings(200000, rng))]
+    scraped = {}
+    with listing_store.ListingStore(str(tmp_path / "listings.db")) as store:
+        for start in range(0, len(listings), 10000):
+            for term in terms:
+                accepted = []
+                scraper.add_accepted(scraper.filter_listings(listings[start:start + 10000], term.lower().split()),
+                                     scraped.setdefault(term, {}), accepted)
+                store.add_listings(term, accepted)
+        rebuilt = store.daily_stats(terms)
+
+    assert sum(stats.count for daily_stats in scraped.values() for stats in daily_stats.values()) > 50000
+    for term in terms:
+        assert list(rebuilt[term]) == list(scraped[term])
+        assert dump_daily_stats(rebuilt[term]) == dump_daily_stats(scraped[term])
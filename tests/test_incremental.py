@@ -0,0 +1,79 @@
+import json
+import os
+import re
+import shutil
+
+import ebay_price_logger_daily as scraper
+from conftest import FIXTURES, PAGES_DIR, stand_in
+from price_stats import load_daily_stats
+
+PAGE = "ryzen+7+5800x-1.html"
+LATE_LISTING = "395512000100"  # Sold on the newest date of the page
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def scrape(directory, base_url, terms_file):
+    scraper.main(1, rate=0, base_url=base_url, incremental=True, store_path=os.path.join(directory, "listings.db"),
+                 parse_workers=0, cache_dir=None, input_files=[os.path.join(directory, terms_file)])
+
+
+def outputs(directory, terms_file):
+    stem = f"Average_Prices_By_Day_{os.path.splitext(terms_file)[0]}"
+    names = [f"Average_Prices_By_Day_{terms_file}", f"Price_Stats_By_Day_{terms_file}", f"{stem}_watermarks.json",
+             f"{stem}_daily_stats.json"]
+    return {name: read(os.path.join(directory, name)) for name in names}
+
+
+def test_rerun_on_the_same_day_changes_nothing(tmp_path, stand_in_url):
+    """
+    An incremental run straight after another finds nothing new, and leaves every output as it was rather
+    than counting the watermark date's listings twice.
+    """
+    terms_file = "search_terms_fixture.csv"
+    shutil.copy(os.path.join(FIXTURES, terms_file), tmp_path)
+    scrape(tmp_path, stand_in_url, terms_file)
+    first = outputs(tmp_path, terms_file)
+    assert first[f"Average_Prices_By_Day_{terms_file}"] == read(os.path.join(FIXTURES, "expected",
+                                                                             f"Average_Prices_By_Day_{terms_file}"))
+    scrape(tmp_path, stand_in_url, terms_file)
+    assert outputs(tmp_path, terms_file) == first
+
+
+def test_late_listings_on_the_watermark_date_are_merged(tmp_path):
+    """
+    A listing that shows up after the run on the date of its watermark is added to that date's stats, and
+    the other dates keep theirs.
+    """
+    terms_file = "search_terms_ryzen.csv"
+    with open(tmp_path / terms_file, "w", encoding="utf-8") as f:
+        f.write("Ryzen 7 5800X\n")
+    pages_dir = tmp_path / "pages"
+    pages_dir.mkdir()
+    full_page = read(os.path.join(PAGES_DIR, PAGE))
+    # The same page before the late listing was sold
+    listing = re.search(r'<li class="s-item[^>]*>(?:(?!</li>).)*' + LATE_LISTING + r'.*?</li>\n', full_page, re.S)
+    with open(pages_dir / PAGE, "w", encoding="utf-8") as f:
+        f.write(full_page.replace(listing.group(0), ""))
+    stats_file = tmp_path / "Average_Prices_By_Day_search_terms_ryzen_daily_stats.json"
+    watermark_file = tmp_path / "Average_Prices_By_Day_search_terms_ryzen_watermarks.json"
+
+    with stand_in(pages_dir=str(pages_dir)) as url:
+        scrape(tmp_path, url, terms_file)
+    before = load_daily_stats(json.loads(read(stats_file))["Ryzen 7 5800X"])
+    watermark = json.loads(read(watermark_file))["Ryzen 7 5800X"]
+    assert watermark["date"] == "Apr 15, 2024"
+
+    shutil.copy(os.path.join(PAGES_DIR, PAGE), pages_dir / PAGE)
+    with stand_in(pages_dir=str(pages_dir)) as url:
+        scrape(tmp_path, url, terms_file)
+    after = load_daily_stats(json.loads(read(stats_file))["Ryzen 7 5800X"])
+    assert after["Apr 15, 2024"].count == before["Apr 15, 2024"].count + 1
+    assert {date: stats.to_dict() for date, stats in after.items() if date != "Apr 15, 2024"} == \
+        {date: stats.to_dict() for date, stats in before.items() if date != "Apr 15, 2024"}
+    new_watermark = json.loads(read(watermark_file))["Ryzen 7 5800X"]
+    assert new_watermark["date"] == "Apr 15, 2024"
+    assert new_watermark["links"] == watermark["links"] + [f"https://www.ebay.com/itm/{LATE_LISTING}"]
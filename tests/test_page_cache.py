@@ -0,0 +1,46 @@
+import os
+import time
+
+import page_cache
+from page_cache import PageCache
+
+
+def body(number):
+    # Random enough not to compress away, so every body takes about the same room
+    return os.urandom(2000).hex() + str(number)
+
+
+def test_eviction_only_runs_over_the_limit_and_on_close(tmp_path, monkeypatch):
+    evictions = []
+    evict = PageCache._evict
+    monkeypatch.setattr(PageCache, "_evict", lambda self: evictions.append(1) or evict(self))
+
+    cache = PageCache(str(tmp_path), max_bytes=10 ** 6)
+    for number in range(20):
+        cache.put(f"https://www.ebay.com/sch/i.html?_pgn={number}", body(number))
+    assert evictions == []
+    cache.close()
+    assert evictions == [1]
+
+
+def test_put_over_the_limit_trims_oldest_first(tmp_path):
+    cache = PageCache(str(tmp_path), max_bytes=8000)
+    for number in range(8):
+        cache.put(f"https://www.ebay.com/sch/i.html?_pgn={number}", body(number))
+    kept = [number for number in range(8) if cache.get(f"https://www.ebay.com/sch/i.html?_pgn={number}")]
+    assert kept == list(range(8 - len(kept), 8))
+    assert 0 < len(kept) < 8
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path) if name.endswith(".z")) <= 8000
+    cache.close()
+
+
+def test_close_drops_expired_pages(tmp_path, monkeypatch):
+    cache = PageCache(str(tmp_path))
+    cache.put("https://www.ebay.com/sch/i.html?_pgn=1", body(1))
+    cache.close()
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".z")]) == 1
+
+    later = time.time() + page_cache.CACHE_TTL_DAYS * 24 * 60 * 60 + 1
+    monkeypatch.setattr(page_cache.time, "time", lambda: later)
+    PageCache(str(tmp_path)).close()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".z")]
@@ -0,0 +1,41 @@
+import random
+
+import ebay_price_logger_daily as scraper
+from benchmark import synthetic_page
+
+
+def serve_pages(monkeypatch, page_count, count_text):
+    """
+    Answer fetch_html with `page_count` synthetic pages of their own listings, whose count heading says
+    `count_text` results (none if None). Pages past the last one repeat it, as eBay's do.
+    :return: The list the requested page numbers are appended to.
+    """
+    pages = []
+    for number in range(1, page_count + 1):
+        page = synthetic_page(random.Random(number), first_link=number * 100)
+        heading = '<span class="BOLD">780</span>'
+        pages.append(page.replace(heading, f'<span class="BOLD">{count_text}</span>' if count_text else ""))
+    requested = []
+
+    def fetch_html(search_keywords, page_number, *args, **kwargs):
+        requested.append(page_number)
+        return pages[min(page_number, page_count) - 1]
+
+    monkeypatch.setattr(scraper, "fetch_html", fetch_html)
+    return requested
+
+
+def test_stops_at_the_counted_pages(monkeypatch):
+    # 75 results make two pages, though the pagination bar lists 13 and more pages are served
+    requested = serve_pages(monkeypatch, 5, "75")
+    listings = scraper.collect_new_listings(["geforce", "rtx", "4090"])
+    assert requested == [1, 2]
+    assert len(listings) == 2 * scraper.RESULTS_PER_PAGE
+
+
+def test_stops_at_a_repeated_page(monkeypatch):
+    # Without a result count, pages are requested up to PAGES_PER_TERM until one brings nothing new
+    requested = serve_pages(monkeypatch, 2, None)
+    listings = scraper.collect_new_listings(["geforce", "rtx", "4090"])
+    assert requested == list(range(1, 2 + scraper.PAGE_WAVE_SIZE))
+    assert len(listings) == 2 * scraper.RESULTS_PER_PAGE
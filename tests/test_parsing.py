@@ -0,0 +1,95 @@
+import glob
+import os
+
+import pytest
+
+import ebay_price_logger_daily as scraper
+from conftest import PAGES_DIR
+
+PAGES = sorted(glob.glob(os.path.join(PAGES_DIR, "*.html")))
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("path", PAGES, ids=os.path.basename)
+def test_backends_agree(path):
+    """
+    Both parser backends read the same listings, page count and parse errors from every saved page.
+    """
+    pytest.importorskip("lxml")
+    html = read(path)
+    assert scraper.parse_result_page(html, "html.parser") == scraper.parse_result_page(html, "lxml")
+
+
+def test_parse_result_page():
+    html = read(os.path.join(PAGES_DIR, "geforce+rtx+3060-2.html"))
+    listings, page_count, parse_errors = scraper.parse_result_page(html)
+    assert (len(listings), page_count, parse_errors) == (15, 2, 0)
+    # "New Listing" is part of the title's text on eBay, and the sold date is read through its nested span
+    assert listings[1] == ("new listingnvidia rtx 3060 12gb - tested & working", "$235.54", "Apr 13, 2024",
+                           "https://www.ebay.com/itm/204712000301", "brand new")
+
+
+def test_page_without_results():
+    assert scraper.parse_result_page(read(os.path.join(PAGES_DIR, "radeon+rx+7900+gre-1.html"))) == (None, 1, 0)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        scraper.parse_result_page("<html></html>", "html5lib")
+
+
+@pytest.mark.parametrize("backend", ["html.parser", "lxml"])
+def test_listings_with_missing_fields_are_counted(backend):
+    """
+    A listing missing its sold date, link, href or title, or whose sold date isn't a single string, is counted
+    as a parse error and skipped, and the rest of the page is still read.
+    """
+    if backend == "lxml":
+        pytest.importorskip("lxml")
+    html = read(os.path.join(PAGES_DIR, "radeon+rx+6600-1.html"))
+    listings, page_count, parse_errors = scraper.parse_result_page(html, backend)
+    assert [link for _, _, _, link, _ in listings] == ["https://www.ebay.com/itm/125512000100",
+                                                       "https://www.ebay.com/itm/125512000102",
+                                                       "https://www.ebay.com/itm/125512000107"]
+    assert (page_count, parse_errors) == (1, 5)
+
+
+def test_parse_errors_reach_the_metrics(stand_in_url):
+    """
+    Fetched through the engine's parse pool, a page with unreadable listings doesn't stop the scrape, and its
+    parse errors are counted in scraper_listings_total.
+    """
+    from metrics import METRICS
+
+    METRICS.clear()
+    with scraper.FetchEngine(rate=0, base_url=stand_in_url, parse_workers=1) as engine:
+        listings = scraper.collect_new_listings(["radeon", "rx", "6600"], engine)
+    assert len(listings) == 3
+    counters = {tuple(sample["labels"].items()): sample["value"]
+                for sample in METRICS.snapshot()["counters"]["scraper_listings_total"]}
+    assert counters[(("result", "parse_error"),)] == 5
+
+
+@pytest.mark.parametrize("backend", ["html.parser", "lxml"])
+def test_windowed_pager_doesnt_cap_the_page_count(backend):
+    """
+    The pagination bar shows pages 1 to 9 of 11; the result count decides how many there are.
+    """
+    if backend == "lxml":
+        pytest.importorskip("lxml")
+    html = read(os.path.join(PAGES_DIR, "geforce+rtx+4070-1.html"))
+    assert scraper.parse_result_page(html, backend)[1:] == (11, 0)
+
+
+def test_discover_page_count():
+    labels = [str(number) for number in range(1, 10)]
+    assert scraper.discover_page_count("1,234", labels) == scraper.PAGES_PER_TERM
+    assert scraper.discover_page_count("61", labels) == 2
+    # Without a result count, the pagination bar only tells the last page when its Next link is disabled
+    assert scraper.discover_page_count(None, labels) == scraper.PAGES_PER_TERM
+    assert scraper.discover_page_count(None, labels[:4], next_disabled=True) == 4
+    assert scraper.discover_page_count(None, []) == scraper.PAGES_PER_TERM
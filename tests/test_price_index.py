@@ -0,0 +1,12 @@
+def test_resolve_only_keeps_names_of_products(dashboard):
+    """
+    Names sent by the client are only cached when they name a product, so unmatched ones can't grow the cache.
+    """
+    index = dashboard.live_data.index
+    product = index.products[0]
+    cached = dict(index._resolved)
+    assert index.resolve(product) == product
+    assert index.resolve(product.lower()[1:]) == product
+    for number in range(1000):
+        assert index.resolve(f"no such product {number}") is None
+    assert index._resolved == {**cached, product.lower()[1:]: product}
@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+
+from price_stats import PriceStats, daily_averages, dump_daily_stats, grouped_stats, load_daily_stats
+
+
+def random_prices(rng, count):
+    return [round(rng.uniform(10.01, 899.99), 2) for _ in range(count)]
+
+
+def test_merging_split_batches_is_exact():
+    """
+    However the prices of a day are split between batches, merging the batches gives the same stats, and the
+    same summary, as adding them all to one.
+    """
+    rng = random.Random(23)
+    for _ in range(500):
+        prices = random_prices(rng, rng.randint(2, 40))
+        whole = PriceStats().extend(prices)
+        cut = rng.randint(1, len(prices) - 1)
+        shuffled = rng.sample(prices, len(prices))
+        merged = PriceStats().extend(shuffled[cut:]) + PriceStats().extend(shuffled[:cut])
+        # All but the float total, which is summed in the order the prices came
+        assert dict(merged.to_dict(), total=None) == dict(whole.to_dict(), total=None)
+        assert merged.summary() == whole.summary()
+
+
+def test_summary():
+    stats = PriceStats().extend([700.0, 704.0, 10.5, 890.25, 702.0])
+    summary = stats.summary()
+    assert (summary["count"], summary["average"], summary["low"], summary["high"]) == (5, 601.35, 10.5, 890.25)
+    assert abs(summary["median"] - 702.0) <= 702.0 * 0.005
+    assert PriceStats().extend([700.0, 704.0]).median == 702.0
+    assert PriceStats().summary()["average"] is None
+
+
+def test_round_trip_and_old_float_totals():
+    daily_stats = {"Apr 13, 2024": PriceStats().extend([199.99, 250.1, 0.3 + 0.6])}
+    assert dump_daily_stats(load_daily_stats(dump_daily_stats(daily_stats))) == dump_daily_stats(daily_stats)
+    # Stats written before totals were kept in cents
+    old = {"count": 2, "total": 100.1 + 200.2, "low": 100.1, "high": 200.2, "buckets": [[924, 1], [1063, 1]]}
+    assert load_daily_stats({"Apr 13, 2024": old})["Apr 13, 2024"].cents == 30030
+
+
+def test_summary_csv_average_rounds_as_before():
+    """
+    The summary CSV average is the float sum of the prices in the order they came over their count, as the
+    scraper always wrote it, even where the exact average in cents rounds to another cent.
+    """
+    prices = [564.38, 670.19]
+    stats = PriceStats().extend(prices)
+    assert daily_averages({"Apr 13, 2024": stats}) == {"Apr 13, 2024": round(sum(prices) / len(prices), 2)} \
+        == {"Apr 13, 2024": 617.29}
+    assert round(stats.mean, 2) == 617.28
+    assert daily_averages(load_daily_stats(dump_daily_stats({"Apr 13, 2024": stats}))) == {"Apr 13, 2024": 617.29}
+
+
+def test_grouped_stats_continue_earlier_batches():
+    rng = random.Random(5)
+    prices = random_prices(rng, 3000)
+    groups = [rng.randrange(7) for _ in prices]
+    one_by_one = [PriceStats() for _ in range(7)]
+    for group, price in zip(groups, prices):
+        one_by_one[group].add(price)
+    batched = [PriceStats() for _ in range(7)]
+    for start in range(0, len(prices), 1000):
+        grouped_stats(np.array(groups[start:start + 1000]), np.array(prices[start:start + 1000]), batched)
+    assert [stats.to_dict() for stats in batched] == [stats.to_dict() for stats in one_by_one]
@@ -0,0 +1,62 @@
+import datetime
+import os
+import shutil
+
+import pytest
+
+import ebay_price_logger_daily as scraper
+from conftest import FIXTURES, PAGES_DIR, stand_in
+from stand_in_server import FaultInjector
+
+TERMS_FILE = "search_terms_fixture.csv"
+OUTPUT_FILE = f"Average_Prices_By_Day_{TERMS_FILE}"
+JOURNAL_FILE = "Average_Prices_By_Day_search_terms_fixture_journal.jsonl"
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def scrape(directory, base_url, **kwargs):
+    # One term at a time, in file order: "GeForce RTX 3060", "Ryzen 7 5800X", "Radeon RX 7900 GRE"
+    scraper.main(1, rate=0, base_url=base_url, store_path=os.path.join(directory, "listings.db"), parse_workers=0,
+                 cache_dir=None, input_files=[os.path.join(directory, TERMS_FILE)], **kwargs)
+
+
+@pytest.fixture
+def interrupted_run(tmp_path):
+    """
+    Run the scraper until the last term fails, its page being missing, so only the first two are journaled.
+    """
+    shutil.copy(os.path.join(FIXTURES, TERMS_FILE), tmp_path)
+    pages_dir = tmp_path / "pages"
+    shutil.copytree(PAGES_DIR, pages_dir)
+    os.remove(pages_dir / "radeon+rx+7900+gre-1.html")
+    with stand_in(pages_dir=str(pages_dir)) as url, pytest.raises(scraper.FetchError):
+        scrape(tmp_path, url)
+    assert not os.path.exists(tmp_path / OUTPUT_FILE)
+    assert len(read(tmp_path / JOURNAL_FILE).splitlines()) == 3  # The settings and the first two terms
+    return tmp_path
+
+
+def test_resume_skips_finished_terms(interrupted_run):
+    """
+    A resumed run only fetches the pages of the terms the interrupted one didn't finish, and writes the same
+    summary as a run that was never interrupted.
+    """
+    injector = FaultInjector()
+    with stand_in(injector) as url:
+        scrape(interrupted_run, url, resume=True)
+    assert injector.counts == {"ok": 1}  # The Radeon page; not the GeForce and Ryzen ones
+    assert read(interrupted_run / OUTPUT_FILE) == read(os.path.join(FIXTURES, "expected", OUTPUT_FILE))
+    assert not os.path.exists(interrupted_run / JOURNAL_FILE)
+
+
+def test_resume_with_other_settings_starts_over(interrupted_run):
+    # The journal was written without a cutoff, so its terms don't count for a run with one
+    injector = FaultInjector()
+    with stand_in(injector) as url:
+        scrape(interrupted_run, url, resume=True, cutoff=datetime.date(2024, 1, 1))
+    assert injector.counts == {"ok": 4}
+    assert read(interrupted_run / OUTPUT_FILE) == read(os.path.join(FIXTURES, "expected", OUTPUT_FILE))
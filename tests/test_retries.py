@@ -0,0 +1,80 @@
+import os
+import shutil
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+import ebay_price_logger_daily as scraper
+from conftest import FIXTURES, stand_in
+from stand_in_server import FaultInjector
+
+TERMS_FILE = "search_terms_fixture.csv"
+OUTPUT_FILE = f"Average_Prices_By_Day_{TERMS_FILE}"
+
+
+@pytest.fixture(autouse=True)
+def quick_backoff(monkeypatch):
+    # Retries wait a few milliseconds instead of seconds; Retry-After still holds the host back
+    monkeypatch.setattr(scraper, "BACKOFF_BASE", 0.005)
+
+
+def read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def search_url(base_url, page_number=1):
+    return scraper.build_search_url(["geforce", "rtx", "3060"], page_number, base_url)
+
+
+def test_retried_failures_dont_change_the_output(tmp_path):
+    """
+    With a third of the requests answered with HTTP 503, HTTP 429 or a captcha page, every page is retried
+    until it comes through, and the summary is byte for byte the one written without failures.
+    """
+    injector = FaultInjector(error_rate=0.12, throttle_rate=0.12, block_rate=0.1, seed=4)
+    shutil.copy(os.path.join(FIXTURES, TERMS_FILE), tmp_path)
+    with stand_in(injector) as url:
+        scraper.main(1, rate=0, base_url=url, store_path=str(tmp_path / "listings.db"), parse_workers=0,
+                     cache_dir=None, input_files=[str(tmp_path / TERMS_FILE)])
+    assert read(tmp_path / OUTPUT_FILE) == read(os.path.join(FIXTURES, "expected", OUTPUT_FILE))
+    assert all(injector.counts.get(kind) for kind in ("error", "throttle", "block"))
+
+
+def test_a_page_that_keeps_failing_raises():
+    injector = FaultInjector(error_rate=1.0, seed=5)
+    with stand_in(injector) as url, pytest.raises(scraper.FetchError, match="after 3 attempts"):
+        scraper.request_page(search_url(url), max_attempts=3)
+    assert injector.counts == {"error": 3}
+
+
+def test_retry_after_is_honoured():
+    # One request per second: the second request in a row gets HTTP 429 with Retry-After: 1
+    injector = FaultInjector(rate_limit=1, seed=7)
+    limiter = scraper.HostRateLimiter(rate=0)
+    with stand_in(injector) as url:
+        scraper.request_page(search_url(url), rate_limiter=limiter)
+        started = time.monotonic()
+        response = scraper.request_page(search_url(url, 2), rate_limiter=limiter)
+    assert response.ok
+    assert time.monotonic() - started >= 1.0
+    assert injector.counts == {"ok": 2, "throttle": 1}
+
+
+def test_a_throttle_halves_the_rate():
+    """
+    A throttled request halves the host's rate, once however many are throttled within THROTTLE_COOLDOWN,
+    and every successful request speeds it back up by RATE_STEP.
+    """
+    injector = FaultInjector(throttle_rate=1.0, seed=11)
+    limiter = scraper.HostRateLimiter(rate=8)
+    with stand_in(injector) as url:
+        host = urlsplit(url).netloc
+        for page_number in (1, 2):
+            with pytest.raises(scraper.FetchError, match="throttled"):
+                scraper.request_page(search_url(url, page_number), rate_limiter=limiter, max_attempts=1)
+            assert limiter._rates[host] == 4
+        injector.throttle_rate = 0.0
+        scraper.request_page(search_url(url), rate_limiter=limiter)
+    assert limiter._rates[host] == pytest.approx(4 + scraper.RATE_STEP)
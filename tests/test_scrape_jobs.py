@@ -0,0 +1,60 @@
+import os
+
+import ebay_price_logger_daily as scraper
+from conftest import FIXTURES, stand_in
+from scrape_journal import ScrapeJournal
+from stand_in_server import FaultInjector
+
+
+def term_file(directory, name, terms, completed=()):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("".join(f"{term}\n" for term in terms))
+    term_file = scraper.TermFile(path)
+    term_file.journal = ScrapeJournal(term_file.journal_file, {})
+    for search_term in completed:
+        term_file.journal.record(search_term, {})
+    return term_file
+
+
+def test_identical_queries_are_merged_across_files(tmp_path):
+    gpus = term_file(tmp_path, "search_terms_gpu.csv", ["GeForce RTX 3060", "Radeon RX 7900 GRE"])
+    more_gpus = term_file(tmp_path, "search_terms_more.csv", ["geforce  rtx 3060", "GeForce RTX 4090"],
+                          completed=["GeForce RTX 4090"])
+    jobs = scraper.plan_scrape_jobs([gpus, more_gpus])
+    assert [job["term"] for job in jobs] == ["GeForce RTX 3060", "Radeon RX 7900 GRE"]
+    assert jobs[0]["targets"] == [(gpus, "GeForce RTX 3060"), (more_gpus, "geforce  rtx 3060")]
+
+    # An incremental run only merges them if they also start from the same watermark
+    more_gpus.watermarks = {"geforce  rtx 3060": {"date": "Apr 13, 2024", "links": []}}
+    assert len(scraper.plan_scrape_jobs([gpus, more_gpus], incremental=True)) == 3
+
+
+def test_longest_jobs_first(tmp_path):
+    terms = ["Ryzen 7 5800X", "GeForce RTX 3060", "Radeon RX 7900 GRE", "GeForce RTX 4090"]
+    jobs = scraper.plan_scrape_jobs([term_file(tmp_path, "search_terms.csv", terms)],
+                                    listing_counts={"Ryzen 7 5800X": 30, "GeForce RTX 3060": 900,
+                                                    "Radeon RX 7900 GRE": 0})
+    # A term without stored listings may be the longest of all, so it goes first
+    assert [job["term"] for job in jobs] == ["GeForce RTX 4090", "GeForce RTX 3060", "Ryzen 7 5800X",
+                                             "Radeon RX 7900 GRE"]
+
+
+def test_shared_term_is_fetched_once(tmp_path):
+    """
+    A term in two files is scraped once, and both files' summaries get its row.
+    """
+    with open(os.path.join(FIXTURES, "search_terms_fixture.csv"), "r", encoding="utf-8") as f:
+        terms = f.read().split("\n")[:2]
+    for name, file_terms in [("search_terms_a.csv", terms), ("search_terms_b.csv", terms[:1])]:
+        with open(tmp_path / name, "w", encoding="utf-8") as f:
+            f.write("\n".join(file_terms) + "\n")
+    injector = FaultInjector()
+    with stand_in(injector) as url:
+        scraper.main(4, rate=0, base_url=url, store_path=str(tmp_path / "listings.db"), parse_workers=0,
+                     cache_dir=None, input_files=[str(tmp_path / "search_terms_*.csv")])
+    assert injector.counts == {"ok": 3}  # Two GeForce RTX 3060 pages and one Ryzen 7 5800X page
+    summary_a = scraper.read_summary(str(tmp_path / "Average_Prices_By_Day_search_terms_a.csv"))
+    summary_b = scraper.read_summary(str(tmp_path / "Average_Prices_By_Day_search_terms_b.csv"))
+    assert list(summary_a) == terms
+    assert summary_b == {terms[0]: summary_a[terms[0]]}
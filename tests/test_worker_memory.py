@@ -0,0 +1,21 @@
+import importlib.util
+import socket
+import sys
+
+import pytest
+
+import load_test
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="memory is measured through /proc")
+@pytest.mark.skipif(importlib.util.find_spec("gunicorn") is None, reason="needs gunicorn")
+def test_added_workers_share_the_data():
+    # Fails if a worker costs over MAX_WORKER_MB, or costs more the larger the dataset, as it does when every
+    # worker holds its own copy of the data
+    assert load_test.check_memory(port=free_port()) == []
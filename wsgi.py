@@ -0,0 +1,9 @@
+"""WSGI entry point for serving the dashboard in production, e.g. `gunicorn -c gunicorn.conf.py wsgi:server`.
+
+Importing dashboardapp memory-maps the dashboard snapshot and builds the price and search indexes, so with the
+app preloaded this happens once in the gunicorn master. The workers forked from it read the snapshot's arrays
+from the page cache they all share, instead of each loading its own copy.
+"""
+from dashboardapp import app
+
+server = app.server